@@ -18,36 +18,44 @@
 #
 # Paid support can be contracted through support@csilinux.com
 # ----------------------------------------------------------------------------
-import os, sys, shutil
-import json
-import logging
+import perftrace
+if __name__ == "__main__":
+    # first, so the import timer (CSI_IMPORT_TIMES) sees every other import. Only when
+    # run as a program: not in the spawned prescan/batch workers (__mp_main__)
+    perftrace.trace_imports()
+    perftrace.profile_from_env()
+
+import os, sys, time
 import functools, subprocess
-import tempfile, zipfile, re
-from PySide6.QtCore import QThread, Signal, QUrl, Qt, QSize, QRect, QMetaObject, QCoreApplication, QEvent
+from PySide6.QtCore import QThread, Signal, QUrl, Qt, QSize, QRect, QMetaObject, QCoreApplication, QEvent, QTimer, QAbstractListModel, QModelIndex
 from PySide6.QtGui import QIcon, QPixmap, QFont, QGuiApplication,QAction
 from PySide6.QtWidgets import (
     QApplication, QWidget, QMainWindow, QVBoxLayout, QHBoxLayout, 
     QPushButton, QStatusBar, QLabel, QTextEdit, QPlainTextEdit, QLineEdit, QInputDialog,
      QScrollArea, QDialog, QTabWidget, QMenuBar, QMenu, QCompleter, QTableView,
       QDockWidget, QRadioButton, QCheckBox, QFormLayout,QMessageBox, QGridLayout, QFileDialog,
-      QStackedWidget
+      QStackedWidget, QListView, QListWidget, QListWidgetItem, QComboBox
 )
 
-from csilibs.utils import pathme, auditme, get_current_timestamp, reportme
-from csilibs.config import create_case_folder
 from csilibs.assets import icons, ui
 from csilibs.gui import percentSize
-from csilibs.data import agencyData, apiKeys, Templates, KeywordLists
+from csilibs.data import Templates, KeywordLists
 
 import qdarktheme
 
-from manageapis import Ui_MainWindow, TableModel, show_message_box, newAPIDialog
+# The modules behind each tab (API keys/crypto, template zips, list tools, tool
+# sync...) are imported where they are first used, so startup only pays for the
+# first tab. CSI_IMPORT_TIMES=1 prints what was imported and what it cost.
+from managercore import load_agency_info, save_agency_info, sync_summary, sync_failed
+from apisession import APIKeySession
 
 
-enc_pass = ''
+# unlocked API keys, shared by every APIKeys tab and its dialogs
+session = APIKeySession()
 #---------------------------------------------- MainWindow ------------------------------------------------#
 class CSIMainWindow(QMainWindow):
     """The main window class for the CSI application."""
+    profile_seconds = 30
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -97,14 +105,47 @@ class CSIMainWindow(QMainWindow):
 
         self.menubar.addAction(self.themeMenu.menuAction())
 
+        # profiles to attach when something is slow, see perftrace
+        self.diagnosticsMenu = QMenu(self.menubar)
+        self.diagnosticsMenu.setTitle("Diagnostics")
+        self.profileOption = QAction(self)
+        self.profileOption.setText(f"Profile the Next {self.profile_seconds} Seconds")
+        self.profileOption.setStatusTip("Records what CSI Manager spends its time on and saves it to a file")
+        self.diagnosticsMenu.addAction(self.profileOption)
+        self.menubar.addAction(self.diagnosticsMenu.menuAction())
+        self.profileOption.triggered.connect(lambda: self.startProfile(self.profile_seconds))
+        # CSI_PROFILE=seconds started one already
+        if perftrace.profile_remaining() is not None:
+            self.profileOption.setEnabled(False)
+            QTimer.singleShot(int(perftrace.profile_remaining() * 1000), self.stopProfile)
+
         self.darkTheme.triggered.connect(lambda: self.theme_change("dark"))
         self.lightTheme.triggered.connect(lambda: self.theme_change("light"))
-        print("fullscreen",self.isFullScreen())
         self.fullscreenOption.triggered.connect(lambda: self.showFullScreen() if not self.isFullScreen() else self.showNormal())
 
     def theme_change(self, theme_color):
         qdarktheme.setup_theme(theme_color)
 
+    def startProfile(self, seconds):
+        if perftrace.start_profile(seconds):
+            self.profileOption.setEnabled(False)
+            self.update_status(f"Profiling for {seconds} seconds, use CSI Manager as usual...")
+            QTimer.singleShot(int(seconds * 1000), self.stopProfile)
+
+    def stopProfile(self):
+        try:
+            profile_path, error = perftrace.stop_profile(), None
+        except OSError as e:
+            profile_path, error = None, e
+        self.profileOption.setEnabled(True)
+        self.status_bar.clearMessage()
+        if profile_path:
+            QMessageBox(QMessageBox.Information,"Profile Saved", f"Profile saved to {profile_path}\n"
+                        f"(summary in {os.path.splitext(profile_path)[0]}.txt)", QMessageBox.Ok, self).exec_()
+        else:
+            QMessageBox(QMessageBox.Warning,"Profile Not Saved", f"Couldn't save the profile: {error or 'no profile was running'}",
+                        QMessageBox.Ok, self).exec_()
+
     def center(self):
         qRect = self.frameGeometry()
         center_point = QGuiApplication.primaryScreen().availableGeometry().center()
@@ -126,21 +167,63 @@ class CSIMainWindow(QMainWindow):
 
 
 #---------------------------------------------- TabWidget ------------------------------------------------#
-# give dict of tabname: WidgetObject as an argument
+# give dict of tabname: WidgetObject (or a factory returning one) as an argument.
+# Factories are only called the first time their tab is selected, so startup
+# cost does not depend on how much data the tabs have to load.
 class BaseCSITabs(QDialog):
-    def __init__(self, widgets_dict):
+    def __init__(self, widgets_dict, warm_up=False):
         super().__init__()
-        tabwidget = QTabWidget()
+        self.tabwidget = QTabWidget()
+        self.factories = {}     # tab index: factory of the tabs not built yet
+        self.tab_widgets = {}   # tab name: constructed widget
+        self.build_seconds = {} # tab name: time its factory took, for the startup benchmarks
     
         # Create tabs
         for tab_name, widget in widgets_dict.items():
-            tabwidget.addTab(widget, tab_name)        
+            if isinstance(widget, QWidget):
+                self.tabwidget.addTab(widget, tab_name)
+                self.tab_widgets[tab_name] = widget
+            else:
+                # empty page which will hold the real widget once it is built
+                page = QWidget()
+                page_layout = QVBoxLayout(page)
+                page_layout.setContentsMargins(0,0,0,0)
+                index = self.tabwidget.addTab(page, tab_name)
+                self.factories[index] = widget
+
+        self.tabwidget.currentChanged.connect(self.buildTab)
+        # the first tab is visible straight away
+        self.buildTab(self.tabwidget.currentIndex())
 
         vbox = QVBoxLayout()
-        vbox.addWidget(tabwidget)
+        vbox.addWidget(self.tabwidget)
         
         self.setLayout(vbox)
 
+        if warm_up:
+            QTimer.singleShot(0, self.warmUpNext)
+
+    def buildTab(self, index):
+        factory = self.factories.pop(index, None)
+        if factory is None:
+            return None
+        
+        tab_name = self.tabwidget.tabText(index)
+        perftrace.mark(f"tab: {tab_name}")
+        started = time.perf_counter()
+        widget = factory()
+        self.build_seconds[tab_name] = time.perf_counter() - started
+        perftrace.record("tab.build", self.build_seconds[tab_name], {"tab": tab_name})
+        self.tabwidget.widget(index).layout().addWidget(widget)
+        self.tab_widgets[tab_name] = widget
+        return widget
+
+    def warmUpNext(self):
+        # builds one pending tab per event loop pass, so the window stays responsive
+        if self.factories:
+            self.buildTab(min(self.factories))
+            QTimer.singleShot(0, self.warmUpNext)
+
 #---------------------------------------------- Widgets ------------------------------------------------#
 
 class AgencyInfoTab(QWidget):
@@ -159,8 +242,7 @@ class AgencyInfoTab(QWidget):
 
 
         # Form 
-        with open(agencyData.file_path, 'r') as f:
-            self.agency_info = json.load(f)
+        self.agency_info = load_agency_info()
 
         self.labelArray = [QLabel() for i in self.agency_info]
         self.inputArray = [QLineEdit() for i in self.agency_info]
@@ -209,8 +291,7 @@ class AgencyInfoTab(QWidget):
             for label, input in zip(self.agency_info.keys(), self.inputArray):
                 self.agency_info[label] = input.text()  
             
-            with open(agencyData.file_path, 'w') as f:
-                json.dump(self.agency_info, f)
+            save_agency_info(self.agency_info)
     
     def populateAgain(self):
         result = QMessageBox(QMessageBox.Information,"Confirmation", "Do you want to Undo all your Changes?",QMessageBox.Yes|QMessageBox.No, self.main_window).exec_()
@@ -218,6 +299,140 @@ class AgencyInfoTab(QWidget):
             for label, input in zip(self.agency_info.keys(), self.inputArray):
                 input.setText(self.agency_info[label])
                 
+@functools.lru_cache(maxsize=None)
+def cachedIcon(icon_path):
+    # one shared icon per image file, instead of decoding it again for every file shown
+    return QIcon(QPixmap(icon_path))
+
+# Files of a directory shown by the gallery view of sysFileEditTab. Rows are
+# materialized in batches as the view scrolls and files are added/removed one
+# row at a time, so nothing is rebuilt when the directory changes. Files are
+# found by name through a name -> row map, not by searching the list.
+class FileListModel(QAbstractListModel):
+    batch_size = 200
+
+    def __init__(self, file_names, icon_path, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.file_names = list(file_names)
+        # file name: row. Removing a row moves the ones below it up without updating
+        # them here: a row is at most self.removed above the one recorded.
+        self.rows = {file_name: row for row, file_name in enumerate(self.file_names)}
+        self.removed = 0
+        self.icon_path = icon_path      # function: file name -> icon image path
+        self.loaded = 0                 # rows handed to the view so far
+        self.status_tip = "Double Click to Open the File"
+        self.details = {}               # file name: extra line shown in its tooltip
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.loaded
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.loaded < len(self.file_names)
+
+    def fetchMore(self, parent=QModelIndex()):
+        count = min(self.batch_size, len(self.file_names) - self.loaded)
+        self.beginInsertRows(QModelIndex(), self.loaded, self.loaded + count - 1)
+        self.loaded += count
+        self.endInsertRows()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= self.loaded:
+            return None
+        file_name = self.file_names[index.row()]
+        if role == Qt.DisplayRole:
+            return file_name
+        if role == Qt.ToolTipRole:
+            return f"{file_name}\n{self.details[file_name]}" if file_name in self.details else file_name
+        if role == Qt.DecorationRole:
+            return cachedIcon(self.icon_path(file_name))
+        if role == Qt.StatusTipRole:
+            return self.status_tip
+        return None
+
+    def rowOf(self, file_name):
+        # current row of a file, None if it isn't listed
+        row = self.rows.get(file_name)
+        if row is None or (row < len(self.file_names) and self.file_names[row] == file_name):
+            return row
+        # moved up by removals since it was recorded
+        row = self.file_names.index(file_name, max(0, row - self.removed), row)
+        self.rows[file_name] = row
+        return row
+
+    def addFile(self, file_name):
+        if file_name in self.rows:
+            return False
+        self.rows[file_name] = len(self.file_names)
+        if self.loaded < len(self.file_names):
+            # not shown yet, the view fetches it with the remaining rows
+            self.file_names.append(file_name)
+            return True
+        self.beginInsertRows(QModelIndex(), self.loaded, self.loaded)
+        self.file_names.append(file_name)
+        self.loaded += 1
+        self.endInsertRows()
+        return True
+
+    def removeFile(self, file_name):
+        row = self.rowOf(file_name)
+        if row is None:
+            return False
+        del self.rows[file_name]
+        self.details.pop(file_name, None)
+        if row >= self.loaded:
+            del self.file_names[row]
+        else:
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self.file_names[row]
+            self.loaded -= 1
+            self.endRemoveRows()
+        # the map is rebuilt once the rows can be far from the recorded ones
+        self.removed += 1
+        if self.removed >= self.batch_size:
+            self.rows = {name: row for row, name in enumerate(self.file_names)}
+            self.removed = 0
+        return True
+
+    def setDetails(self, file_name, text):
+        self.details[file_name] = text
+        row = self.rowOf(file_name)
+        if row is not None and row < self.loaded:
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.ToolTipRole])
+
+    def renameFile(self, old_name, new_name):
+        # keeps the row where it is
+        if old_name not in self.rows or new_name in self.rows:
+            return False
+        row = self.rowOf(old_name)
+        self.file_names[row] = new_name
+        del self.rows[old_name]
+        self.rows[new_name] = row
+        if old_name in self.details:
+            self.details[new_name] = self.details.pop(old_name)
+        if row < self.loaded:
+            index = self.index(row)
+            self.dataChanged.emit(index, index)
+        return True
+
+# Copies files into a tab's directory, see bulkimport.import_files
+class BulkImportWorker(QThread):
+    progress = Signal(str)
+    done = Signal(object)   # bulkimport.ImportResult list
+
+    def __init__(self, jobs, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.jobs = jobs
+
+    def run(self):
+        from bulkimport import import_files
+        results = import_files(self.jobs, progress=self.onProgress, cancelled=self.isInterruptionRequested)
+        self.done.emit(results)
+
+    def onProgress(self, done, total, result):
+        self.progress.emit(f"Importing: {done}/{total} {os.path.basename(result.src)}")
+
+
 # Used for 2 tabs: Keywordlists & Sites files
 class sysFileEditTab(QWidget):
     def __init__(self, main_window, heading, file_dir, files_icon, file_exts, *args, **kwargs):
@@ -238,8 +453,9 @@ class sysFileEditTab(QWidget):
         self.Heading.setLayoutDirection(Qt.LeftToRight)
         self.Heading.setAlignment(Qt.AlignCenter)
         
-        self.img_grid = QGridLayout()
         self.createGrid()    
+        self.import_worker = None
+        QCoreApplication.instance().aboutToQuit.connect(self.stopImport)
         
         self.btn_layout = QHBoxLayout()
 
@@ -265,7 +481,7 @@ class sysFileEditTab(QWidget):
 
 
         self.main_layout.addWidget(self.Heading)
-        self.main_layout.addLayout(self.img_grid)
+        self.main_layout.addWidget(self.img_view)
         self.main_layout.addLayout(self.btn_layout)
         self.setLayout(self.main_layout)
 
@@ -278,10 +494,11 @@ class sysFileEditTab(QWidget):
             self.del_btn.setText("Start Deleting")
             self.del_mode = False
         
-        for img in self.img_btns:
-            img.setStatusTip("Double Click to Open the File" if not self.del_btn.isChecked() else "Click to Delete the File")
+        # status tips are read by the view on hover, no per item update needed
+        self.model.status_tip = "Double Click to Open the File" if not self.del_btn.isChecked() else "Click to Delete the File"
 
-    def createFile(self):
+    def askNewFileName(self):
+        # name of a file that doesn't exist yet, None if cancelled
         while True:
             file_name, ok = QInputDialog.getText(self.main_window, "File Name", "Enter Name for the new File:")
             if ok:
@@ -289,133 +506,404 @@ class sysFileEditTab(QWidget):
                 if os.path.exists(file_path):
                     QMessageBox(QMessageBox.Critical,"Error", f"{file_name} already exists!", QMessageBox.Ok, self.main_window).exec_()
                 else:
-                    break
+                    return file_name
             else:
-                return 0
+                return None
+
+    def createFile(self):
+        file_name = self.askNewFileName()
+        if file_name is None:
+            return 0
+        file_path = os.path.join(self.file_dir,file_name)
         file_content, ok = QInputDialog.getMultiLineText(self.main_window, "File Content", "Enter the list of keywords to be written in the file:")
         if ok:
             with open(file_path, 'w') as f:
                 f.write(file_content)
 
-            self.img_btns.append(QPushButton())
-            self.img_labels.append(QLabel(file_name))
-            self.img_blocks.append(QVBoxLayout())
-            index = len(self.img_blocks) - 1
-            self.addItemToGrid(index , self.img_btns[index])
+            self.addItemToGrid(file_name)
 
             QMessageBox(QMessageBox.Information,"Success", f"{file_name} created Successfully!", QMessageBox.Ok, self.main_window).exec_()
 
 
     def exportFile(self, file_extensions):
+        # imports the selected files into the tab's directory on a worker thread
+        from bulkimport import plan_import
+        if self.import_worker is not None:
+            return
         file_string = ' '.join(['*.' + ext for ext in file_extensions])
         files_path, _ = QFileDialog.getOpenFileNames(self.main_window, "Export File", "", f"Data Files ({file_string})")
+        if not files_path:
+            return
+
+        jobs, conflicts = plan_import(files_path, self.file_dir)
+        if conflicts:
+            # one question for all of them
+            names = [os.path.basename(src) for src, _ in conflicts]
+            shown = '\n'.join(names[:20]) + (f"\n... and {len(names) - 20} more" if len(names) > 20 else "")
+            message_box = QMessageBox(QMessageBox.Warning,"Files Already Exist", f"{len(names)} of the selected files already exist:\n{shown}",
+                                      QMessageBox.Cancel, self.main_window)
+            overwrite_btn = message_box.addButton("Overwrite", QMessageBox.AcceptRole)
+            skip_btn = message_box.addButton("Skip", QMessageBox.RejectRole)
+            message_box.exec_()
+            if message_box.clickedButton() == overwrite_btn:
+                jobs.extend(conflicts)
+            elif message_box.clickedButton() != skip_btn:
+                return
+        if not jobs:
+            return
+
+        self.import_cancel_btn = QPushButton("Cancel Import")
+        self.main_window.status_bar.addPermanentWidget(self.import_cancel_btn)
+        self.import_worker = BulkImportWorker(jobs, self)
+        self.import_worker.progress.connect(self.main_window.update_status)
+        self.import_worker.done.connect(self.importFinished)
+        self.import_cancel_btn.clicked.connect(self.import_worker.requestInterruption)
+        self.import_worker.start()
+
+    def stopImport(self):
+        # files not copied yet are skipped, partial ones removed
+        if self.import_worker is not None:
+            self.import_worker.requestInterruption()
+            self.import_worker.wait()
+
+    def importFinished(self, results):
+        self.import_worker.wait()
+        self.import_worker = None
+        self.main_window.status_bar.removeWidget(self.import_cancel_btn)
+        self.import_cancel_btn.deleteLater()
+        self.main_window.status_bar.clearMessage()
+
+        imported = [result for result in results if result.error is None]
+        cancelled = [result for result in results if result.error == "Cancelled"]
+        failed = [result for result in results if result.error not in (None, "Cancelled")]
+        for result in imported:
+            self.addItemToGrid(os.path.basename(result.dest))
+
+        summary = f"{len(imported)} files imported"
+        if cancelled:
+            summary += f", {len(cancelled)} cancelled"
+        if failed:
+            errors = '\n'.join(f"{os.path.basename(result.src)}: {result.error}" for result in failed[:20])
+            QMessageBox(QMessageBox.Critical,"Error", f"{summary}, {len(failed)} failed:\n{errors}", QMessageBox.Ok, self.main_window).exec_()
+        else:
+            QMessageBox(QMessageBox.Information,"Success", summary, QMessageBox.Ok, self.main_window).exec_()
 
-        for src_file in files_path:
-            file_name = os.path.basename(src_file)
-            dest_file = os.path.join(self.file_dir, file_name)
-            if os.path.exists(dest_file):
-                QMessageBox(QMessageBox.Critical,"Error", f"{file_name} already exists!", QMessageBox.Ok, self.main_window).exec_()
-                files_path.remove(src_file)
-                continue
-            shutil.copy(src_file, dest_file)
-
-            self.img_btns.append(QPushButton())
-            self.img_labels.append(QLabel(file_name))
-            self.img_blocks.append(QVBoxLayout())
-            index = len(self.img_blocks) - 1
-            self.addItemToGrid(index , self.img_btns[index])
-        
-        if files_path: 
-            QMessageBox(QMessageBox.Information,"Success", f"Files Exported Successfully", QMessageBox.Ok, self.main_window).exec_()
-            print("Files Exported Successfully")
-
-    def imgAction(self, obj_index):
-        file_name = self.img_labels[obj_index].text()
+    def imgAction(self, index):
+        # index comes from the view at click time, the file is looked up by name
+        file_name = index.data(Qt.DisplayRole)
         file_path = os.path.join(self.file_dir,file_name)
-        print(f"File: {file_path}")
 
         if self.del_btn.isChecked() == True:
             result = QMessageBox(QMessageBox.Warning,"Confirmation", f"Do you want to Delete {file_name}?",QMessageBox.Yes|QMessageBox.No, self.main_window).exec_()
             if result == QMessageBox.Yes:
                 os.remove(file_path)
-                self.img_btns[obj_index].deleteLater()
-                self.img_labels[obj_index].deleteLater()
-                self.img_grid.removeItem(self.img_blocks[obj_index])
-                self.img_blocks[obj_index].setParent(None)
-                self.img_blocks[obj_index].deleteLater()
-
-                del self.img_btns[obj_index]
-                del self.img_labels[obj_index]
-                del self.img_blocks[obj_index]
-                self.clearGridLayout()
-                self.createGrid()
-                print('File Deleted!')
+                self.model.removeFile(file_name)
         
         else:
-            if os.name == 'nt':  # Windows
-                os.startfile(file_path)
-            elif os.name == 'posix':  # macOS or Linux
-                opener = 'open' if sys.platform == 'darwin' else 'xdg-open'
-                subprocess.run([opener, file_path])
-            else:
-                print('Error: Unsupported operating system.')
+            self.openFile(file_path)
 
-    def addItemToGrid(self, i, img):
-        img.setIcon(QIcon(QPixmap(self.files_icon)))
-        img.setObjectName(self.img_labels[i].text())
-        icon_width = percentSize(main_window,10,0)[0]
-        img.setIconSize(QSize(icon_width, icon_width))
-        img.setStatusTip("Double Click to Open the File")
-        img.setFlat(True)
-
-        self.img_blocks[i].addWidget(img)
-        self.img_blocks[i].setObjectName(self.img_labels[i].text())
-        self.img_labels[i].setMaximumHeight(percentSize(self.main_window,0,3)[1])
-        self.img_labels[i].setAlignment(Qt.AlignCenter)
-        self.img_blocks[i].addWidget(self.img_labels[i])
-        img.clicked.connect(functools.partial(self.imgAction, i))
-
-        # dynamic grid assign
-        row = int( i / self.img_per_row )
-        col = i % self.img_per_row
-        self.img_grid.addLayout(self.img_blocks[i],row,col)
-    
-    def clearGridLayout(self):
-        while self.img_grid.count() > 0:
-            item = self.img_grid.takeAt(0)
-            if item.widget():
-                widget = item.widget()
-                widget.setParent(None)
-            elif item.layout():
-                layout = item.layout()
-                self.clearLayout(layout)
-
-    def clearLayout(self, layout):
-        while layout.count() > 0:
-            item = layout.takeAt(0)
-            if item.widget():
-                widget = item.widget()
-                widget.setParent(None)
-            elif item.layout():
-                self.clearLayout(item.layout())
+    def openFile(self, file_path):
+        if os.name == 'nt':  # Windows
+            os.startfile(file_path)
+        elif os.name == 'posix':  # macOS or Linux
+            opener = 'open' if sys.platform == 'darwin' else 'xdg-open'
+            subprocess.run([opener, file_path])
+        else:
+            QMessageBox(QMessageBox.Critical,"Error", "Opening files isn't supported on this operating system.", QMessageBox.Ok, self.main_window).exec_()
+
+    def iconPath(self, file_name):
+        return self.files_icon
+
+    def addItemToGrid(self, file_name):
+        self.model.addFile(file_name)
 
     def createGrid(self):
-        # Files in Grid
-        keyword_files = os.listdir(self.file_dir)
+        # Files in Grid, only names are read here, icons and rows are created by the view on demand
+        from dirwatch import DirWatcher
+        from listtools import is_listed
+        started = time.perf_counter()
+        # hidden files and copies still being written (.part, .tmp-) aren't shown
+        keyword_files = [name for name in os.listdir(self.file_dir) if is_listed(name)]
+
+        self.model = FileListModel(keyword_files, self.iconPath, self)
+
+        icon_width = percentSize(self.main_window,10,0)[0]
+        self.img_view = QListView()
+        self.img_view.setViewMode(QListView.IconMode)
+        self.img_view.setMovement(QListView.Static)
+        self.img_view.setResizeMode(QListView.Adjust)
+        self.img_view.setUniformItemSizes(True)
+        self.img_view.setLayoutMode(QListView.Batched)
+        self.img_view.setBatchSize(FileListModel.batch_size)
+        self.img_view.setWordWrap(True)
+        self.img_view.setIconSize(QSize(icon_width, icon_width))
+        self.img_view.setGridSize(QSize(int(icon_width * 1.5), icon_width + percentSize(self.main_window,0,5)[1]))
+        self.img_view.setMouseTracking(True)     # status tips on hover
+        self.img_view.setModel(self.model)
+        self.img_view.clicked.connect(self.imgAction)
+
+        # files added/removed/renamed by other programs show up without a rescan
+        self.watcher = DirWatcher(self.file_dir, keyword_files, parent=self)
+        self.watcher.changed.connect(self.applyDirDelta)
+        perftrace.record("gallery.create_grid", time.perf_counter() - started,
+                         {"dir": os.path.basename(self.file_dir), "files": len(keyword_files)})
+
+    def applyDirDelta(self, delta):
+        for file_name in delta.removed:
+            self.model.removeFile(file_name)
+        for old_name, new_name in delta.renamed:
+            self.model.renameFile(old_name, new_name)
+        for file_name in delta.added:
+            self.model.addFile(file_name)
+
+
+# Brings the keyword index up to date, see keywordindex.KeywordIndex.refresh
+class KeywordIndexWorker(QThread):
+    progress = Signal(str)
+    done = Signal(object)   # (indexed, removed, failed) file names or the exception
+
+    def __init__(self, file_dir, compress_above=0, renames=(), *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.file_dir = file_dir
+        self.compress_above = compress_above    # bytes, 0 keeps every list as it is
+        self.renames = renames                  # (old, new) names renamed in the directory since the last run
+
+    def run(self):
+        # own connection, the tab's one stays free for searching
+        from keywordindex import KeywordIndex
+        from listtools import auto_compress
+        index = KeywordIndex(self.file_dir)
+        try:
+            # before the refresh, so renamed lists aren't indexed again
+            for old_name, new_name in self.renames:
+                index.rename(old_name, new_name)
+            if self.compress_above:
+                self.progress.emit("Compressing large keyword lists...")
+                # same terms, the index just follows the new names
+                for old_name, new_name in auto_compress(self.file_dir, self.compress_above, cancelled=self.isInterruptionRequested):
+                    index.rename(old_name, new_name)
+            result = index.refresh(cancelled=self.isInterruptionRequested, progress=self.onProgress)
+        except Exception as e:
+            result = e
+        finally:
+            index.close()
+        self.done.emit(result)
 
-        self.img_btns = [QPushButton() for i in keyword_files]
-        self.img_labels = [QLabel(name) for name in keyword_files]
-        self.img_blocks = [QVBoxLayout() for i in keyword_files]
+    def onProgress(self, file_name, done, total):
+        self.progress.emit(f"Indexing keyword lists: {file_name} ({done + 1}/{total})")
 
-        self.img_per_row = 6
-        for i, img in enumerate(self.img_btns):
-            self.addItemToGrid(i, img)
+
+# Normalizes, sorts and dedupes a list in place, see listtools.sort_list
+class ListSortWorker(QThread):
+    progress = Signal(str)
+    done = Signal(object)   # listtools.SortStats, None when cancelled, or the exception
+
+    def __init__(self, file_path, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.file_path = file_path
+
+    def run(self):
+        from listtools import sort_list
+        try:
+            result = sort_list(self.file_path, progress=self.onProgress, cancelled=self.isInterruptionRequested)
+        except Exception as e:
+            result = e
+        self.done.emit(result)
+
+    def onProgress(self, stage, done, total):
+        self.progress.emit(f"{os.path.basename(self.file_path)}: {stage} {done * 100 // max(total, 1)}%")
+
+
+class keywordListTab(sysFileEditTab):
+    # keyword lists with a search over the terms of every list
+    max_hits = 1000
+
+    def __init__(self, main_window, heading, file_dir, files_icon, file_exts, *args, **kwargs):
+        from keywordindex import keywordIndex, SEARCH_MODES
+        from listtools import AUTO_COMPRESS_ENV
+        super().__init__(main_window, heading, file_dir, files_icon, file_exts, *args, **kwargs)
+        self.index = keywordIndex(self.file_dir)
+
+        self.search_layout = QHBoxLayout()
+        self.search_box = QLineEdit()
+        self.search_box.setPlaceholderText("Search terms in all lists...")
+        self.search_box.setClearButtonEnabled(True)
+        self.search_mode = QComboBox()
+        self.search_mode.addItems([mode.capitalize() for mode in SEARCH_MODES])
+        self.match_case = QCheckBox("Match case")
+        self.search_layout.addWidget(self.search_box)
+        self.search_layout.addWidget(self.search_mode)
+        self.search_layout.addWidget(self.match_case)
+
+        self.search_results = QListWidget()
+        self.search_results.setUniformItemSizes(True)
+        self.search_results.setMaximumHeight(percentSize(self.main_window,0,25)[1])
+        self.search_results.hide()
+        self.search_results.itemDoubleClicked.connect(self.openHit)
+
+        self.main_layout.insertLayout(1, self.search_layout)
+        self.main_layout.insertWidget(2, self.search_results)
+
+        self.img_view.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.img_view.customContextMenuRequested.connect(self.on_context_menu)
+        self.sort_worker = None
+        QCoreApplication.instance().aboutToQuit.connect(self.stopSort)
+
+        # searched once typing pauses
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(200)
+        self.search_timer.timeout.connect(self.search)
+        self.search_box.textChanged.connect(self.search_timer.start)
+        self.search_mode.currentIndexChanged.connect(self.search_timer.start)
+        self.match_case.toggled.connect(self.search_timer.start)
+
+        self.index_worker = None
+        self.reindex_needed = False
+        # applied by the next index worker: a write from the GUI thread would wait for its transaction
+        self.pending_renames = []
+        # CSI_COMPRESS_LISTS_MB=<n> compresses lists above n MB when the index is updated
+        self.compress_above = int(os.environ.get(AUTO_COMPRESS_ENV) or 0) * 1024 * 1024
+        QCoreApplication.instance().aboutToQuit.connect(self.stopIndexing)
+        self.reindex()
+
+    def reindex(self):
+        if self.index_worker is not None and self.index_worker.isRunning():
+            # changes during a run are picked up by another run when it finishes
+            self.reindex_needed = True
+            return
+        self.reindex_needed = False
+        renames, self.pending_renames = self.pending_renames, []
+        self.index_worker = KeywordIndexWorker(self.file_dir, self.compress_above, renames, self)
+        self.index_worker.progress.connect(self.main_window.update_status)
+        self.index_worker.done.connect(self.indexingFinished)
+        self.index_worker.start()
+
+    def indexingFinished(self, result):
+        if isinstance(result, Exception):
+            self.main_window.update_status(f"Keyword index: update failed: {result}")
+        else:
+            files, terms = self.index.stats()
+            failed = self.index.failed()
+            unreadable = f", {len(failed)} unreadable: {', '.join(name for name, error in failed)}" if failed else ""
+            self.main_window.update_status(f"Keyword index: {terms} terms in {files - len(failed)} lists{unreadable}")
+            if result[0] or result[1]:
+                self.search()
+        if self.reindex_needed:
+            self.reindex()
+
+    def stopIndexing(self):
+        if self.index_worker is not None:
+            self.index_worker.requestInterruption()
+            self.index_worker.wait()
+
+    def applyDirDelta(self, delta):
+        super().applyDirDelta(delta)
+        self.pending_renames.extend(delta.renamed)
+        if delta.added or delta.removed or delta.modified or delta.renamed:
+            self.reindex()
+
+    def addItemToGrid(self, file_name):
+        super().addItemToGrid(file_name)
+        self.reindex()
+
+    def search(self):
+        from keywordindex import SEARCH_MODES
+        query = self.search_box.text()
+        if not query.strip():
+            self.search_results.hide()
+            return
+        mode = SEARCH_MODES[self.search_mode.currentIndex()]
+        hits = self.index.search(query, mode, ignore_case=not self.match_case.isChecked(), limit=self.max_hits + 1)
+
+        self.search_results.clear()
+        for hit in hits[:self.max_hits]:
+            item = QListWidgetItem(f"{hit.term}    {hit.file}:{hit.line}")
+            item.setData(Qt.UserRole, hit.file)
+            item.setData(Qt.UserRole + 1, hit.line)
+            self.search_results.addItem(item)
+        if not hits:
+            self.search_results.addItem("No matches")
+        self.search_results.show()
+        more = "+" if len(hits) > self.max_hits else ""
+        self.main_window.update_status(f"{min(len(hits), self.max_hits)}{more} matches in {len({hit.file for hit in hits})} lists")
+
+    def openHit(self, item):
+        file_name = item.data(Qt.UserRole)
+        if file_name:
+            self.openFile(os.path.join(self.file_dir, file_name), item.data(Qt.UserRole + 1))
+
+    def openFile(self, file_path, line=None):
+        # lists are opened in the paged viewer, which copes with any size
+        from listviewer import ListViewerDialog
+        viewer = ListViewerDialog(self.main_window, file_path, line)
+        viewer.exec_()
+
+    def createFile(self):
+        # created empty and filled in the viewer, QInputDialog can't hold a big list
+        file_name = self.askNewFileName()
+        if file_name is None:
+            return 0
+        file_path = os.path.join(self.file_dir,file_name)
+        open(file_path, 'w').close()
+        self.addItemToGrid(file_name)
+        self.openFile(file_path)
+
+    def on_context_menu(self, point):
+        index = self.img_view.indexAt(point)
+        if not index.isValid():
+            return
+        file_name = index.data(Qt.DisplayRole)
+        context_menu = QMenu(self)
+        context_menu.addAction(QAction("Open with Default Application", self,
+                                       triggered=functools.partial(super().openFile, os.path.join(self.file_dir, file_name))))
+        sort_action = QAction("Normalize, Sort && Dedupe", self, triggered=functools.partial(self.sortList, file_name))
+        sort_action.setEnabled(self.sort_worker is None)
+        context_menu.addAction(sort_action)
+        context_menu.exec_(self.img_view.viewport().mapToGlobal(point))
+
+    def sortList(self, file_name):
+        result = QMessageBox(QMessageBox.Question,"Confirmation", f"Trim, normalize (NFKC, case-fold), sort and remove duplicates of {file_name}?\nThe list is rewritten in place.",
+                             QMessageBox.Yes|QMessageBox.No, self.main_window).exec_()
+        if result != QMessageBox.Yes:
+            return
+
+        self.sort_cancel_btn = QPushButton("Cancel Sort")
+        self.main_window.status_bar.addPermanentWidget(self.sort_cancel_btn)
+        self.sort_worker = ListSortWorker(os.path.join(self.file_dir, file_name), self)
+        self.sort_worker.progress.connect(self.main_window.update_status)
+        self.sort_worker.done.connect(functools.partial(self.sortFinished, file_name))
+        self.sort_cancel_btn.clicked.connect(self.sort_worker.requestInterruption)
+        self.sort_worker.start()
+
+    def stopSort(self):
+        # cancelled sorts leave the list as it was
+        if self.sort_worker is not None:
+            self.sort_worker.requestInterruption()
+            self.sort_worker.wait()
+
+    def sortFinished(self, file_name, stats):
+        self.sort_worker.wait()
+        self.sort_worker = None
+        self.main_window.status_bar.removeWidget(self.sort_cancel_btn)
+        self.sort_cancel_btn.deleteLater()
+        self.main_window.status_bar.clearMessage()
+        if isinstance(stats, Exception):
+            QMessageBox(QMessageBox.Critical,"Error", f"Sorting {file_name} failed: {stats}", QMessageBox.Ok, self.main_window).exec_()
+        elif stats is None:
+            self.main_window.update_status(f"Sorting {file_name} cancelled, the list is unchanged")
+        else:
+            self.reindex()
+            QMessageBox(QMessageBox.Information,"Success", f"{file_name}: {stats.lines_out} terms kept out of {stats.lines_in} lines "
+                        f"({stats.duplicates} duplicates, {stats.empty} empty lines removed)", QMessageBox.Ok, self.main_window).exec_()
 
 
 # dialog box used by templateTab()
 
 class varValTemplDialog(QDialog):
     def __init__(self,main_window, file_dir, file_name, *args, **kwargs):
+        from thumbnails import sharedThumbnailCache, template_key
+        started = time.perf_counter()
         super().__init__()
         self.setWindowTitle("Fill the template")
         self.main_window = main_window
@@ -474,12 +962,21 @@ class varValTemplDialog(QDialog):
         
         self.img_btns = [QPushButton() for i in self.imgs_loc]
 
+        # thumbnails come from the cache, or are decoded in the background and set once ready
+        self.thumbs = sharedThumbnailCache()
+        self.templ_key = template_key(self.file_path)
+        self.thumbs.ready.connect(self.thumbnailReady)
+        self.img_members = {}   # zip member name: index of its button
+        icon_width = percentSize(main_window,10,0)[0]
+
         self.img_dict = {}
         for i, img in enumerate(self.img_btns):
-            print(self.imgs_loc[i])
-            img.setIcon(QIcon(QPixmap(self.imgs_loc[i])))
+            member = self.imgs_loc[i]
+            self.img_members[member] = i
+            pixmap = self.thumbs.thumbnail(self.file_path, self.templ_key, member, icon_width)
+            if pixmap is not None:
+                img.setIcon(QIcon(pixmap))
             img.setObjectName(self.imgs_loc[i])
-            icon_width = percentSize(main_window,10,0)[0]
             img.setIconSize(QSize(icon_width, icon_width))
             img.setStatusTip("Click to Replace the File")
             img.setFlat(True)
@@ -498,8 +995,11 @@ class varValTemplDialog(QDialog):
         self.main_layout.addWidget(self.generate_btn)
 
         self.setLayout(self.main_layout)
+        perftrace.record("template.dialog", time.perf_counter() - started,
+                         {"file": file_name, "placeholders": len(self.var_names), "images": len(self.imgs_loc)})
 
     def saveReport(self):
+        from templatezip import render_template
         options = QFileDialog.Options()
         options |= QFileDialog.DontUseNativeDialog
         file_dialog = QFileDialog()
@@ -508,9 +1008,10 @@ class varValTemplDialog(QDialog):
         file_ext = os.path.splitext(self.file_path)[1]
         dest_path, _ = file_dialog.getSaveFileName(self, "Save File", "", f"Text Files (*{file_ext})")
 
-        if dest_path:
-            # Perform saving operation with the chosen dest_path
-            print("File saved:", dest_path)
+        if not dest_path:
+            return
+        if not dest_path.lower().endswith(file_ext.lower()):
+            dest_path += file_ext
 
         var_val_dict = {}
         for i, val in enumerate(self.inputArray):
@@ -522,8 +1023,8 @@ class varValTemplDialog(QDialog):
                 if not val.toPlainText() == '':
                     var = self.labelArray[i].text()
                     var_val_dict[var] = val.toPlainText()
-                print(var_val_dict)
-        reportme(self.file_path,dest_path,var_val_dict, self.img_dict)
+        # replaced images are passed by their member name in the template
+        render_template(self.file_path, dest_path, var_val_dict, {self.imgs_loc[i]: img for i, img in self.img_dict.items()})
         QMessageBox(QMessageBox.Information,"Success", f"Successfully Generated your Report at {dest_path}",QMessageBox.Ok, self.main_window).exec_()
         if os.name == 'nt':  # Windows
             os.startfile(dest_path)
@@ -531,128 +1032,206 @@ class varValTemplDialog(QDialog):
             opener = 'open' if sys.platform == 'darwin' else 'xdg-open'
             subprocess.run([opener, dest_path])
         else:
-            print('Error: Unsupported operating system.')
+            QMessageBox(QMessageBox.Critical,"Error", "Opening files isn't supported on this operating system.", QMessageBox.Ok, self.main_window).exec_()
     
+    def thumbnailReady(self, key, member, pixmap):
+        index = self.img_members.get(member)
+        # skipped when the user already replaced the image
+        if key == self.templ_key and index is not None and index not in self.img_dict:
+            self.img_btns[index].setIcon(QIcon(pixmap))
+
     def addNewImg(self, index):
+        from thumbnails import decode_thumbnail
         file_path, _ = QFileDialog.getOpenFileName(self.main_window, "Add an Image", "", f"Image Files (*.jpg *.jpeg *.png)")
         if file_path:
-            self.img_btns[index].setIcon(QIcon(QPixmap(file_path)))
+            with open(file_path, 'rb') as f:
+                image = decode_thumbnail(f.read(), self.img_btns[index].iconSize().width())
+            self.img_btns[index].setIcon(QIcon(QPixmap.fromImage(image)))
             self.img_dict[index] = file_path
     
     
     def getVarNamesImgDir(self, file_path):
-        # for odt files
-        if file_path.lower().endswith(".odt"):
-            file_loc = ['styles.xml', 'content.xml']
-            img_dir = 'Pictures'
-        # for docx files            
-        elif file_path.lower().endswith(".docx"):
-            file_loc = ['word/header1.xml', 'word/footer1.xml', 'word/document.xml']
-            img_dir = 'word/media'
-        
-        self.temp_dir = tempfile.mkdtemp()
-        with zipfile.ZipFile(file_path, 'r') as templ_file:
-            templ_file.extractall(self.temp_dir)
-        
-        var_names = []
-        for file in file_loc:
-            file_path = os.path.join(self.temp_dir, file)
-            with open(file_path, 'r',encoding='utf-8') as content_file:
-                content = content_file.read()
-                content_file.close()
-            
-            pattern = r'&lt;(.*?)&gt;'
-            print(re.findall(pattern, content))
-            var_names.extend(re.findall(pattern, content))
-
-        imgs_loc = []
-        img_path = os.path.join(self.temp_dir, img_dir)
-        if os.path.exists(img_path):
-            for img in os.listdir(img_path):
-                imgs_loc.append(os.path.join(img_path, img))
-        
-        return self.remove_duplicates(var_names), imgs_loc
+        # placeholders come from the template index, the zip is only scanned again
+        # when the template changed. Images stay in the zip as member names.
+        from templateindex import templateIndex
+        file_dir, file_name = os.path.split(file_path)
+        templ_scan = templateIndex(file_dir).scan(file_name)
+        return templ_scan.var_names, templ_scan.images
+
 
-    def closeEvent(self, event):
-        super(varValTemplDialog, self).closeEvent(event)
-        shutil.rmtree(self.temp_dir)
-    
-    @staticmethod
-    def remove_duplicates(lst):
-        new_list = []
-        seen = set()  
 
-        for item in lst:
-            if item not in seen:
-                new_list.append(item)
-                seen.add(item)
+# Scans every template in a process pool (through the template index) and
+# reports each one as soon as its result is in
+class TemplatePrescanWorker(QThread):
+    scanned = Signal(object)    # templateindex.TemplateInfo
+
+    def __init__(self, file_dir, file_names, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.file_dir = file_dir
+        self.file_names = file_names
 
-        return new_list
+    def run(self):
+        from templateindex import prescan_templates
+        for info in prescan_templates(self.file_dir, self.file_names, cancelled=self.isInterruptionRequested):
+            self.scanned.emit(info)
 
 
+# Renders a template for every row of a dataset, see batchreport.run_batch
+class BatchReportWorker(QThread):
+    progress = Signal(str)
+    done = Signal(object, object)   # results, error report path
+
+    def __init__(self, template_path, dataset_path, out_dir, name_pattern, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.template_path = template_path
+        self.dataset_path = dataset_path
+        self.out_dir = out_dir
+        self.name_pattern = name_pattern
+
+    def run(self):
+        from batchreport import run_batch
+        try:
+            results, report_path = run_batch(self.template_path, self.dataset_path, self.out_dir, self.name_pattern,
+                                             progress=self.onProgress, cancelled=self.isInterruptionRequested)
+        except Exception as e:
+            results, report_path = e, None
+        self.done.emit(results, report_path)
+
+    def onProgress(self, done, total, result):
+        self.progress.emit(f"Batch reports: {done}/{total} done")
+
 
 class templateTab(sysFileEditTab):
     def __init__(self, main_window, heading, file_dir, file_exts, *args, **kwargs):
         super().__init__(main_window, heading, file_dir, None, file_exts, *args, **kwargs)
         
         # Removes extra items from super class
-        del self.files_icon
         self.btn_layout.removeWidget(self.create_btn)  # Remove the button from the layout
         self.create_btn.deleteLater()  # Destroy the button widget
 
-        # adding context menu to buttons
-        self.context_menus = [QMenu(self) for i in self.img_btns]
-
-        for i, img in enumerate(self.img_btns):
-            img.setContextMenuPolicy(Qt.CustomContextMenu)
-            img.customContextMenuRequested.connect(functools.partial(self.on_context_menu,i,img))
-            self.context_menus[i].addAction(QAction("Fill Template", self, triggered=functools.partial(self.fillTemplDialogue,i)))
-        # self.img_btns[0].installEventFilter(self)
+        # one context menu for the whole view, built for the file under the cursor
+        self.img_view.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.img_view.customContextMenuRequested.connect(self.on_context_menu)
+
+        # placeholder/image counts of every template, filled in as the background scan reports them
+        self.scan_summary = {'scanned': 0, 'empty': 0, 'broken': 0}
+        templ_names = [name for name in self.model.file_names if os.path.splitext(name)[1].lower()[1:] in self.file_exts]
+        self.prescan = TemplatePrescanWorker(self.file_dir, templ_names, self)
+        self.prescan.scanned.connect(self.templateScanned)
+        self.prescan.finished.connect(self.prescanFinished)
+        QCoreApplication.instance().aboutToQuit.connect(self.stopPrescan)
+        self.prescan.start()
+
+        # one batch at a time, stopped (the reports done so far are kept) when the app quits
+        self.batch_worker = None
+        QCoreApplication.instance().aboutToQuit.connect(self.stopBatch)
+
+    def templateScanned(self, info):
+        self.scan_summary['scanned'] += 1
+        if info.error:
+            self.scan_summary['broken'] += 1
+            details = f"Broken template: {info.error}"
+        else:
+            if info.placeholders == 0:
+                self.scan_summary['empty'] += 1
+            details = (f"{info.placeholders} placeholders, {info.images} images, "
+                       f"{info.size / 1024:.0f} KB, scanned in {info.scan_seconds * 1000:.0f} ms")
+        self.model.setDetails(info.name, details)
 
-    def on_context_menu(self,index,img, point):
-        # show context menu
-        self.context_menus[index].exec_(img.mapToGlobal(point))
+    def prescanFinished(self):
+        self.main_window.update_status(f"Templates: {self.scan_summary['scanned']} scanned, "
+                                       f"{self.scan_summary['empty']} without placeholders, {self.scan_summary['broken']} broken")
 
-    def fillTemplDialogue(self, index):
-        file_name = self.img_labels[index].text()
+    def stopPrescan(self):
+        self.prescan.requestInterruption()
+        self.prescan.wait()
 
+    def on_context_menu(self, point):
+        # show context menu
+        index = self.img_view.indexAt(point)
+        if not index.isValid():
+            return
+        file_name = index.data(Qt.DisplayRole)
+        context_menu = QMenu(self)
+        context_menu.addAction(QAction("Fill Template", self, triggered=functools.partial(self.fillTemplDialogue, file_name)))
+        batch_action = QAction("Batch Fill from Dataset", self, triggered=functools.partial(self.batchFillTemplate, file_name))
+        batch_action.setEnabled(self.batch_worker is None)
+        context_menu.addAction(batch_action)
+        context_menu.exec_(self.img_view.viewport().mapToGlobal(point))
+
+    def fillTemplDialogue(self, file_name):
         dialog = varValTemplDialog(self.main_window,self.file_dir,file_name)
         dialog.exec_()
 
-    def addItemToGrid(self, i, img):
-        file_name = self.img_labels[i].text()
-        if file_name.lower().endswith(".docx"):
-            img.setIcon(QIcon(QPixmap(ui.FILE_DOCX)))
-        elif file_name.lower().endswith(".odt"):
-            img.setIcon(QIcon(QPixmap(ui.FILE_ODT)))
-
-        img.setObjectName(file_name)
-        icon_width = percentSize(main_window,10,0)[0]
-        img.setIconSize(QSize(icon_width, icon_width))
-        img.setStatusTip("Double Click to Open the File")
-        img.setFlat(True)
-
-        self.img_blocks[i].addWidget(img)
-        self.img_blocks[i].setObjectName(file_name)
-        self.img_labels[i].setMaximumHeight(percentSize(self.main_window,0,3)[1])
-        self.img_labels[i].setAlignment(Qt.AlignCenter)
-        self.img_blocks[i].addWidget(self.img_labels[i])
-
-        img.clicked.connect(functools.partial(self.imgAction, i))
-
-        # dynamic grid assign
-        row = int( i / self.img_per_row )
-        col = i % self.img_per_row
-        self.img_grid.addLayout(self.img_blocks[i],row,col)
+    def batchFillTemplate(self, file_name):
+        from batchreport import DEFAULT_NAME_PATTERN
+        dataset_path, _ = QFileDialog.getOpenFileName(self.main_window, "Variables Dataset", "", "Datasets (*.csv *.jsonl *.json)")
+        if not dataset_path:
+            return
+        out_dir = QFileDialog.getExistingDirectory(self.main_window, "Save Reports In")
+        if not out_dir:
+            return
+        name_pattern, ok = QInputDialog.getText(self.main_window, "Report Names",
+                                                "Name of each report ({row}, {template} or any variable):", QLineEdit.Normal, DEFAULT_NAME_PATTERN)
+        if not ok:
+            return
+
+        self.batch_cancel_btn = QPushButton("Cancel Batch")
+        self.main_window.status_bar.addPermanentWidget(self.batch_cancel_btn)
+        self.batch_worker = BatchReportWorker(os.path.join(self.file_dir, file_name), dataset_path, out_dir, name_pattern, self)
+        self.batch_worker.progress.connect(self.main_window.update_status)
+        self.batch_worker.done.connect(self.batchFinished)
+        self.batch_cancel_btn.clicked.connect(self.batch_worker.requestInterruption)
+        self.batch_worker.start()
+
+    def batchFinished(self, results, report_path):
+        self.batch_worker.wait()
+        self.batch_worker = None
+        self.main_window.status_bar.removeWidget(self.batch_cancel_btn)
+        self.batch_cancel_btn.deleteLater()
+        self.main_window.status_bar.clearMessage()
+        if isinstance(results, Exception):
+            QMessageBox(QMessageBox.Critical,"Error", f"Batch failed: {results}", QMessageBox.Ok, self.main_window).exec_()
+            return
+
+        from batchreport import CANCELLED
+        cancelled = sum(1 for result in results if result.error == CANCELLED)
+        failed = sum(1 for result in results if result.error) - cancelled
+        text = f"Generated {len(results) - failed - cancelled} reports."
+        if cancelled:
+            text += f"\n{cancelled} rows cancelled."
+        if failed:
+            text += f"\n{failed} rows failed, see {report_path}"
+        QMessageBox(QMessageBox.Warning if failed or cancelled else QMessageBox.Information, "Batch Reports", text, QMessageBox.Ok, self.main_window).exec_()
+
+    def stopBatch(self):
+        if self.batch_worker is not None:
+            self.batch_worker.requestInterruption()
+            self.batch_worker.wait()
+
+    def applyDirDelta(self, delta):
+        from templateindex import templateIndex
+        super().applyDirDelta(delta)
+        index = templateIndex(self.file_dir)
+        for file_name in delta.removed:
+            index.forget(file_name)
+        for old_name, new_name in delta.renamed:
+            index.rename(old_name, new_name)
+
+    def iconPath(self, file_name):
+        if file_name.lower().endswith(".odt"):
+            return ui.FILE_ODT
+        return ui.FILE_DOCX
 
 class APIKeys(QWidget):
     def __init__(self, main_window, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.main_window = main_window
         self.main_layout = QVBoxLayout()
-        self.enc_pass = ''
+        self.session = session
         self.changed_values = []  # to store the changes into the file
-        api_keys = {}
+        self.worker = None  # APISyncWorker while keys are being saved/wiped
+        QCoreApplication.instance().aboutToQuit.connect(self.stopSync)
         self.Heading = QLabel("CSI Linux API Manager")
         self.Heading.setMaximumHeight(percentSize(main_window,0,5)[1])
         font = QFont()
@@ -694,7 +1273,7 @@ class APIKeys(QWidget):
     
         self.main_layout.addWidget(self.Heading)
     
-        is_enc_file, api_keys = apiKeys(self.enc_pass)
+        is_enc_file = self.session.is_store_available()
 
         self.stacked_widget = QStackedWidget()
 
@@ -760,52 +1339,54 @@ class APIKeys(QWidget):
         self.setLayout(self.main_layout)
     
     def decrypt_apikeys(self):
+        from manageapis import show_message_box
         password = self.input_password.text()
         
         try:
-            apiKeys(password)
+            # single decryption, the keys stay in the session afterwards
+            self.session.unlock(password)
             show_message_box("Success","Decrypted API Keys with Successfully.",QMessageBox.Information)
-            self.enc_pass = password
-            # self.__init__(self.main_window, password)
-            if self.data_widget is None:
-
-                self.data_widget = QWidget()
-                self.data_layout = QVBoxLayout()
-                is_enc_file, api_keys = apiKeys(password)
-                self.api_keys_list = [[key, value["key"],value["inTools"]] for key, value in api_keys.items()]
-
-                self.model = TableModel(self.api_keys_list)
-                self.APIData.setModel(self.model)
-                self.APIData.setColumnWidth(0,percentSize(self.main_window,20,0)[0])
-                self.APIData.setColumnWidth(1,percentSize(self.main_window,43,0)[0])
-                self.APIData.setColumnWidth(2,percentSize(self.main_window,25,0)[0])
-                self.APIData.horizontalHeader().setStretchLastSection(True)
-
-                self.model.dataChanged.connect(self.on_data_changed)  # Connect dataChanged signal to slot
-                self.data_layout.addWidget(self.APIData)
-                self.data_layout.addLayout(self.btns_layout)
-                self.data_widget.setLayout(self.data_layout)
-                self.stacked_widget.addWidget(self.data_widget)
-                
-                self.stacked_widget.setCurrentWidget(self.data_widget)
+            self.showAPITable()
                 
         except ValueError:
             show_message_box("Error","Failed to Decrypt the API keys, Invalid Password",QMessageBox.Critical)
+
+    def showAPITable(self):
+        from manageapis import TableModel
+        if self.data_widget is None:
+
+            self.data_widget = QWidget()
+            self.data_layout = QVBoxLayout()
+            self.api_keys_list = self.session.as_list()
+
+            self.model = TableModel(self.api_keys_list)
+            self.APIData.setModel(self.model)
+            self.APIData.setColumnWidth(0,percentSize(self.main_window,20,0)[0])
+            self.APIData.setColumnWidth(1,percentSize(self.main_window,43,0)[0])
+            self.APIData.setColumnWidth(2,percentSize(self.main_window,25,0)[0])
+            self.APIData.horizontalHeader().setStretchLastSection(True)
+
+            self.model.dataChanged.connect(self.on_data_changed)  # Connect dataChanged signal to slot
+            self.data_layout.addWidget(self.APIData)
+            self.data_layout.addLayout(self.btns_layout)
+            self.data_widget.setLayout(self.data_layout)
+            self.stacked_widget.addWidget(self.data_widget)
             
+        self.stacked_widget.setCurrentWidget(self.data_widget)
+        
 
     def validate_passwords(self):
+        from manageapis import show_message_box
         new_password = self.input_new_password.text()
         repeat_password = self.input_repeat_password.text()
 
         if new_password == repeat_password:
-            apiKeys(new_password)
+            self.session.create(new_password)
             show_message_box("Success","Encrypted API Keys with new Password",QMessageBox.Information)
-            print("Passwords match!")
-            # self.__init__(self.main_window)
-            self.stacked_widget.setCurrentWidget(self.pass_form_widget)
+            self.showAPITable()
             
         else:
-            print("Passwords do not match. Please try again.")
+            show_message_box("Error","Passwords do not match. Please try again.",QMessageBox.Warning)
 
     def on_data_changed(self, top_left, bottom_right):
         for row in range(top_left.row(), bottom_right.row() + 1):
@@ -813,74 +1394,90 @@ class APIKeys(QWidget):
                 index = self.model.index(row, column)
                 value = self.model.data(index, Qt.DisplayRole)
                 self.changed_values.append((row, column, value))
-                print('test changes:',self.changed_values)
 
     def save_api_data(self, text):
+        # returns the APISyncWorker saving the keys, None when nothing was started
+        from manageapis import unlock_prompt
+        if not unlock_prompt(self.main_window, self.session):
+            return None
         for i,j,keys in self.changed_values:
             self.api_keys_list[i][j] = keys
 
-        update_api_keys = {item[0]: {"key":item[1],"inTools":item[2]} for item in self.api_keys_list}
-
-        apiKeys(self.enc_pass, update_api_keys)
-        
         #-------- Adding API keys in supported tools ----------------
-        try:
-            for api in self.api_keys_list:
-                # api[0]=name, api[1]=key, api[2]=inTools
-
-                if 'Recon-NG' in api[2]:    
-                    subprocess.run(["sqlite3", "/home/csi/.recon-ng/keys.db", f'UPDATE keys SET Value = "{api[1]}" WHERE name="{api[0]}";'])
-                if 'hades' in api[0]:  
-                    subprocess.run(["sed", "-i", "s/atiikey=''/atiikey='$key'/g", "/opt/csitools/ProjectHades"])
-                if 'Spiderfoot' in api[2]:
-                    #improve it more
-                    search_term = api[0]    # e.g. shodan_api = [shodan,api]  to search into spiderfoot config
-                    # Using regex for finding the api name dynamically.
-                    subprocess.run(["sed", "-i", "-E", f"s/(^sfp.*{search_term[0]}.*{search_term[1]}.*=)(key value)?/\\1{api[1]}/", "/opt/csitools/SpiderFoot.cfg"])
-        
-        except Exception as e:
-            print("Got error during adding API data to supported tools!")
-            print(e)
-                
-        
-        show_message_box("Success",text)
+        return self.startSync("save", text)
 
     def wipe_data(self):
+        from manageapis import show_message_box, unlock_prompt
         result = show_message_box("Confirmation", "Do you want to proceed?", QMessageBox.Question, QMessageBox.Yes | QMessageBox.No)
         if result == QMessageBox.Yes:
-            empty_api_keys = {item[0]: {"key":'',"inTools":item[2]} for item in self.api_keys_list}
-            
-            apiKeys(enc_pass, empty_api_keys)
-            
-            try:
-                # Wiping data from supported tools using bash commands for better readability
-                subprocess.run(["cp", "/opt/theHarvester/api-backup","/opt/theHarvester/api-keys.yaml"])
-                subprocess.run(["cp", "/opt/OSINT-Search/osintSearch.config.back", "/opt/OSINT-Search/osintSearch.config.ini"])
-                subprocess.run(["cp", "/opt/csitools/SpiderFoot.empty", "/opt/csitools/SpiderFoot.cfg"])
-                for api in self.api_keys_list:  # api[0], first entry is name
-                    if 'Recon-NG' in api[2]:
-                        subprocess.run(["sqlite3", "/home/csi/.recon-ng/keys.db", f'UPDATE keys SET Value = "" WHERE name="{api[0]}";'])
-            except Exception as e:
-                print("Got error during wiping API data from supported tools!")
-                print(e)
-
-            show_message_box("Success","Data Removed From APIKeys, Recon-NG, theHarvester, OSINT-Search and SpiderFoot Successfully!",QMessageBox.Information)
-
-            self.setupUi(self.main_window)
+            if not unlock_prompt(self.main_window, self.session):
+                return
+            self.startSync("wipe", "Data Removed From APIKeys, Recon-NG, theHarvester, OSINT-Search and SpiderFoot Successfully!")
+
+    def startSync(self, mode, text):
+        # encryption and tool updates run in APISyncWorker, the GUI only shows progress
+        from manageapis import APISyncWorker, show_message_box
+        if self.worker is not None:
+            show_message_box("Busy", "The API keys are still being saved, try again once it is done.", QMessageBox.Warning)
+            return None
+        self.saveBtn.setEnabled(False)
+        self.wipeBtn.setEnabled(False)
+        self.cancelBtn = QPushButton("Cancel")
+        self.main_window.status_bar.addPermanentWidget(self.cancelBtn)
+
+        self.worker = APISyncWorker(self.session, [list(api) for api in self.api_keys_list], mode, self)
+        self.worker.progress.connect(self.main_window.update_status)
+        self.worker.done.connect(functools.partial(self.syncFinished, mode, text))
+        self.cancelBtn.clicked.connect(self.worker.cancel)
+        self.worker.start()
+        return self.worker
+
+    def stopSync(self):
+        # on quit: the tool being updated is finished, the others are left as they were
+        if self.worker is not None:
+            self.worker.requestInterruption()
+            self.worker.wait()
+
+    def syncFinished(self, mode, text, results):
+        from manageapis import show_message_box
+        self.worker.wait()
+        self.worker = None
+        self.main_window.status_bar.removeWidget(self.cancelBtn)
+        self.cancelBtn.deleteLater()
+        self.saveBtn.setEnabled(True)
+        self.wipeBtn.setEnabled(True)
+        self.main_window.status_bar.clearMessage()
+
+        summary = sync_summary(results)
+        if sync_failed(results):
+            show_message_box("Warning", f"Some tools were not updated:\n\n{summary}", QMessageBox.Warning)
+        else:
+            show_message_box("Success", f"{text}\n\n{summary}")
+
+        if mode == "wipe":
+            self.refreshTable()
+
+    def refreshTable(self):
+        # reloads the table rows from the session without decrypting again
+        self.model.beginResetModel()
+        self.api_keys_list[:] = self.session.as_list()
+        self.changed_values = []
+        self.model.endResetModel()
         
     
     def add_APIentry(self):
+        from manageapis import newAPIDialog
         dialog = newAPIDialog(self,"add")
         dialog.exec_()
         dialog.finished.connect(self.dialog_finished)
     
     def rm_APIentry(self):
+        from manageapis import newAPIDialog
         dialog = newAPIDialog(self,"remove")
         dialog.exec_()
         dialog.finished.connect(self.dialog_finished)
 
     def dialog_finished(self, result):
-        print("reached here")
         self.__init__(self.main_window)
     
     def change_theme(self, mode):
@@ -910,28 +1507,37 @@ class BaseCSIWidget(QWidget):
 
         self.setLayout(self.main_layout)
 
-if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    # Create the main window
+def createMainWindow(app, warm_up=False):
+    # main window with its tabs, not shown yet
     main_window = CSIMainWindow()
 
-    widget1 = AgencyInfoTab(main_window)
-    widget2 = sysFileEditTab(main_window, "Keyword Lists", KeywordLists.dir_path, ui.PAGE, ['txt'])     
+    # tabs are built the first time they are selected
+    widget1 = functools.partial(AgencyInfoTab, main_window)
+    widget2 = functools.partial(keywordListTab, main_window, "Keyword Lists", KeywordLists.dir_path, ui.PAGE, ['txt', 'txt.gz', 'txt.zst'])
     
     # Siteslists, conveted into sqlitedb
-    # widget3 = sysFileEditTab(main_window, "Sites Lists", pathme("sites"), ui.LAPTOP, ['json'])    
+    # widget3 = functools.partial(sysFileEditTab, main_window, "Sites Lists", pathme("sites"), ui.LAPTOP, ['json'])
     
-    widget4 = templateTab(main_window, "Report Templates", Templates.dir_path , ['docx','odt']) 
-    widget5 = APIKeys(main_window) 
+    widget4 = functools.partial(templateTab, main_window, "Report Templates", Templates.dir_path , ['docx','odt'])
+    widget5 = functools.partial(APIKeys, main_window)
     
-    tabs = BaseCSITabs({"Agency Info":widget1, 'Keyword Lists':widget2, 'Report Templates': widget4, 'API Keys': widget5})
+    tabs = BaseCSITabs({"Agency Info":widget1, 'Keyword Lists':widget2, 'Report Templates': widget4, 'API Keys': widget5},
+                       warm_up=warm_up)
     
     main_window.setCentralWidget(tabs)
     main_window.set_application(app)
     
     qdarktheme.setup_theme()
+    return main_window
+
+if __name__ == "__main__":
+    app = QApplication(sys.argv)
+    # Create the main window
+    # CSI_WARM_TABS=enable builds the remaining tabs in the background once the window is up
+    main_window = createMainWindow(app, warm_up=os.environ.get("CSI_WARM_TABS") == 'enable')
     
     # Show the main window
     main_window.show()
+    perftrace.mark("window shown")
     # Start the applicaStion event loop
     sys.exit(app.exec_())
@@ -0,0 +1,85 @@
+import copy, time
+
+import perftrace
+from csilibs.data import apiKeys
+
+# seconds of inactivity after which an unlocked session locks itself again
+DEFAULT_TIMEOUT = 15 * 60
+
+
+class SessionLocked(Exception):
+    """Raised when the API keys are used while the session is locked or expired."""
+
+
+class APIKeySession:
+    """Unlocked view of the encrypted API keys file.
+
+    The password is checked (and the file decrypted) once per unlock, after which
+    the keys are served from memory until lock() is called or `timeout` seconds
+    pass without the session being used. Only saves go back to the file.
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT):
+        self.timeout = timeout
+        self._password = None
+        self._api_keys = None
+        self._last_used = 0.0
+
+    @staticmethod
+    def is_store_available():
+        # no password given, so csilibs only checks whether the file exists
+        is_enc_file, _ = apiKeys()
+        return is_enc_file
+
+    def create(self, password):
+        # encrypts a fresh API keys file with the given password and unlocks it
+        with perftrace.span("apikeys.encrypt", keys=0):
+            apiKeys(password)
+        return self.unlock(password)
+
+    def unlock(self, password):
+        # raises ValueError when the password can't decrypt the file
+        with perftrace.span("apikeys.decrypt") as decrypt_span:
+            _, api_keys = apiKeys(password)
+            decrypt_span.fields["keys"] = len(api_keys)
+        self._password = password
+        self._api_keys = api_keys
+        self._touch()
+        return self.api_keys
+
+    def lock(self):
+        self._password = None
+        self._api_keys = None
+
+    @property
+    def unlocked(self):
+        if self._password is None:
+            return False
+        if self.timeout and time.monotonic() - self._last_used > self.timeout:
+            self.lock()
+            return False
+        return True
+
+    @property
+    def api_keys(self):
+        self._check()
+        return copy.deepcopy(self._api_keys)
+
+    def as_list(self):
+        # rows used by the API tables: [name, key, inTools]
+        self._check()
+        return [[key, value["key"], value["inTools"]] for key, value in self._api_keys.items()]
+
+    def save(self, api_keys):
+        self._check()
+        with perftrace.span("apikeys.encrypt", keys=len(api_keys)):
+            apiKeys(self._password, api_keys)
+        self._api_keys = copy.deepcopy(api_keys)
+
+    def _check(self):
+        if not self.unlocked:
+            raise SessionLocked("API keys are locked, enter the password again.")
+        self._touch()
+
+    def _touch(self):
+        self._last_used = time.monotonic()
@@ -0,0 +1,155 @@
+# Fills one template for every row of a CSV, JSON-lines or JSON (array of
+# objects) dataset, rendering the reports in parallel worker processes.
+#
+# Columns are template variables, except "img:<member>" columns which give the
+# image replacing that member of the template (e.g. img:word/media/image1.png),
+# "img:<n>" replaces the n-th image. Empty values are left unfilled.
+import os, re, csv, json, time, traceback
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from templatezip import render_template
+
+DEFAULT_NAME_PATTERN = "{template}_{row:04d}"
+IMAGE_PREFIX = "img:"
+
+# row: 1-based dataset row, output: report path, error: None or the reason it failed
+BatchResult = namedtuple("BatchResult", ["row", "output", "error"])
+# error of the rows left unrendered when the batch is cancelled
+CANCELLED = "cancelled"
+
+
+def load_dataset(dataset_path):
+    # list of dicts, one per variable set
+    if dataset_path.lower().endswith(".csv"):
+        with open(dataset_path, newline='', encoding='utf-8-sig') as f:
+            return list(csv.DictReader(f))
+
+    with open(dataset_path, encoding='utf-8') as f:
+        text = f.read()
+    if dataset_path.lower().endswith(".json") and text.lstrip().startswith('['):
+        rows = json.loads(text)
+        for row_no, row in enumerate(rows, 1):
+            if not isinstance(row, dict):
+                raise ValueError(f"{dataset_path}: item {row_no} of the array isn't a JSON object")
+        return rows
+
+    # JSON lines, one object per line (.jsonl, or a .json written that way)
+    rows = []
+    for line_no, line in enumerate(text.splitlines(), 1):
+        if line.strip():
+            row = json.loads(line)
+            if not isinstance(row, dict):
+                raise ValueError(f"{dataset_path}:{line_no}: expected a JSON object")
+            rows.append(row)
+    return rows
+
+
+def split_row(row):
+    # (variables, images) of one dataset row
+    var_val_dict, img_dict = {}, {}
+    for column, value in row.items():
+        if value is None or value == '':
+            continue
+        if column.startswith(IMAGE_PREFIX):
+            img_dict[image_key(column[len(IMAGE_PREFIX):])] = str(value)
+        else:
+            var_val_dict[column] = str(value)
+    return var_val_dict, img_dict
+
+
+def image_key(key):
+    # member name, or position of the image in the template
+    return int(key) if key.isdigit() else key
+
+
+def output_name(name_pattern, row_number, var_val_dict, template_path):
+    template_name, file_ext = os.path.splitext(os.path.basename(template_path))
+    # {row} and {template} win over dataset columns of the same name
+    name = name_pattern.format_map({**var_val_dict, "row": row_number, "template": template_name})
+    name = re.sub(r'[\\/\0]', '_', name).strip() or f"{template_name}_{row_number}"
+    return name if name.lower().endswith(file_ext.lower()) else name + file_ext
+
+
+def render_row(template_path, dest_path, var_val_dict, img_dict):
+    render_template(template_path, dest_path, var_val_dict, img_dict)
+
+
+def _render_job(row_number, template_path, dest_path, var_val_dict, img_dict):
+    # runs in a worker process, errors are returned instead of raised so one bad row doesn't stop the batch
+    try:
+        render_row(template_path, dest_path, var_val_dict, img_dict)
+        return BatchResult(row_number, dest_path, None)
+    except Exception as e:
+        return BatchResult(row_number, dest_path, f"{type(e).__name__}: {e}\n{traceback.format_exc(limit=3)}")
+
+
+def _job_result(future, job):
+    # a worker process that died (BrokenProcessPool) fails the rows it had, not the whole batch
+    try:
+        return future.result()
+    except Exception as e:
+        return BatchResult(job[0], job[2], f"{type(e).__name__}: {e}")
+
+
+def write_error_report(results, report_path):
+    with open(report_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["row", "output", "error"])
+        for result in results:
+            if result.error:
+                writer.writerow([result.row, result.output, result.error.strip()])
+
+
+def run_batch(template_path, dataset_path, out_dir, name_pattern=DEFAULT_NAME_PATTERN,
+              max_workers=None, progress=None, cancelled=None):
+    # Renders every row and returns (results, error report path or None).
+    # progress(done, total, result) is called as each report finishes.
+    rows = load_dataset(dataset_path)
+    os.makedirs(out_dir, exist_ok=True)
+
+    results, jobs, used_names = [], [], set()
+    for row_number, row in enumerate(rows, 1):
+        var_val_dict, img_dict = split_row(row)
+        try:
+            name = output_name(name_pattern, row_number, var_val_dict, template_path)
+        except (KeyError, IndexError, ValueError, TypeError, AttributeError) as e:
+            results.append(BatchResult(row_number, '', f"Output name pattern: {type(e).__name__}: {e}"))
+            continue
+        if name in used_names:
+            results.append(BatchResult(row_number, os.path.join(out_dir, name), "Output name already used by an earlier row"))
+            continue
+        used_names.add(name)
+        jobs.append((row_number, template_path, os.path.join(out_dir, name), var_val_dict, img_dict))
+
+    total = len(rows)
+    for result in results:
+        if progress:
+            progress(len(results), total, result)
+
+    if jobs:
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = {pool.submit(_render_job, *job): job for job in jobs}
+            for future in as_completed(futures):
+                if cancelled and cancelled():
+                    for pending in futures:
+                        pending.cancel()
+                    break
+                result = _job_result(future, futures[future])
+                results.append(result)
+                if progress:
+                    progress(len(results), total, result)
+        # after a cancel: leaving the pool waited for the reports already rendering,
+        # the rows that never started are reported as cancelled
+        done_rows = {result.row for result in results}
+        for future, job in futures.items():
+            if job[0] not in done_rows:
+                results.append(BatchResult(job[0], None, CANCELLED) if future.cancelled() else _job_result(future, job))
+
+    results.sort(key=lambda result: result.row)
+    report_path = None
+    if any(result.error for result in results):
+        report_path = os.path.join(out_dir, f"batch_errors_{time.strftime('%Y%m%d_%H%M%S')}.csv")
+        write_error_report(results, report_path)
+    return results, report_path
@@ -0,0 +1,110 @@
+# Helpers shared by the benchmark scripts: running a measurement in a fresh
+# offscreen process, memory readings, summaries and the JSON results file.
+#
+# Every measurement runs in its own interpreter (run_child), so import times are
+# cold and one run's caches, widgets or peak RSS never leak into the next.
+import os, sys, json, time, platform, resource, statistics, subprocess
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def ms(seconds):
+    return round(seconds * 1000, 3)
+
+
+def peak_rss_kb():
+    # high-water mark of the process (Linux reports it in KB)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def current_rss_kb():
+    with open("/proc/self/statm") as f:
+        resident_pages = int(f.read().split()[1])
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") // 1024
+
+
+def child_env(home):
+    # offscreen Qt, the fixtures' home (thumbnail/list caches land there) and the repo on the path
+    env = dict(os.environ)
+    env["QT_QPA_PLATFORM"] = "offscreen"
+    env["HOME"] = home
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [REPO_DIR, BENCH_DIR, env.get("PYTHONPATH")]))
+    return env
+
+
+def run_child(script, args, env, timeout=600):
+    # runs `python3 script args...`, returns the JSON object it printed last on stdout
+    started = time.time()
+    proc = subprocess.run([sys.executable, script, *args], env=env, capture_output=True, text=True, timeout=timeout)
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        raise RuntimeError(f"{os.path.basename(script)} {' '.join(args)} failed ({proc.returncode}):\n{proc.stderr[-2000:]}")
+    result = json.loads(lines[-1])
+    result["spawned_at"] = started
+    return result
+
+
+def emit(result):
+    # the child's side of run_child: print the result and leave without running Qt's teardown
+    print(json.dumps(result), flush=True)
+    sys.stderr.flush()
+    os._exit(0)
+
+
+def wait_until(app, condition, timeout=300):
+    # processes events until condition() is true, returns the seconds waited or None on timeout
+    started = time.perf_counter()
+    while not condition():
+        if time.perf_counter() - started > timeout:
+            return None
+        app.processEvents()
+        time.sleep(0.001)
+    return time.perf_counter() - started
+
+
+def summarize(runs):
+    # {metric: {"min", "median", "max"}} over the numbers found in every run, nested dicts flattened with "."
+    def numbers(result, prefix=""):
+        for key, value in result.items():
+            if isinstance(value, dict):
+                yield from numbers(value, f"{prefix}{key}.")
+            elif isinstance(value, (int, float)) and not isinstance(value, bool) and key != "spawned_at":
+                yield f"{prefix}{key}", value
+
+    values = {}
+    for result in runs:
+        for key, value in numbers(result):
+            values.setdefault(key, []).append(value)
+    return {key: {"min": min(vals), "median": round(statistics.median(vals), 3), "max": max(vals)}
+            for key, vals in values.items() if len(vals) == len(runs)}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def write_results(path, benchmark, params, results):
+    # one JSON document per run of a benchmark script, to path or stdout ("-")
+    document = {
+        "benchmark": benchmark,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "params": params,
+        "results": results,
+    }
+    if path == "-":
+        json.dump(document, sys.stdout, indent=2)
+        print()
+    else:
+        with open(path, 'w') as f:
+            json.dump(document, f, indent=2)
+            f.write("\n")
+    return document
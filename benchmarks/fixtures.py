@@ -0,0 +1,158 @@
+# Synthetic CSI Manager data for the benchmarks: agency info, keyword lists,
+# report templates (.docx/.odt with placeholders, parts and images) and API keys,
+# all generated under one scratch directory.
+#
+# use_fixtures() points csilibs.data and apisession at that directory, so a
+# benchmark never reads or writes the analyst's real files. The API keys store
+# is plain JSON: the benchmarks time the GUI, not the key derivation.
+import os, json, zlib, struct, random, zipfile
+
+AGENCY_FIELDS = ["agency_name", "agency_address", "agency_phone", "agency_email", "agency_website",
+                 "investigator_name", "investigator_title", "cases_folder"]
+FIXTURE_PASSWORD = "benchmark"
+TOOLS = ["OSINT-Search", "Recon-NG", "Spiderfoot", "theHarvester", "CSI UserSearch"]
+
+_DOCX_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+_ODT_NS = ('xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0" '
+           'xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0"')
+
+
+def fixture_paths(root):
+    return {"agency": os.path.join(root, "agency.json"),
+            "keywords": os.path.join(root, "keywordlists"),
+            "templates": os.path.join(root, "templates"),
+            "api_keys": os.path.join(root, "apikeys.json"),
+            "home": os.path.join(root, "home")}
+
+
+def make_agency(path):
+    with open(path, 'w') as f:
+        json.dump({field: f"Benchmark {field.replace('_', ' ')}" for field in AGENCY_FIELDS}, f)
+
+
+def make_keyword_lists(lists_dir, count, lines=100, seed=0, prefix="list_"):
+    # count lists of `lines` terms each, names sorted like the analysts' ones (list_00001.txt...)
+    os.makedirs(lists_dir, exist_ok=True)
+    rng = random.Random(seed)
+    width = len(str(count))
+    for i in range(count):
+        with open(os.path.join(lists_dir, f"{prefix}{i:0{width}d}.txt"), 'w') as f:
+            f.writelines(f"term{rng.randrange(10 ** 6)}-{j}\n" for j in range(lines))
+
+
+def png_bytes(width=64, height=64, seed=0):
+    # a valid RGB PNG of noise, so image members compress like real photos
+    rng = random.Random(seed)
+    rows = b''.join(b'\x00' + bytes(rng.getrandbits(8) for _ in range(width * 3)) for _ in range(height))
+
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(rows)) + chunk(b'IEND', b''))
+
+
+def placeholder_names(count):
+    return [f"var_{i}" for i in range(count)]
+
+
+def _docx_paragraph(name, split):
+    # Word often splits "<name>" over runs, every other placeholder is written that way
+    if split:
+        half = len(name) // 2
+        runs = [f"&lt;{name[:half]}", f"{name[half:]}&gt;"]
+    else:
+        runs = [f"&lt;{name}&gt;"]
+    return "<w:p><w:r><w:t>Field: </w:t></w:r>" + "".join(f"<w:r><w:t>{run}</w:t></w:r>" for run in runs) + "</w:p>"
+
+
+def _docx_part(root_tag, names):
+    body = "".join(_docx_paragraph(name, i % 2) for i, name in enumerate(names))
+    if root_tag == "document":
+        body = f"<w:body>{body}</w:body>"
+    return f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><w:{root_tag} xmlns:w="{_DOCX_NS}">{body}</w:{root_tag}>'
+
+
+def make_docx(path, placeholders=10, parts=1, images=0, image_size=64):
+    # parts: the body plus parts - 1 headers/footers, the placeholders are spread over all of them
+    names = placeholder_names(placeholders)
+    part_names = ["word/document.xml"] + [f"word/{'header' if i % 2 else 'footer'}{i}.xml" for i in range(1, parts)]
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", '<?xml version="1.0" encoding="UTF-8"?>'
+                    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types"/>')
+        for i, part_name in enumerate(part_names):
+            root_tag = "document" if i == 0 else ("hdr" if "header" in part_name else "ftr")
+            zf.writestr(part_name, _docx_part(root_tag, names[i::len(part_names)]))
+        for i in range(images):
+            zf.writestr(f"word/media/image{i + 1}.png", png_bytes(image_size, image_size, seed=i))
+
+
+def make_odt(path, placeholders=10, parts=1, images=0, image_size=64):
+    # an odt only has content.xml and styles.xml, parts > 1 puts placeholders in both
+    names = placeholder_names(placeholders)
+    part_names = ["content.xml", "styles.xml"][:max(1, min(parts, 2))]
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("mimetype", "application/vnd.oasis.opendocument.text", compress_type=zipfile.ZIP_STORED)
+        zf.writestr("META-INF/manifest.xml", '<?xml version="1.0" encoding="UTF-8"?>'
+                    '<manifest:manifest xmlns:manifest="urn:oasis:names:tc:opendocument:xmlns:manifest:1.0"/>')
+        for i, part_name in enumerate(part_names):
+            paras = "".join(f"<text:p>Field: &lt;{name}&gt;</text:p>" for name in names[i::len(part_names)])
+            root_tag = "office:document-content" if part_name == "content.xml" else "office:document-styles"
+            zf.writestr(part_name, f'<?xml version="1.0" encoding="UTF-8"?><{root_tag} {_ODT_NS}>'
+                                   f'<office:body><office:text>{paras}</office:text></office:body></{root_tag}>')
+        for i in range(images):
+            zf.writestr(f"Pictures/image{i + 1}.png", png_bytes(image_size, image_size, seed=i))
+
+
+def make_templates(templates_dir, count, placeholders=20, parts=2, images=2):
+    # count templates, alternating .docx and .odt
+    os.makedirs(templates_dir, exist_ok=True)
+    for i in range(count):
+        make = make_docx if i % 2 == 0 else make_odt
+        make(os.path.join(templates_dir, f"template_{i}{'.docx' if i % 2 == 0 else '.odt'}"),
+             placeholders, parts, images)
+
+
+def make_api_keys(path, count):
+    api_keys = {f"service_{i}": {"key": f"{i:032x}", "inTools": [TOOLS[i % len(TOOLS)]]} for i in range(count)}
+    with open(path, 'w') as f:
+        json.dump({"password": FIXTURE_PASSWORD, "api_keys": api_keys}, f)
+
+
+class FixtureKeyStore:
+    # stands in for csilibs.data.apiKeys(password=None, new_data=None) -> (file exists, keys)
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, password=None, new_data=None):
+        if password is None:
+            return os.path.exists(self.path), None
+        if new_data is not None or not os.path.exists(self.path):
+            with open(self.path, 'w') as f:
+                json.dump({"password": password, "api_keys": new_data or {}}, f)
+        with open(self.path) as f:
+            stored = json.load(f)
+        if stored["password"] != password:
+            raise ValueError("Wrong password")
+        return True, stored["api_keys"]
+
+
+def make_fixtures(root, keyword_lists=100, templates=10, api_keys=20, list_lines=100):
+    paths = fixture_paths(root)
+    os.makedirs(paths["home"], exist_ok=True)
+    make_agency(paths["agency"])
+    make_keyword_lists(paths["keywords"], keyword_lists, list_lines)
+    make_templates(paths["templates"], templates)
+    make_api_keys(paths["api_keys"], api_keys)
+    return paths
+
+
+def use_fixtures(root):
+    # redirects the CSI Manager data paths to the fixtures under root
+    from csilibs.data import agencyData, Templates, KeywordLists
+    import apisession
+    paths = fixture_paths(root)
+    agencyData.file_path = paths["agency"]
+    KeywordLists.dir_path = paths["keywords"]
+    Templates.dir_path = paths["templates"]
+    apisession.apiKeys = FixtureKeyStore(paths["api_keys"])
+    return paths
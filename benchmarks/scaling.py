@@ -0,0 +1,238 @@
+# Scaling benchmark: time and memory of the file galleries and the template fill
+# dialog as their input grows, written as curves (one point per size) so a change
+# can be shown to improve the growth rate and not just one data point.
+#
+#   grid      a sysFileEditTab over N files: createGrid, building and showing the
+#             tab, deleting one file through imgAction, importing N more files
+#             through exportFile (its file and message dialogs answered by the
+#             benchmark)
+#   template  opening varValTemplDialog on a generated .docx/.odt while one of
+#             placeholders, parts or images grows (the others stay at their base
+#             value): cold (template scanned, thumbnails decoded) and warm
+#
+# Every point runs in a fresh offscreen process. Each curve also gets the slope
+# of log(time) against log(N): about 1 is linear, about 2 quadratic.
+#
+#   python3 benchmarks/scaling.py grid --sizes 100,1000,10000,50000 -o grid.json
+#   python3 benchmarks/scaling.py template --vary images --sizes 0,10,100,500 -o images.json
+import os, sys, math, time, argparse, tempfile
+
+from benchutil import ms, current_rss_kb, child_env, run_child, emit, wait_until, summarize, write_results
+import fixtures
+
+DEFAULT_SIZES = {
+    "grid": [100, 500, 1000, 5000, 10000, 50000],
+    "placeholders": [10, 50, 100, 500, 1000, 5000],
+    "parts": [1, 2, 5, 10, 50, 100],
+    "images": [0, 5, 10, 50, 100, 200],
+}
+# template dimensions when they are not the one growing
+TEMPLATE_BASE = {"placeholders": 50, "parts": 3, "images": 5}
+IMAGE_SIZE = 256
+
+
+def qt_app(root):
+    # CSI_Manager with the fixtures' paths, a QApplication and a main window to parent the widgets
+    import CSI_Manager
+    fixtures.use_fixtures(root)
+    app = CSI_Manager.QApplication([])
+    main_window = CSI_Manager.CSIMainWindow()
+    main_window.set_application(app)
+    main_window.resize(1280, 800)
+    return CSI_Manager, app, main_window
+
+
+def answer_dialogs(CSI_Manager, open_files):
+    # message boxes answer Yes at once, the file picker returns open_files (a list, filled in later)
+    class AnsweredMessageBox(CSI_Manager.QMessageBox):
+        def exec_(self):
+            return CSI_Manager.QMessageBox.Yes
+        exec = exec_
+
+    class ScriptedFileDialog(CSI_Manager.QFileDialog):
+        @staticmethod
+        def getOpenFileNames(*args, **kwargs):
+            return list(open_files), ""
+
+    CSI_Manager.QMessageBox = AnsweredMessageBox
+    CSI_Manager.QFileDialog = ScriptedFileDialog
+
+
+def bench_grid(root, n):
+    CSI_Manager, app, main_window = qt_app(root)
+    open_files = []
+    answer_dialogs(CSI_Manager, open_files)
+    lists_dir = fixtures.fixture_paths(root)["keywords"]
+
+    class TimedTab(CSI_Manager.sysFileEditTab):
+        def createGrid(self):
+            started = time.perf_counter()
+            super().createGrid()
+            self.grid_seconds = time.perf_counter() - started
+
+    rss_before = current_rss_kb()
+    started = time.perf_counter()
+    tab = TimedTab(main_window, "Keyword Lists", lists_dir, CSI_Manager.ui.PAGE, ['txt'])
+    built = time.perf_counter()
+    main_window.setCentralWidget(tab)
+    main_window.show()
+    app.processEvents()
+    shown = time.perf_counter()
+    rss_shown = current_rss_kb()
+
+    # delete the file in the middle of the rows the view has loaded
+    tab.del_btn.setChecked(True)
+    index = tab.model.index(tab.model.rowCount() // 2, 0)
+    deleted_name = index.data(CSI_Manager.Qt.DisplayRole)
+    delete_started = time.perf_counter()
+    tab.imgAction(index)
+    app.processEvents()
+    deleted = time.perf_counter()
+    if os.path.exists(os.path.join(lists_dir, deleted_name)):
+        raise RuntimeError(f"imgAction didn't delete {deleted_name}")
+
+    # import n new files, until importFinished has added them to the grid
+    src_dir = os.path.join(root, "import")
+    fixtures.make_keyword_lists(src_dir, n, lines=1, prefix="import_")
+    open_files.extend(os.path.join(src_dir, name) for name in sorted(os.listdir(src_dir)))
+    import_started = time.perf_counter()
+    tab.exportFile(['txt'])
+    wait_until(app, lambda: tab.import_worker is None)
+    imported = time.perf_counter()
+    if len(tab.model.file_names) != 2 * n - 1:
+        raise RuntimeError(f"{len(tab.model.file_names)} files in the grid after the import, expected {2 * n - 1}")
+
+    return {
+        "create_grid_ms": ms(tab.grid_seconds),
+        "build_tab_ms": ms(built - started),
+        "show_ms": ms(shown - built),
+        "delete_one_ms": ms(deleted - delete_started),
+        "import_ms": ms(imported - import_started),
+        "rss_shown_kb": rss_shown - rss_before,
+        "rss_imported_kb": current_rss_kb() - rss_before,
+    }
+
+
+def bench_template(root, kind, dims):
+    CSI_Manager, app, main_window = qt_app(root)
+    from thumbnails import sharedThumbnailCache
+    templates_dir = fixtures.fixture_paths(root)["templates"]
+    file_name = f"bench.{kind}"
+    make = fixtures.make_docx if kind == "docx" else fixtures.make_odt
+    make(os.path.join(templates_dir, file_name), dims["placeholders"], dims["parts"], dims["images"], IMAGE_SIZE)
+
+    thumbnails_ready = []
+    sharedThumbnailCache().ready.connect(lambda key, member, pixmap: thumbnails_ready.append(member))
+
+    def open_dialog():
+        started = time.perf_counter()
+        dialog = CSI_Manager.varValTemplDialog(main_window, templates_dir, file_name)
+        dialog.show()
+        app.processEvents()
+        return dialog, time.perf_counter() - started
+
+    rss_before = current_rss_kb()
+    dialog, cold_seconds = open_dialog()
+    images = len(dialog.imgs_loc)
+    thumbs_seconds = cold_seconds + (wait_until(app, lambda: len(thumbnails_ready) >= images) or 0)
+    rss_open = current_rss_kb() - rss_before
+    if len(dialog.var_names) != dims["placeholders"]:
+        raise RuntimeError(f"{len(dialog.var_names)} placeholders found, expected {dims['placeholders']}")
+    dialog.close()
+    dialog.deleteLater()
+    app.processEvents()
+
+    # second opening: template index and thumbnail cache hits
+    dialog, warm_seconds = open_dialog()
+    dialog.close()
+
+    return {
+        "open_cold_ms": ms(cold_seconds),
+        "thumbnails_ms": ms(thumbs_seconds),
+        "open_warm_ms": ms(warm_seconds),
+        "rss_open_kb": rss_open,
+    }
+
+
+def log_slope(points, metric):
+    # least squares slope of log(metric) over log(n), None with fewer than 2 usable points
+    xy = [(math.log(point["n"]), math.log(point["summary"][metric]["median"]))
+          for point in points if point["n"] > 0 and point["summary"].get(metric, {}).get("median", 0) > 0]
+    if len(xy) < 2:
+        return None
+    mean_x = sum(x for x, _ in xy) / len(xy)
+    mean_y = sum(y for _, y in xy) / len(xy)
+    variance = sum((x - mean_x) ** 2 for x, _ in xy)
+    if variance == 0:
+        return None
+    return round(sum((x - mean_x) * (y - mean_y) for x, y in xy) / variance, 3)
+
+
+def curves(points):
+    # {metric: {"points": [[n, median, min, max], ...], "slope": ...}}
+    metrics = points[0]["summary"].keys() if points else []
+    return {metric: {"points": [[point["n"], point["summary"][metric]["median"], point["summary"][metric]["min"],
+                                 point["summary"][metric]["max"]] for point in points],
+                     "slope": log_slope(points, metric)}
+            for metric in metrics}
+
+
+def measure(child_args, sizes, repeat, fixture_files):
+    # runs every size `repeat` times, each in a new process with fresh fixtures
+    points = []
+    with tempfile.TemporaryDirectory(prefix="csi-bench-") as root:
+        for n in sizes:
+            runs = []
+            for i in range(repeat):
+                run_root = os.path.join(root, f"{n}-{i}")
+                paths = fixtures.make_fixtures(run_root, keyword_lists=fixture_files(n), templates=0, api_keys=0, list_lines=1)
+                result = run_child(os.path.abspath(__file__), ["--child", *child_args, "--n", str(n), "--fixtures", run_root],
+                                   child_env(paths["home"]))
+                result.pop("spawned_at")
+                runs.append(result)
+            points.append({"n": n, "runs": runs, "summary": summarize(runs)})
+            print(f"n={n}: " + ", ".join(f"{key} {value['median']}" for key, value in points[-1]["summary"].items()),
+                  file=sys.stderr)
+    return points
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time and memory of the galleries and the fill dialog against their size.")
+    parser.add_argument("target", choices=("grid", "template"))
+    parser.add_argument("--vary", choices=("placeholders", "parts", "images"), default="placeholders",
+                        help="template dimension that grows (template only)")
+    parser.add_argument("--kind", choices=("docx", "odt", "all"), default="all", help="template type (template only)")
+    parser.add_argument("--sizes", help="comma separated values of N (default depends on the target)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per size, each in a new process")
+    parser.add_argument("-o", "--output", default="-", help="results JSON file (default: stdout)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--n", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--fixtures", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        if args.target == "grid":
+            emit(bench_grid(args.fixtures, args.n))
+        emit(bench_template(args.fixtures, args.kind, dict(TEMPLATE_BASE, **{args.vary: args.n})))
+
+    sizes = [int(size) for size in args.sizes.split(',')] if args.sizes else DEFAULT_SIZES[args.target if args.target == "grid" else args.vary]
+    params = {"sizes": sizes, "repeat": args.repeat}
+    results = {}
+    if args.target == "grid":
+        points = measure(["grid"], sizes, args.repeat, lambda n: n)
+        results["grid"] = {"curves": curves(points), "points": points}
+    else:
+        params.update(vary=args.vary, base=TEMPLATE_BASE, image_size=IMAGE_SIZE)
+        # an odt only has two parts that can hold placeholders
+        kinds = ("docx", "odt") if args.kind == "all" else (args.kind,)
+        for kind in kinds:
+            if kind == "odt" and args.vary == "parts":
+                continue
+            points = measure(["template", "--kind", kind, "--vary", args.vary], sizes, args.repeat, lambda n: 0)
+            results[kind] = {"curves": curves(points), "points": points}
+    write_results(args.output, f"scaling-{args.target}" + ("" if args.target == "grid" else f"-{args.vary}"), params, results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
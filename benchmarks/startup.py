@@ -0,0 +1,163 @@
+# Startup benchmark: how long CSI_Manager and manageapis take to become usable.
+# Each run starts a fresh interpreter under QT_QPA_PLATFORM=offscreen against
+# generated fixtures (agency info, N keyword lists, M templates, K API keys) and
+# records, in ms:
+#
+#   import          importing the app module (Qt, csilibs and what it loads at startup)
+#   window          building the main window and its first tab (CSI_Manager),
+#                   or unlocking the keys and setupUi (manageapis)
+#   show            show() and the first round of events
+#   time_to_show    from the top of the child script to the window being shown
+#   launch_to_show  the same from the parent spawning the process, interpreter start included
+#   tabs.<name>     each tab's construction (build) and switching to it (switch)
+#   keyword_index / template_prescan   when the background indexing/prescan finished
+#   peak_rss_kb     the process' peak resident memory
+#
+#   python3 benchmarks/startup.py --lists 1000 --templates 50 --api-keys 40 --repeat 5 -o startup.json
+import os, sys, time, argparse, tempfile
+
+from benchutil import ms, peak_rss_kb, child_env, run_child, emit, wait_until, summarize, write_results
+import fixtures
+
+APPS = ("csi_manager", "manageapis")
+
+
+def slowest_imports(perftrace, count=10):
+    return [{"name": name, "ms": cumulative_us / 1000, "phase": phase}
+            for name, cumulative_us, phase in perftrace.slowest_imports(count)]
+
+
+def trace_imports():
+    # the apps only time their imports when run as a program, not when imported like here
+    import perftrace
+    perftrace.trace_imports()
+
+
+def bench_csi_manager(root):
+    trace_imports()
+    started = time.perf_counter()
+    import CSI_Manager
+    import_done = time.perf_counter()
+    fixtures.use_fixtures(root)
+    app = CSI_Manager.QApplication([])
+
+    window_started = time.perf_counter()
+    main_window = CSI_Manager.createMainWindow(app)
+    window_done = time.perf_counter()
+    main_window.show()
+    app.processEvents()
+    shown = time.perf_counter()
+    shown_at = time.time()
+
+    tabs = main_window.centralWidget()
+    switch_seconds = {}
+    for index in range(tabs.tabwidget.count()):
+        switch_started = time.perf_counter()
+        tabs.tabwidget.setCurrentIndex(index)
+        app.processEvents()
+        switch_seconds[tabs.tabwidget.tabText(index)] = time.perf_counter() - switch_started
+
+    # background work started by the tabs, timed from the top of the script
+    keyword_tab = tabs.tab_widgets["Keyword Lists"]
+    template_tab = tabs.tab_widgets["Report Templates"]
+    wait_until(app, lambda: keyword_tab.index_worker is None or keyword_tab.index_worker.isFinished())
+    keyword_index = time.perf_counter()
+    wait_until(app, template_tab.prescan.isFinished)
+    template_prescan = time.perf_counter()
+
+    return {
+        "import_ms": ms(import_done - started),
+        "window_ms": ms(window_done - window_started),
+        "show_ms": ms(shown - window_done),
+        "time_to_show_ms": ms(shown - started),
+        "shown_at": shown_at,
+        "tabs": {name: {"build_ms": ms(tabs.build_seconds.get(name, 0)), "switch_ms": ms(switch_seconds[name])}
+                 for name in switch_seconds},
+        "keyword_index_ms": ms(keyword_index - started),
+        "template_prescan_ms": ms(template_prescan - started),
+        "peak_rss_kb": peak_rss_kb(),
+        "slowest_imports": slowest_imports(CSI_Manager.perftrace),
+    }
+
+
+def bench_manageapis(root):
+    trace_imports()
+    started = time.perf_counter()
+    import manageapis
+    import_done = time.perf_counter()
+    fixtures.use_fixtures(root)
+    app = manageapis.QtWidgets.QApplication([])
+    manageapis.app = app     # setupUi sizes the window from the module's app
+    manageapis.qdarktheme.setup_theme("light")
+
+    window_started = time.perf_counter()
+    manageapis.session.unlock(fixtures.FIXTURE_PASSWORD)
+    unlocked = time.perf_counter()
+    window = manageapis.QtWidgets.QMainWindow()
+    ui = manageapis.Ui_MainWindow()
+    ui.setupUi(window)
+    window_done = time.perf_counter()
+    window.show()
+    app.processEvents()
+    shown = time.perf_counter()
+    shown_at = time.time()
+
+    return {
+        "import_ms": ms(import_done - started),
+        "unlock_ms": ms(unlocked - window_started),
+        "window_ms": ms(window_done - window_started),
+        "show_ms": ms(shown - window_done),
+        "time_to_show_ms": ms(shown - started),
+        "shown_at": shown_at,
+        "peak_rss_kb": peak_rss_kb(),
+        "slowest_imports": slowest_imports(manageapis.perftrace),
+    }
+
+
+def child(app_name, root):
+    bench = bench_csi_manager if app_name == "csi_manager" else bench_manageapis
+    emit(bench(root))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offscreen startup benchmark of CSI_Manager and manageapis.")
+    parser.add_argument("--lists", type=int, default=200, help="keyword lists in the fixtures")
+    parser.add_argument("--list-lines", type=int, default=100, help="terms per keyword list")
+    parser.add_argument("--templates", type=int, default=20)
+    parser.add_argument("--api-keys", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per app, each in a new process")
+    parser.add_argument("--app", choices=APPS + ("all",), default="all")
+    parser.add_argument("-o", "--output", default="-", help="results JSON file (default: stdout)")
+    parser.add_argument("--child", choices=APPS, help=argparse.SUPPRESS)
+    parser.add_argument("--fixtures", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return child(args.child, args.fixtures)
+
+    apps = APPS if args.app == "all" else (args.app,)
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="csi-bench-") as root:
+        for app_name in apps:
+            runs = []
+            for i in range(args.repeat):
+                # fresh fixtures each time, so no run finds a warm index or cache
+                run_root = os.path.join(root, f"{app_name}-{i}")
+                paths = fixtures.make_fixtures(run_root, args.lists, args.templates, args.api_keys, args.list_lines)
+                env = child_env(paths["home"])
+                # import times are collected by perftrace, the report itself is thrown away
+                env["CSI_IMPORT_TIMES"] = os.devnull
+                result = run_child(os.path.abspath(__file__), ["--child", app_name, "--fixtures", run_root], env)
+                result["launch_to_show_ms"] = ms(result.pop("shown_at") - result.pop("spawned_at"))
+                runs.append(result)
+                print(f"{app_name} run {i + 1}/{args.repeat}: shown after {result['launch_to_show_ms']:.0f} ms", file=sys.stderr)
+            results[app_name] = {"runs": runs, "summary": summarize(runs)}
+
+    params = {"lists": args.lists, "list_lines": args.list_lines, "templates": args.templates,
+              "api_keys": args.api_keys, "repeat": args.repeat}
+    write_results(args.output, "startup", params, results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+# Imports many files into a tab's directory on a pool of threads. Each file is
+# cloned when the filesystem can share its blocks (reflink), else copied by the
+# kernel (copy_file_range) without passing through Python, else copied normally.
+# Hardlinking is opt-in: the imported list would then be the evidence file itself.
+# Files are written under a temporary name and renamed, so the directory never
+# shows a partial file and a cancelled import leaves nothing behind.
+import os, errno, shutil, tempfile
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+try:
+    import fcntl
+except ImportError:     # Windows: no reflinks, the files are copied
+    fcntl = None
+
+FICLONE = 0x40049409    # _IOW(0x94, 9, int) from linux/fs.h
+_CHUNK_SIZE = 1024 * 1024 * 1024
+_READ_SIZE = 1024 * 1024
+# errors meaning "not supported here", the next method is tried
+_UNSUPPORTED = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTTY, errno.EPERM, errno.EBADF}
+
+# method: "reflink", "copy_file_range", "copy", "hardlink" or None when it failed/was cancelled
+ImportResult = namedtuple("ImportResult", ["src", "dest", "method", "error"])
+
+
+class ImportCancelled(Exception):
+    pass
+
+
+def plan_import(src_paths, dest_dir):
+    # (jobs, conflicts): (src, dest) pairs that can be imported as they are, and
+    # those whose name is already taken in dest_dir or by an earlier selected file
+    jobs, conflicts, names = [], [], set()
+    for src in src_paths:
+        name = os.path.basename(src)
+        dest = os.path.join(dest_dir, name)
+        if name in names or os.path.exists(dest):
+            conflicts.append((src, dest))
+        else:
+            jobs.append((src, dest))
+        names.add(name)
+    return jobs, conflicts
+
+
+def _reflink(src_fd, dest_fd):
+    fcntl.ioctl(dest_fd, FICLONE, src_fd)
+
+
+def _copy_file_range(src_fd, dest_fd, size, cancelled):
+    copied = 0
+    while copied < size:
+        if cancelled and cancelled():
+            raise ImportCancelled()
+        count = os.copy_file_range(src_fd, dest_fd, min(size - copied, _CHUNK_SIZE))
+        if count == 0:
+            break
+        copied += count
+
+
+def copy_file(src, dest, allow_hardlink=False, cancelled=None):
+    # copies src to dest (replacing it) with the cheapest method that works, returns its name
+    dest_dir = os.path.dirname(os.path.abspath(dest))
+    if allow_hardlink:
+        tmp_path = os.path.join(dest_dir, f".{os.path.basename(dest)}.{os.getpid()}.link")
+        try:
+            os.link(src, tmp_path)
+            os.replace(tmp_path, dest)
+            return "hardlink"
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED and e.errno not in (errno.EEXIST, errno.EMLINK):
+                raise
+
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(dest)}.", suffix=".part", dir=dest_dir)
+    try:
+        with open(src, 'rb') as src_file, os.fdopen(fd, 'wb') as dest_file:
+            src_fd, dest_fd = src_file.fileno(), dest_file.fileno()
+            size = os.fstat(src_fd).st_size
+            method = None
+            if fcntl is not None:
+                try:
+                    _reflink(src_fd, dest_fd)
+                    method = "reflink"
+                except OSError as e:
+                    if e.errno not in _UNSUPPORTED:
+                        raise
+            if method is None and hasattr(os, "copy_file_range"):
+                try:
+                    _copy_file_range(src_fd, dest_fd, size, cancelled)
+                    method = "copy_file_range"
+                except OSError as e:
+                    if e.errno not in _UNSUPPORTED:
+                        raise
+                    # may have stopped half way (EXDEV on kernels before 5.3), start over
+                    os.lseek(src_fd, 0, os.SEEK_SET)
+                    os.ftruncate(dest_fd, 0)
+                    os.lseek(dest_fd, 0, os.SEEK_SET)
+            if method is None:
+                while chunk := src_file.read(_READ_SIZE):
+                    if cancelled and cancelled():
+                        raise ImportCancelled()
+                    dest_file.write(chunk)
+                method = "copy"
+        shutil.copymode(src, tmp_path)
+        os.replace(tmp_path, dest)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return method
+
+
+def _import_job(src, dest, allow_hardlink, cancelled):
+    if cancelled and cancelled():
+        return ImportResult(src, dest, None, "Cancelled")
+    try:
+        return ImportResult(src, dest, copy_file(src, dest, allow_hardlink, cancelled), None)
+    except ImportCancelled:
+        return ImportResult(src, dest, None, "Cancelled")
+    except OSError as e:
+        return ImportResult(src, dest, None, f"{type(e).__name__}: {e.strerror or e}")
+
+
+def import_files(jobs, max_workers=8, allow_hardlink=False, progress=None, cancelled=None):
+    # Copies the (src, dest) jobs in parallel, returns an ImportResult per job.
+    # progress(done, total, result) is called as each file finishes.
+    results = []
+    if not jobs:
+        return results
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(_import_job, src, dest, allow_hardlink, cancelled) for src, dest in jobs]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if progress:
+                progress(len(results), len(jobs), result)
+    return results
@@ -0,0 +1,325 @@
+# csi-manager: the CSI Manager settings from a shell, for provisioning scripts.
+# Never imports Qt. Modules are imported by the subcommand that needs them, so
+# `--help` and argument errors only cost argparse.
+#
+#   csi-manager agency get [FIELD]            csi-manager agency set FIELD=VALUE...
+#   csi-manager keywords list|add|remove|search ...
+#   csi-manager templates scan NAME           csi-manager templates fill NAME OUTPUT -v VAR=VALUE...
+#   csi-manager api unlock|list|set|sync|wipe ...
+#
+# API commands read the password from --password-file, $CSI_API_PASSWORD or a prompt.
+# CSI_PROFILE=seconds saves a cProfile of the command, see perftrace.
+import os, sys, json, argparse
+
+PASSWORD_ENV = "CSI_API_PASSWORD"
+
+
+def key_value_pairs(pairs, what):
+    # ["a=1", "b=2"] -> {"a": "1", "b": "2"}
+    result = {}
+    for pair in pairs or []:
+        key, sep, value = pair.partition('=')
+        if not sep or not key:
+            raise SystemExit(f"csi-manager: {what} must be NAME=VALUE, got {pair!r}")
+        result[key] = value
+    return result
+
+
+def tool_name(name):
+    # --tools value, only the tools toolsync can write keys to
+    from toolsync import TOOL_SYNC
+    if name not in TOOL_SYNC:
+        raise argparse.ArgumentTypeError(f"unknown tool {name!r} (choose from {', '.join(TOOL_SYNC)})")
+    return name
+
+
+def command_errors():
+    # errors printed as one line instead of a traceback. Only evaluated once a
+    # command raised, so sqlite3/zipfile aren't imported by the others.
+    import sqlite3, zipfile
+    return (OSError, ValueError, RuntimeError, sqlite3.Error, zipfile.BadZipFile)
+
+
+#--------------------------------------------- Agency info ----------------------------------------------#
+
+def agency_get(args):
+    from managercore import load_agency_info
+    agency_info = load_agency_info()
+    if args.field is None:
+        print(json.dumps(agency_info, indent=2))
+    elif args.field in agency_info:
+        print(agency_info[args.field])
+    else:
+        print(f"No agency field {args.field!r}, fields: {', '.join(agency_info)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def agency_set(args):
+    from managercore import set_agency_fields
+    try:
+        set_agency_fields(key_value_pairs(args.fields, "fields"))
+    except KeyError as e:
+        print(f"No agency field {e.args[0]!r}", file=sys.stderr)
+        return 1
+    return 0
+
+
+#--------------------------------------------- Keyword lists --------------------------------------------#
+
+def keywords_list(args):
+    from managercore import keyword_lists
+    for name in keyword_lists():
+        print(name)
+    return 0
+
+
+def keywords_add(args):
+    from managercore import add_keyword_lists
+    results, conflicts = add_keyword_lists(args.files, overwrite=args.overwrite)
+    for src, dest in conflicts:
+        print(f"{os.path.basename(dest)} already exists, skipped (--overwrite replaces it)", file=sys.stderr)
+    failed = [result for result in results if result.error]
+    for result in failed:
+        print(f"{result.src}: {result.error}", file=sys.stderr)
+    print(f"{len(results) - len(failed)} lists added")
+    return 1 if failed or conflicts else 0
+
+
+def keywords_remove(args):
+    from managercore import remove_keyword_list
+    status = 0
+    for name in args.names:
+        try:
+            remove_keyword_list(name)
+        except (OSError, ValueError) as e:
+            print(f"{name}: {e}", file=sys.stderr)
+            status = 1
+    return status
+
+
+def keywords_search(args):
+    from managercore import search_keywords
+    hits = search_keywords(args.query, "prefix" if args.prefix else "exact", args.ignore_case, args.limit)
+    for hit in hits:
+        print(f"{hit.file}:{hit.line}:{hit.term}")
+    return 0 if hits else 1
+
+
+#----------------------------------------------- Templates ----------------------------------------------#
+
+def templates_scan(args):
+    from managercore import scan_template_file
+    templ_scan = scan_template_file(args.name)
+    if args.json:
+        print(json.dumps(templ_scan._asdict(), indent=2))
+    else:
+        print("Placeholders:", ', '.join(templ_scan.var_names) or '-')
+        print("Images:", ', '.join(templ_scan.images) or '-')
+    return 0
+
+
+def templates_fill(args):
+    from managercore import fill_template_file
+    from batchreport import image_key
+    var_val_dict = {}
+    if args.vars_json:
+        with open(args.vars_json, encoding='utf-8') as f:
+            var_val_dict.update({key: str(value) for key, value in json.load(f).items()})
+    var_val_dict.update(key_value_pairs(args.var, "variables"))
+    img_dict = {image_key(key): path for key, path in key_value_pairs(args.image, "images").items()}
+    print(fill_template_file(args.name, args.output, var_val_dict, img_dict))
+    return 0
+
+
+#----------------------------------------------- API keys -----------------------------------------------#
+
+def read_password(args, prompt="API keys password: "):
+    if args.password_file:
+        with open(args.password_file) as f:
+            return f.readline().rstrip('\n')
+    if os.environ.get(PASSWORD_ENV):
+        return os.environ[PASSWORD_ENV]
+    import getpass
+    return getpass.getpass(prompt)
+
+
+def unlocked_session(args):
+    # APIKeySession unlocked with the given password, exits on a wrong one
+    from apisession import APIKeySession
+    session = APIKeySession(timeout=0)
+    if not session.is_store_available():
+        raise SystemExit("csi-manager: no API keys file yet, run `csi-manager api init` first")
+    try:
+        session.unlock(read_password(args))
+    except ValueError:
+        raise SystemExit("csi-manager: wrong password for the API keys file")
+    return session
+
+
+def report_sync(results):
+    from managercore import sync_summary, sync_failed
+    print(sync_summary(results))
+    return 1 if sync_failed(results) else 0
+
+
+def print_progress(tool, done, total):
+    print(f"Updating {tool} ({done + 1}/{total})...", file=sys.stderr)
+
+
+def api_init(args):
+    from apisession import APIKeySession
+    session = APIKeySession(timeout=0)
+    if session.is_store_available():
+        print("csi-manager: the API keys file already exists", file=sys.stderr)
+        return 1
+    password = read_password(args, "New API keys password: ")
+    if not password:
+        print("csi-manager: empty password", file=sys.stderr)
+        return 1
+    session.create(password)
+    return 0
+
+
+def api_unlock(args):
+    # only checks the password: every command unlocks for itself, nothing stays unlocked
+    unlocked_session(args)
+    print("Password OK")
+    return 0
+
+
+def api_list(args):
+    session = unlocked_session(args)
+    for name, key, tools in session.as_list():
+        shown = key if args.show_keys else ('set' if key else 'empty')
+        print(f"{name}\t{shown}\t{', '.join(tools)}")
+    return 0
+
+
+def api_set(args):
+    session = unlocked_session(args)
+    api_keys_list = session.as_list()
+    rows = {row[0]: row for row in api_keys_list}
+    if args.name in rows:
+        rows[args.name][1] = args.key
+        if args.tools is not None:
+            rows[args.name][2] = args.tools
+    else:
+        api_keys_list.append([args.name, args.key, args.tools or []])
+    if args.no_sync:
+        session.save({name: {"key":key,"inTools":tools} for name, key, tools in api_keys_list})
+        return 0
+    from managercore import sync_api_keys
+    return report_sync(sync_api_keys(session, api_keys_list, "save", progress=print_progress))
+
+
+def api_sync(args):
+    session = unlocked_session(args)
+    if args.dry_run:
+        from toolsync import push_api_keys
+        push_api_keys(session.as_list(), dry_run=True)
+        return 0
+    from managercore import sync_api_keys
+    return report_sync(sync_api_keys(session, session.as_list(), "save", progress=print_progress))
+
+
+def api_wipe(args):
+    if not args.yes:
+        print("csi-manager: wiping empties the API keys file and the tools' keys, add --yes to confirm", file=sys.stderr)
+        return 1
+    session = unlocked_session(args)
+    from managercore import sync_api_keys
+    return report_sync(sync_api_keys(session, session.as_list(), "wipe", progress=print_progress))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="csi-manager", description="Manage CSI Linux agency info, keyword lists, report templates and API keys.")
+    groups = parser.add_subparsers(dest="group", metavar="{agency,keywords,templates,api}", required=True)
+
+    agency = groups.add_parser("agency", help="agency info").add_subparsers(dest="command", required=True)
+    cmd = agency.add_parser("get", help="print the agency info, or one field")
+    cmd.add_argument("field", nargs='?')
+    cmd.set_defaults(func=agency_get)
+    cmd = agency.add_parser("set", help="change fields")
+    cmd.add_argument("fields", nargs='+', metavar="FIELD=VALUE")
+    cmd.set_defaults(func=agency_set)
+
+    keywords = groups.add_parser("keywords", help="keyword lists").add_subparsers(dest="command", required=True)
+    cmd = keywords.add_parser("list", help="list the keyword lists")
+    cmd.set_defaults(func=keywords_list)
+    cmd = keywords.add_parser("add", help="copy lists in")
+    cmd.add_argument("files", nargs='+')
+    cmd.add_argument("--overwrite", action="store_true", help="replace lists with the same name")
+    cmd.set_defaults(func=keywords_add)
+    cmd = keywords.add_parser("remove", help="delete lists")
+    cmd.add_argument("names", nargs='+')
+    cmd.set_defaults(func=keywords_remove)
+    cmd = keywords.add_parser("search", help="find the lists containing a term")
+    cmd.add_argument("query")
+    cmd.add_argument("--prefix", action="store_true", help="terms starting with the query")
+    cmd.add_argument("-i", "--ignore-case", action="store_true")
+    cmd.add_argument("--limit", type=int, default=1000)
+    cmd.set_defaults(func=keywords_search)
+
+    templates = groups.add_parser("templates", help="report templates").add_subparsers(dest="command", required=True)
+    cmd = templates.add_parser("scan", help="placeholders and images of a template")
+    cmd.add_argument("name")
+    cmd.add_argument("--json", action="store_true")
+    cmd.set_defaults(func=templates_scan)
+    cmd = templates.add_parser("fill", help="write a filled report")
+    cmd.add_argument("name")
+    cmd.add_argument("output")
+    cmd.add_argument("-v", "--var", action="append", metavar="VAR=VALUE")
+    cmd.add_argument("--vars-json", metavar="FILE", help="JSON object of variables")
+    cmd.add_argument("--image", action="append", metavar="MEMBER=PATH", help="replace an image (member name or position)")
+    cmd.set_defaults(func=templates_fill)
+
+    api = groups.add_parser("api", help="API keys").add_subparsers(dest="command", required=True)
+    for name, func, help_text in (("init", api_init, "create the encrypted API keys file"),
+                                  ("unlock", api_unlock, "check the password"),
+                                  ("list", api_list, "list the API keys"),
+                                  ("set", api_set, "set a key and update the tools"),
+                                  ("sync", api_sync, "write the keys in the tools"),
+                                  ("wipe", api_wipe, "empty every key and the tools' keys")):
+        cmd = api.add_parser(name, help=help_text)
+        cmd.add_argument("--password-file", help=f"first line is the password (default: ${PASSWORD_ENV} or a prompt)")
+        cmd.set_defaults(func=func)
+        if name == "list":
+            cmd.add_argument("--show-keys", action="store_true")
+        elif name == "set":
+            cmd.add_argument("name")
+            cmd.add_argument("key")
+            cmd.add_argument("--tools", nargs='*', type=tool_name, help="tools using the key (default: unchanged)")
+            cmd.add_argument("--no-sync", action="store_true", help="only save the key, don't update the tools")
+        elif name == "sync":
+            cmd.add_argument("--dry-run", action="store_true", help="show what would be written")
+        elif name == "wipe":
+            cmd.add_argument("--yes", action="store_true")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except command_errors() as e:
+        print(f"csi-manager: {e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        return 130
+
+
+def profiled_main():
+    # main() as a program, under CSI_PROFILE=seconds when it is set
+    import perftrace
+    perftrace.profile_from_env()
+    try:
+        return main()
+    finally:
+        profile_path = perftrace.stop_profile()
+        if profile_path:
+            print(f"Profile saved to {profile_path}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    sys.exit(profiled_main())
@@ -0,0 +1,158 @@
+# Change feed for the directories shown by the keyword/template tabs.
+# On Linux the kernel's inotify events are read directly (exact names, renames
+# paired by cookie), elsewhere QFileSystemWatcher tells that the directory
+# changed and the names are diffed. Bursts are debounced into one DirDelta.
+# Hidden and partially written files (listtools.is_listed) are never reported:
+# an atomic save or import shows up as its final name being added or modified.
+import os, sys, ctypes, ctypes.util, struct
+from collections import namedtuple
+
+from PySide6.QtCore import QObject, Signal, QTimer, QFileSystemWatcher, QSocketNotifier
+
+from listtools import is_listed
+
+# added/removed/modified: file names, renamed: (old name, new name)
+DirDelta = namedtuple("DirDelta", ["added", "removed", "renamed", "modified"])
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+_EVENT = struct.Struct("iIII")   # struct inotify_event without the name
+
+
+def _libc():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1, libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class DirWatcher(QObject):
+    changed = Signal(object)    # DirDelta
+
+    def __init__(self, dir_path, known_names, debounce_ms=300, parent=None):
+        super().__init__(parent)
+        self.dir_path = dir_path
+        self.known = {name for name in known_names if is_listed(name)}
+        self.events = []    # (mask, cookie, name) received since the last flush
+        self.rescan_needed = False
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(debounce_ms)
+        self.timer.timeout.connect(self.flush)
+
+        self.fd = None
+        libc = _libc()
+        if libc is not None:
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            mask = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_CLOSE_WRITE
+            if fd >= 0 and libc.inotify_add_watch(fd, os.fsencode(dir_path), mask) >= 0:
+                self.fd = fd
+                self.notifier = QSocketNotifier(fd, QSocketNotifier.Read, self)
+                self.notifier.activated.connect(self.readEvents)
+            elif fd >= 0:
+                os.close(fd)
+
+        if self.fd is None:
+            self.watcher = QFileSystemWatcher([dir_path], self)
+            self.watcher.directoryChanged.connect(self.directoryChanged)
+
+    def readEvents(self):
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset < len(data):
+            _, mask, cookie, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                self.rescan_needed = True
+            elif not mask & IN_ISDIR:
+                name = os.fsdecode(name)
+                if is_listed(name):
+                    self.events.append((mask, cookie, name))
+        # restarting the timer is the debounce
+        self.timer.start()
+
+    def directoryChanged(self, path):
+        self.rescan_needed = True
+        self.timer.start()
+
+    def flush(self):
+        if self.rescan_needed:
+            # no exact events (fallback watcher or inotify queue overflow), diff the names
+            self.rescan_needed = False
+            self.events = []
+            try:
+                names = {name for name in os.listdir(self.dir_path) if is_listed(name)}
+            except OSError:
+                return
+            delta = DirDelta(sorted(names - self.known), sorted(self.known - names), [], [])
+            self.known = names
+        else:
+            delta = self.coalesce(self.events)
+            self.events = []
+
+        if any(delta):
+            self.changed.emit(delta)
+
+    def coalesce(self, events):
+        # reduces a burst of events to the net changes against the known names
+        present = {}
+        moved_from = {}     # cookie: old name
+        renames = []
+        modified = set()
+        for mask, cookie, name in events:
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                present[name] = True
+                if mask & IN_MOVED_TO and name in self.known:
+                    # moved over an existing file (atomic saves)
+                    modified.add(name)
+                if mask & IN_MOVED_TO and cookie in moved_from:
+                    renames.append((moved_from.pop(cookie), name))
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                present[name] = False
+                if mask & IN_MOVED_FROM:
+                    moved_from[cookie] = name
+            elif mask & IN_CLOSE_WRITE:
+                modified.add(name)
+
+        renamed = []
+        for old, new in renames:
+            if old in self.known and new not in self.known and not present.get(old) and present.get(new):
+                renamed.append((old, new))
+                present.pop(old)
+                present.pop(new)
+                self.known.discard(old)
+                self.known.add(new)
+
+        added, removed = [], []
+        for name, exists in present.items():
+            if exists and name not in self.known:
+                added.append(name)
+                self.known.add(name)
+            elif not exists and name in self.known:
+                removed.append(name)
+                self.known.discard(name)
+        modified = sorted(name for name in modified if name in self.known and name not in added)
+        return DirDelta(added, removed, renamed, modified)
+
+    def close(self):
+        if self.fd is not None:
+            self.notifier.setEnabled(False)
+            os.close(self.fd)
+            self.fd = None
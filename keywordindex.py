@@ -0,0 +1,219 @@
+# Inverted index of the terms in every keyword list, so finding which lists
+# contain a term is an indexed lookup instead of opening each file. Every
+# non-empty line of a list is a term. Lists are reindexed only when their size
+# or mtime changed, the index is kept in sqlite next to the lists directory
+# (in ~/.cache/csi-manager/keywordindex when that one can't be written).
+# Compressed lists are indexed through listtools.open_list. A list that can't be
+# read (e.g. a truncated .gz) is recorded with its error and retried once it changes.
+import os, time, hashlib, sqlite3
+from collections import namedtuple
+
+from listtools import READ_ERRORS, open_list, is_listed
+
+# term as written in the list, file name, 1-based line number
+TermHit = namedtuple("TermHit", ["term", "file", "line"])
+
+SEARCH_MODES = ("exact", "prefix")
+_INSERT_BATCH = 10000
+# largest code point, upper bound of every string starting with a prefix
+_MAX_CHAR = "\U0010ffff"
+INDEX_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "csi-manager", "keywordindex")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    terms INTEGER NOT NULL,
+    indexed_at REAL NOT NULL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    folded TEXT NOT NULL,
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    line INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS postings_term ON postings(term);
+CREATE INDEX IF NOT EXISTS postings_folded ON postings(folded);
+CREATE INDEX IF NOT EXISTS postings_file ON postings(file_id);
+"""
+
+
+def default_index_path(lists_dir):
+    # next to the lists directory, so the tab doesn't show it as a list. sqlite also
+    # writes its -wal/-shm files there, when it can't (system-wide install, read-only
+    # share) the index goes to the user's cache, one per lists directory.
+    lists_dir = os.path.abspath(lists_dir)
+    parent = os.path.dirname(lists_dir)
+    index_path = os.path.join(parent, f".{os.path.basename(lists_dir)}_terms.sqlite")
+    if os.access(parent, os.W_OK) and (not os.path.exists(index_path) or os.access(index_path, os.W_OK)):
+        return index_path
+    os.makedirs(INDEX_CACHE_DIR, exist_ok=True)
+    dir_hash = hashlib.sha256(lists_dir.encode('utf-8', 'surrogateescape')).hexdigest()[:16]
+    return os.path.join(INDEX_CACHE_DIR, f"{os.path.basename(lists_dir)}-{dir_hash}_terms.sqlite")
+
+
+def fold(term):
+    return term.casefold()
+
+
+def read_terms(file_path):
+    # (term, line number) of every non-empty line, read (and decompressed) as a stream
+    with open_list(file_path, 'r', errors='replace') as f:
+        for line_no, line in enumerate(f, 1):
+            term = line.strip()
+            if term:
+                yield term, line_no
+
+
+class KeywordIndex:
+    def __init__(self, lists_dir, index_path=None):
+        self.lists_dir = lists_dir
+        self.index_path = index_path or default_index_path(lists_dir)
+        # the tab searches while a worker thread updates the index with its own connection
+        self.conn = sqlite3.connect(self.index_path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.executescript(SCHEMA)
+        # indexes created before unreadable lists were recorded
+        columns = [column[1] for column in self.conn.execute("PRAGMA table_info(files)")]
+        if 'error' not in columns:
+            self.conn.execute("ALTER TABLE files ADD COLUMN error TEXT")
+
+    def list_files(self):
+        return sorted(name for name in os.listdir(self.lists_dir)
+                      if is_listed(name) and os.path.isfile(os.path.join(self.lists_dir, name)))
+
+    def refresh(self, file_names=None, cancelled=None, progress=None):
+        # Brings the index up to date with the directory: new and changed lists are
+        # (re)indexed, removed ones dropped. Returns (indexed, removed, failed) file
+        # names, failed being the lists that couldn't be read (see failed()).
+        # progress(file_name, done, total) is called before each list is indexed.
+        file_names = self.list_files() if file_names is None else file_names
+        known = {name: (size, mtime_ns) for name, size, mtime_ns in self.conn.execute("SELECT name, size, mtime_ns FROM files")}
+
+        stale = []
+        for file_name in file_names:
+            try:
+                st = os.stat(os.path.join(self.lists_dir, file_name))
+            except OSError:
+                continue
+            if known.get(file_name) != (st.st_size, st.st_mtime_ns):
+                stale.append(file_name)
+        removed = sorted(set(known) - set(file_names))
+        for file_name in removed:
+            self.forget(file_name)
+
+        indexed, failed = [], []
+        for done, file_name in enumerate(stale):
+            if cancelled and cancelled():
+                break
+            if progress:
+                progress(file_name, done, len(stale))
+            try:
+                self.update(file_name)
+            except READ_ERRORS as e:
+                if not os.path.exists(os.path.join(self.lists_dir, file_name)):
+                    continue    # removed while indexing
+                # one damaged list mustn't keep the others out of the index
+                self.mark_failed(file_name, e)
+                failed.append(file_name)
+                continue
+            indexed.append(file_name)
+        return indexed, removed, failed
+
+    def update(self, file_name):
+        # reindexes one list in a single transaction, searches see the old or the new terms
+        file_path = os.path.join(self.lists_dir, file_name)
+        st = os.stat(file_path)
+        with self.conn:
+            self.conn.execute("DELETE FROM files WHERE name = ?", (file_name,))
+            file_id = self.conn.execute("INSERT INTO files (name, size, mtime_ns, terms, indexed_at) VALUES (?, ?, ?, 0, ?)",
+                                        (file_name, st.st_size, st.st_mtime_ns, time.time())).lastrowid
+            count, batch = 0, []
+            for term, line_no in read_terms(file_path):
+                batch.append((term, fold(term), file_id, line_no))
+                if len(batch) >= _INSERT_BATCH:
+                    self.conn.executemany("INSERT INTO postings VALUES (?, ?, ?, ?)", batch)
+                    count += len(batch)
+                    batch = []
+            self.conn.executemany("INSERT INTO postings VALUES (?, ?, ?, ?)", batch)
+            count += len(batch)
+            self.conn.execute("UPDATE files SET terms = ? WHERE id = ?", (count, file_id))
+        return count
+
+    def mark_failed(self, file_name, error):
+        # no terms, but the size/mtime recorded so the list is only read again once it changes
+        st = os.stat(os.path.join(self.lists_dir, file_name))
+        with self.conn:
+            self.conn.execute("DELETE FROM files WHERE name = ?", (file_name,))
+            self.conn.execute("INSERT INTO files (name, size, mtime_ns, terms, indexed_at, error) VALUES (?, ?, ?, 0, ?, ?)",
+                              (file_name, st.st_size, st.st_mtime_ns, time.time(), f"{type(error).__name__}: {error}"))
+
+    def failed(self):
+        # [(file name, error)] of the lists that couldn't be read
+        return self.conn.execute("SELECT name, error FROM files WHERE error IS NOT NULL ORDER BY name").fetchall()
+
+    def forget(self, file_name):
+        with self.conn:
+            self.conn.execute("DELETE FROM files WHERE name = ?", (file_name,))
+
+    def rename(self, old_name, new_name):
+        # the terms don't change, only the file they point to. Also used when a list
+        # is replaced by its compressed version, so the new file's size/mtime are kept.
+        with self.conn:
+            self.conn.execute("DELETE FROM files WHERE name = ?", (new_name,))
+            self.conn.execute("UPDATE files SET name = ? WHERE name = ?", (new_name, old_name))
+            try:
+                st = os.stat(os.path.join(self.lists_dir, new_name))
+            except OSError:
+                return
+            self.conn.execute("UPDATE files SET size = ?, mtime_ns = ? WHERE name = ?", (st.st_size, st.st_mtime_ns, new_name))
+
+    def search(self, query, mode="exact", ignore_case=False, limit=1000):
+        # TermHits ordered by term, file and line. mode is "exact" or "prefix".
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {mode}")
+        query = query.strip()
+        if not query:
+            return []
+        column = "folded" if ignore_case else "term"
+        if ignore_case:
+            query = fold(query)
+
+        if mode == "exact":
+            condition, params = f"p.{column} = ?", (query,)
+        else:
+            # a range on the column keeps the lookup on its index, unlike LIKE
+            condition, params = f"p.{column} >= ? AND p.{column} < ?", (query, query + _MAX_CHAR)
+        rows = self.conn.execute(f"SELECT p.term, f.name, p.line FROM postings p JOIN files f ON f.id = p.file_id "
+                                 f"WHERE {condition} ORDER BY p.{column}, f.name, p.line LIMIT ?", params + (limit,))
+        return [TermHit(*row) for row in rows]
+
+    def files_containing(self, term, ignore_case=False):
+        # names of the lists with a line equal to term
+        column = "folded" if ignore_case else "term"
+        term = fold(term) if ignore_case else term
+        return [name for name, in self.conn.execute(f"SELECT DISTINCT f.name FROM postings p JOIN files f ON f.id = p.file_id "
+                                                    f"WHERE p.{column} = ? ORDER BY f.name", (term,))]
+
+    def stats(self):
+        # (indexed lists, indexed terms)
+        files, terms = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(terms), 0) FROM files").fetchone()
+        return files, terms
+
+    def close(self):
+        self.conn.close()
+
+
+_indexes = {}
+
+def keywordIndex(lists_dir):
+    # one open index per lists directory for the whole application
+    lists_dir = os.path.abspath(lists_dir)
+    if lists_dir not in _indexes:
+        _indexes[lists_dir] = KeywordIndex(lists_dir)
+    return _indexes[lists_dir]
@@ -0,0 +1,303 @@
+# Maintenance of keyword/word lists too big to load in memory: normalizes
+# (trim, Unicode NFKC, case-fold), sorts and deduplicates a list with a chunked
+# external merge sort. Sorted runs of a bounded size are written to temporary
+# files (in $TMPDIR, not in the watched lists directory), then merged, so memory
+# use doesn't grow with the file.
+#
+# Lists can be stored gzip (.gz) or zstd (.zst) compressed, open_list() reads
+# and writes them as a stream like open() does for plain ones.
+# No Qt here, it runs the same from the keyword tab and from a shell:
+#
+#   python3 listtools.py sort wordlist.txt [-o sorted.txt] [--keep-case] ...
+#   python3 listtools.py compress wordlist.txt [--gzip]
+#   python3 listtools.py auto-compress LISTS_DIR --threshold-mb 100
+import io, os, sys, gzip, zlib, heapq, shutil, tempfile, unicodedata
+from collections import namedtuple
+
+try:
+    import zstandard
+except ImportError:     # optional, .zst lists need it
+    zstandard = None
+
+COMPRESSIONS = {'.gz': 'gzip', '.zst': 'zstd'}
+EXTENSIONS = {compression: ext for ext, compression in COMPRESSIONS.items()}
+DEFAULT_COMPRESSION = 'zstd' if zstandard is not None else 'gzip'
+# lists bigger than this many MB are compressed by the keyword tab, unset/0 turns it off
+AUTO_COMPRESS_ENV = "CSI_COMPRESS_LISTS_MB"
+_COPY_SIZE = 1024 * 1024
+# what reading a list can raise besides OSError: truncated or corrupt gzip/zstd data,
+# a .zst list without zstandard installed
+READ_ERRORS = (OSError, EOFError, RuntimeError, zlib.error) + ((zstandard.ZstdError,) if zstandard is not None else ())
+
+DEFAULT_CHUNK_BYTES = 64 * 1024 * 1024
+MERGE_FAN_IN = 64
+_CANCEL_CHECK_LINES = 64 * 1024     # how often a merge checks whether it was cancelled
+_LINE_OVERHEAD = 64     # rough per line cost of a str in a Python list
+# files still being written next to their destination: .tmp-XXXX (atomic saves),
+# .<name>.XXXX.part and .<name>.<pid>.link (bulkimport), or by other programs
+_PARTIAL_SUFFIXES = ('.part', '.tmp', '.link')
+
+# lines_in: lines read, lines_out: lines written, duplicates/empty: lines dropped as such
+SortStats = namedtuple("SortStats", ["lines_in", "lines_out", "duplicates", "empty"])
+
+
+def normalize_line(line, nfkc=True, casefold=True):
+    line = line.strip()
+    if nfkc:
+        line = unicodedata.normalize("NFKC", line)
+    if casefold:
+        line = line.casefold()
+    # NFKC can turn some characters into spaces/line breaks
+    return line.strip() if nfkc else line
+
+
+def is_listed(file_name):
+    # False for hidden and partially written files, the galleries and the keyword index skip them
+    return not file_name.startswith('.') and not file_name.endswith(_PARTIAL_SUFFIXES)
+
+
+def list_compression(path):
+    # 'gzip', 'zstd' or None, from the file extension
+    return COMPRESSIONS.get(os.path.splitext(path)[1].lower())
+
+
+def open_list(path, mode='r', compression='auto', errors='surrogateescape'):
+    # open() for lists, compressed or not: mode is 'r', 'w', 'rb' or 'wb' and path
+    # can also be an open binary file. Text is UTF-8, surrogateescape keeps bytes
+    # that aren't UTF-8 as they are instead of failing.
+    if compression == 'auto':
+        compression = list_compression(path) if isinstance(path, (str, os.PathLike)) else None
+    binary = 'b' in mode
+    text_args = {} if binary else {'encoding': 'utf-8', 'errors': errors, 'newline': None if 'r' in mode else '\n'}
+    mode = mode[0] + ('b' if binary else 't')
+
+    if compression is None:
+        if isinstance(path, (str, os.PathLike)):
+            return open(path, mode, **text_args)
+        return path if binary else io.TextIOWrapper(path, **text_args)
+    if compression == 'gzip':
+        return gzip.open(path, mode, compresslevel=6, **text_args)
+    if compression == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("zstd compressed lists need the zstandard module (pip install zstandard)")
+        return zstandard.open(path, mode, **text_args)
+    raise ValueError(f"Unknown compression: {compression}")
+
+
+def compress_file(src_path, dest_path, compression, cancelled=None):
+    # writes src_path to dest_path compressed with compression (None: plain), atomically.
+    # False when cancelled, dest_path is then left as it was
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=os.path.dirname(os.path.abspath(dest_path)))
+    os.close(fd)
+    try:
+        with open_list(src_path, 'rb') as src, open_list(tmp_path, 'wb', compression) as dest:
+            while chunk := src.read(_COPY_SIZE):
+                if cancelled and cancelled():
+                    break
+                dest.write(chunk)
+        if chunk:       # the loop was left on a cancel
+            os.unlink(tmp_path)
+            return False
+        shutil.copymode(src_path, tmp_path)
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return True
+
+
+def decompress_list(src_path, dest_path, cancelled=None):
+    return compress_file(src_path, dest_path, None, cancelled)
+
+
+def compress_list(path, compression=DEFAULT_COMPRESSION):
+    # replaces a plain list with its compressed version, returns the new path
+    dest_path = path + EXTENSIONS[compression]
+    compress_file(path, dest_path, compression)
+    shutil.copystat(path, dest_path)
+    os.remove(path)
+    return dest_path
+
+
+def auto_compress(lists_dir, threshold_bytes, compression=DEFAULT_COMPRESSION, cancelled=None):
+    # compresses the plain lists bigger than threshold_bytes, returns the (old, new) names
+    renamed = []
+    for name in sorted(os.listdir(lists_dir)):
+        path = os.path.join(lists_dir, name)
+        if cancelled and cancelled():
+            break
+        if not is_listed(name) or list_compression(name) or not os.path.isfile(path) or os.path.getsize(path) <= threshold_bytes:
+            continue
+        if os.path.exists(path + EXTENSIONS[compression]):
+            continue
+        renamed.append((name, os.path.basename(compress_list(path, compression))))
+    return renamed
+
+
+def _open_text(path, mode):
+    return open_list(path, mode, compression=None)
+
+
+def _sorted_run(chunk, dedupe):
+    # (sorted lines, duplicates dropped)
+    unique = set(chunk) if dedupe else chunk
+    return sorted(unique), len(chunk) - len(unique)
+
+
+def _write_run(lines, tmp_dir):
+    fd, run_path = tempfile.mkstemp(suffix=".run", dir=tmp_dir)
+    with os.fdopen(fd, 'w', encoding='utf-8', errors='surrogateescape', newline='\n') as f:
+        f.writelines(line + '\n' for line in lines)
+    return run_path
+
+
+def _read_run(f):
+    for line in f:
+        yield line[:-1]
+
+
+def _merge_runs(run_paths, dest, dedupe, cancelled=None):
+    # merges sorted runs into dest (an open file), returns (lines written, duplicates),
+    # None when cancelled
+    files = [_open_text(run_path, 'r') for run_path in run_paths]
+    written = duplicates = 0
+    previous = None
+    try:
+        for i, line in enumerate(heapq.merge(*(_read_run(f) for f in files))):
+            if cancelled and i % _CANCEL_CHECK_LINES == 0 and cancelled():
+                return None
+            if dedupe and line == previous:
+                duplicates += 1
+                continue
+            dest.write(line + '\n')
+            previous = line
+            written += 1
+    finally:
+        for f in files:
+            f.close()
+    return written, duplicates
+
+
+def sort_list(src_path, dest_path=None, normalize=True, nfkc=True, casefold=True, dedupe=True,
+              chunk_bytes=DEFAULT_CHUNK_BYTES, progress=None, cancelled=None, tmp_dir=None):
+    # Sorts src_path into dest_path (src_path itself by default, replaced atomically).
+    # progress(stage, done, total) is called with stage "sorting" (bytes read) and
+    # "merging" (runs merged). Returns SortStats, or None when cancelled, in which
+    # case nothing is written.
+    # Compressed lists are read and written compressed, dest_path's extension decides.
+    # The runs go under tmp_dir ($TMPDIR by default), only the last merge writes next
+    # to dest_path.
+    dest_path = dest_path or src_path
+    dest_dir = os.path.dirname(os.path.abspath(dest_path))
+    total_bytes = os.path.getsize(src_path)
+    lines_in = empty = duplicates = 0
+
+    runs_dir = tempfile.mkdtemp(prefix="csi-sort-", dir=tmp_dir)
+    merged_path = None
+    try:
+        # pass 1: sorted runs of at most chunk_bytes
+        runs, chunk, chunk_size = [], [], 0
+        # progress is the position in the file on disk, compressed or not
+        with open(src_path, 'rb') as raw, open_list(raw, 'r', list_compression(src_path)) as src:
+            for line in src:
+                lines_in += 1
+                line = normalize_line(line, nfkc, casefold) if normalize else line.rstrip('\r\n')
+                if not line:
+                    empty += 1
+                    continue
+                chunk.append(line)
+                chunk_size += len(line) + _LINE_OVERHEAD
+                if chunk_size >= chunk_bytes:
+                    if cancelled and cancelled():
+                        return None
+                    if progress:
+                        progress("sorting", raw.tell(), total_bytes)
+                    lines, chunk_duplicates = _sorted_run(chunk, dedupe)
+                    runs.append(_write_run(lines, runs_dir))
+                    duplicates += chunk_duplicates
+                    chunk, chunk_size = [], 0
+        lines, chunk_duplicates = _sorted_run(chunk, dedupe)
+        runs.append(_write_run(lines, runs_dir))
+        duplicates += chunk_duplicates
+        chunk = lines = None
+        if progress:
+            progress("sorting", total_bytes, total_bytes)
+
+        # pass 2: merge MERGE_FAN_IN runs at a time (open file limit), the last merge writes the list
+        total_runs, merged = len(runs), 0
+        while True:
+            if cancelled and cancelled():
+                return None
+            group, runs = runs[:MERGE_FAN_IN], runs[MERGE_FAN_IN:]
+            # the last merge writes the list itself, in dest_path's directory so the replace is atomic
+            if runs:
+                fd, merged_path = tempfile.mkstemp(suffix=".run", dir=runs_dir)
+            else:
+                fd, merged_path = tempfile.mkstemp(prefix=".tmp-", dir=dest_dir)
+            os.close(fd)
+            with open_list(merged_path, 'w', list_compression(dest_path) if not runs else None) as merged_file:
+                counts = _merge_runs(group, merged_file, dedupe, cancelled)
+            if counts is None:
+                return None
+            lines_out, group_duplicates = counts
+            duplicates += group_duplicates
+            for run_path in group:
+                os.remove(run_path)
+            merged += len(group)
+            if progress:
+                progress("merging", merged, total_runs)
+            if not runs:
+                break
+            runs.append(merged_path)
+
+        shutil.copymode(src_path, merged_path)
+        os.replace(merged_path, dest_path)
+        merged_path = None
+    finally:
+        shutil.rmtree(runs_dir, ignore_errors=True)
+        # the list being written by a last merge that was cancelled or failed
+        if merged_path is not None and os.path.exists(merged_path):
+            os.remove(merged_path)
+
+    return SortStats(lines_in, lines_out, duplicates, empty)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Normalize, sort and deduplicate keyword lists of any size.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    sort_cmd = commands.add_parser("sort", help="sort a list in place (or into --output)")
+    sort_cmd.add_argument("list", help="list file, one term per line")
+    sort_cmd.add_argument("-o", "--output", help="write the sorted list here instead of replacing the list")
+    sort_cmd.add_argument("--raw", action="store_true", help="don't trim/normalize the lines")
+    sort_cmd.add_argument("--no-nfkc", action="store_true", help="skip the Unicode NFKC normalization")
+    sort_cmd.add_argument("--keep-case", action="store_true", help="don't case-fold the lines")
+    sort_cmd.add_argument("--keep-duplicates", action="store_true")
+    sort_cmd.add_argument("--chunk-mb", type=int, default=DEFAULT_CHUNK_BYTES // (1024 * 1024), help="memory for each sorted run")
+    compress_cmd = commands.add_parser("compress", help="replace lists with compressed ones")
+    compress_cmd.add_argument("lists", nargs='+')
+    auto_cmd = commands.add_parser("auto-compress", help="compress the lists of a directory above a size")
+    auto_cmd.add_argument("lists_dir")
+    auto_cmd.add_argument("--threshold-mb", type=int, default=100)
+    for cmd in (compress_cmd, auto_cmd):
+        cmd.add_argument("--gzip", dest="compression", action="store_const", const="gzip", default=DEFAULT_COMPRESSION,
+                         help=f"use gzip instead of {DEFAULT_COMPRESSION}")
+    args = parser.parse_args()
+
+    if args.command == "compress":
+        for path in args.lists:
+            print(f"{path} -> {compress_list(path, args.compression)}")
+        sys.exit(0)
+    if args.command == "auto-compress":
+        for old_name, new_name in auto_compress(args.lists_dir, args.threshold_mb * 1024 * 1024, args.compression):
+            print(f"{old_name} -> {new_name}")
+        sys.exit(0)
+
+    def print_progress(stage, done, total):
+        print(f"\r{stage}: {done * 100 // max(total, 1)}%", end='', file=sys.stderr, flush=True)
+
+    stats = sort_list(args.list, args.output, normalize=not args.raw, nfkc=not args.no_nfkc, casefold=not args.keep_case,
+                      dedupe=not args.keep_duplicates, chunk_bytes=args.chunk_mb * 1024 * 1024, progress=print_progress)
+    print(file=sys.stderr)
+    print(f"{stats.lines_in} lines read, {stats.lines_out} written, {stats.duplicates} duplicates and {stats.empty} empty lines dropped")
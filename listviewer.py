@@ -0,0 +1,520 @@
+# Viewer/editor for keyword lists of any size. The list is memory mapped and
+# indexed in the background with one (offset, lines before it) pair per block,
+# so opening is instant and memory doesn't grow with the file. Only the rows on
+# screen are ever decoded. Edits are kept in a piece table over the original
+# lines and written out in one pass, atomically, on save.
+# Compressed lists are decompressed (streaming) to a plain cache file first, as
+# mmap needs one, and compressed back on save.
+import os, re, mmap, bisect, shutil, tempfile
+
+from PySide6.QtCore import Qt, QThread, Signal, QAbstractListModel, QModelIndex
+from PySide6.QtGui import QFontDatabase, QIntValidator
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QListView, QLineEdit, QPushButton, QLabel,
+    QCheckBox, QInputDialog, QMessageBox, QApplication
+)
+
+from listtools import list_compression, decompress_list, compress_file
+
+VIEW_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "csi-manager", "lists")
+
+BLOCK_SIZE = 64 * 1024
+_COPY_SIZE = 1024 * 1024
+_PROGRESS_BLOCKS = 256     # index progress is reported every 16 MB
+
+
+class LineFile:
+    # Read-only access to the lines of a file by number
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.size = os.path.getsize(file_path)
+        self.fd = open(file_path, 'rb')
+        # mmap can't map an empty file, bytes has the same find/slicing interface
+        self.mm = mmap.mmap(self.fd.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b''
+        # block i starts at block_offsets[i] with block_lines[i] newlines before it.
+        # Filled by build_index (possibly on another thread), offsets are appended first.
+        self.block_offsets = [0]
+        self.block_lines = [0]
+        self.lines = 0          # lines known so far
+        self.complete = False
+        self.last = (0, 0)      # (line, its offset) of the last lookup, reading on from it is cheap
+
+    def build_index(self, cancelled=None, progress=None):
+        # progress(lines) is called as the index grows, returns False when cancelled
+        newlines = 0
+        for block, offset in enumerate(range(BLOCK_SIZE, self.size, BLOCK_SIZE)):
+            if cancelled and cancelled():
+                return False
+            newlines += self.mm[offset - BLOCK_SIZE:offset].count(b'\n')
+            self.block_offsets.append(offset)
+            self.block_lines.append(newlines)
+            self.lines = newlines
+            if progress and block % _PROGRESS_BLOCKS == 0:
+                progress(self.lines)
+
+        last_offset = self.block_offsets[-1]
+        newlines += self.mm[last_offset:self.size].count(b'\n')
+        # a last line without a newline still counts
+        self.lines = newlines + (1 if self.size and self.mm[self.size - 1:self.size] != b'\n' else 0)
+        self.complete = True
+        if progress:
+            progress(self.lines)
+        return True
+
+    def line_start(self, n):
+        # byte offset where line n starts: from the closest block (or the last lookup),
+        # counting the newlines left
+        known = len(self.block_lines)
+        block = bisect.bisect_left(self.block_lines, n, 0, known) - 1
+        line, offset = (self.block_lines[block], self.block_offsets[block]) if block >= 0 else (0, 0)
+        if line < self.last[0] <= n:
+            line, offset = self.last
+        while line < n:
+            offset = self.mm.find(b'\n', offset) + 1
+            if offset == 0:
+                return self.size
+            line += 1
+        return offset
+
+    def line_end(self, start):
+        end = self.mm.find(b'\n', start)
+        return self.size if end < 0 else end
+
+    def line(self, n):
+        start = self.line_start(n)
+        self.last = (n, start)
+        return self.mm[start:self.line_end(start)].rstrip(b'\r').decode('utf-8', errors='replace')
+
+    def search_text(self, text_pattern, start, end):
+        # byte offset of the first text_pattern match in [start, end), None if there is none.
+        # Decodes the lines a chunk at a time, for what a bytes regex can't match (Unicode case folding)
+        while start < end:
+            stop = min(start + _COPY_SIZE, end)
+            if stop < end:
+                # chunks end on a line, a match never spans two of them
+                stop = self.mm.rfind(b'\n', start, stop) + 1 or min(self.line_end(stop) + 1, end)
+            text = self.mm[start:stop].decode('utf-8', errors='surrogateescape')
+            match = text_pattern.search(text)
+            if match:
+                return start + len(text[:match.start()].encode('utf-8', errors='surrogateescape'))
+            start = stop
+        return None
+
+    def line_at(self, offset):
+        # number of the line holding the byte at offset
+        known = len(self.block_lines)
+        block = bisect.bisect_right(self.block_offsets, offset, 0, known) - 1
+        return self.block_lines[block] + self.mm[self.block_offsets[block]:offset].count(b'\n')
+
+    def close(self):
+        if self.size:
+            self.mm.close()
+        self.fd.close()
+
+
+class PieceTable:
+    # Edited view of a fully indexed LineFile. Pieces are ('file', first line, count)
+    # ranges of the original, or ('new', [lines]) typed in the editor.
+
+    def __init__(self, line_file):
+        self.file = line_file
+        self.pieces = [('file', 0, line_file.lines)] if line_file.lines else []
+        self.modified = False
+        self.reindex()
+
+    def reindex(self):
+        # first view line of every piece
+        self.starts, line = [], 0
+        for piece in self.pieces:
+            self.starts.append(line)
+            line += self.pieceLength(piece)
+        self.line_count = line
+
+    def pieceLength(self, piece):
+        return piece[2] if piece[0] == 'file' else len(piece[1])
+
+    def locate(self, n):
+        # (piece index, line within the piece)
+        i = bisect.bisect_right(self.starts, n) - 1
+        return i, n - self.starts[i]
+
+    def line(self, n):
+        i, k = self.locate(n)
+        piece = self.pieces[i]
+        return self.file.line(piece[1] + k) if piece[0] == 'file' else piece[1][k]
+
+    def split(self, n):
+        # makes view line n start a piece, returns that piece's index
+        if n >= self.line_count:
+            return len(self.pieces)
+        i, k = self.locate(n)
+        if k:
+            piece = self.pieces[i]
+            if piece[0] == 'file':
+                self.pieces[i:i + 1] = [('file', piece[1], k), ('file', piece[1] + k, piece[2] - k)]
+            else:
+                self.pieces[i:i + 1] = [('new', piece[1][:k]), ('new', piece[1][k:])]
+            self.reindex()
+            i += 1
+        return i
+
+    def insert(self, n, lines):
+        self.pieces.insert(self.split(n), ('new', list(lines)))
+        self.modified = True
+        self.reindex()
+
+    def delete(self, n, count=1):
+        i = self.split(n)
+        j = self.split(n + count)
+        del self.pieces[i:j]
+        self.modified = True
+        self.reindex()
+
+    def replace(self, n, text):
+        self.delete(n)
+        self.insert(n, [text])
+
+    def find(self, pattern, text_pattern, start):
+        # first view line >= start matching, None if there is none. pattern is the
+        # bytes regex run over the mapped file, text_pattern the str one for typed lines.
+        # Without a pattern the file is decoded and searched with text_pattern too.
+        for i in range(self.locate(start)[0] if start < self.line_count else len(self.pieces), len(self.pieces)):
+            piece, piece_start = self.pieces[i], self.starts[i]
+            skip = max(start - piece_start, 0)
+            if piece[0] == 'new':
+                for k in range(skip, len(piece[1])):
+                    if text_pattern.search(piece[1][k]):
+                        return piece_start + k
+                continue
+            first, count = piece[1] + skip, piece[2] - skip
+            if count <= 0:
+                continue
+            end_line = piece[1] + piece[2]
+            end = self.file.size if end_line >= self.file.lines else self.file.line_start(end_line)
+            if pattern is None:
+                offset = self.file.search_text(text_pattern, self.file.line_start(first), end)
+            else:
+                match = pattern.search(self.file.mm, self.file.line_start(first), end)
+                offset = match and match.start()
+            if offset is not None:
+                return piece_start + self.file.line_at(offset) - piece[1]
+        return None
+
+    def save(self, dest_path=None):
+        # streams the pieces to a file next to the destination and renames it over it
+        dest_path = dest_path or self.file.file_path
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=os.path.dirname(os.path.abspath(dest_path)))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for piece in self.pieces:
+                    if piece[0] == 'new':
+                        f.writelines(line.encode('utf-8') + b'\n' for line in piece[1])
+                        continue
+                    start = self.file.line_start(piece[1])
+                    end_line = piece[1] + piece[2]
+                    end = self.file.size if end_line >= self.file.lines else self.file.line_start(end_line)
+                    for offset in range(start, end, _COPY_SIZE):
+                        f.write(self.file.mm[offset:min(offset + _COPY_SIZE, end)])
+                    if end == self.file.size and self.file.mm[end - 1:end] != b'\n':
+                        f.write(b'\n')
+                f.flush()
+                os.fsync(f.fileno())
+            if os.path.exists(dest_path):
+                shutil.copymode(dest_path, tmp_path)
+            os.replace(tmp_path, dest_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self.modified = False
+
+
+class LineIndexWorker(QThread):
+    progress = Signal(int)      # lines indexed so far
+
+    def __init__(self, line_file, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.line_file = line_file
+
+    def run(self):
+        self.line_file.build_index(cancelled=self.isInterruptionRequested, progress=self.progress.emit)
+
+
+class ListUnpackWorker(QThread):
+    done = Signal(object)       # None, or the exception
+
+    def __init__(self, src_path, dest_path, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.src_path = src_path
+        self.dest_path = dest_path
+
+    def run(self):
+        try:
+            # nothing is reported when the viewer was closed meanwhile
+            if decompress_list(self.src_path, self.dest_path, cancelled=self.isInterruptionRequested):
+                self.done.emit(None)
+        except Exception as e:
+            self.done.emit(e)
+
+
+class LineListModel(QAbstractListModel):
+    # rows are lines of the source (LineFile while indexing, PieceTable once editable),
+    # data is only asked for the rows on screen
+
+    def __init__(self, source, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.source = source
+        self.rows = 0
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.rows
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= self.rows:
+            return None
+        if role == Qt.DisplayRole:
+            return self.source.line(index.row())
+        return None
+
+    def setRows(self, rows):
+        if rows > self.rows:
+            self.beginInsertRows(QModelIndex(), self.rows, rows - 1)
+            self.rows = rows
+            self.endInsertRows()
+
+    def setSource(self, source, rows):
+        self.beginResetModel()
+        self.source = source
+        self.rows = rows
+        self.endResetModel()
+
+
+class ListViewerDialog(QDialog):
+    def __init__(self, main_window, file_path, line=None, *args, **kwargs):
+        super().__init__(main_window, *args, **kwargs)
+        self.main_window = main_window
+        self.file_path = file_path
+        self.setWindowTitle(os.path.basename(file_path))
+        self.resize(main_window.width() * 2 // 3, main_window.height() * 4 // 5)
+        self.main_layout = QVBoxLayout()
+
+        self.nav_layout = QHBoxLayout()
+        self.line_box = QLineEdit()
+        self.line_box.setPlaceholderText("Line")
+        self.line_box.setValidator(QIntValidator(1, 2**31 - 1, self))
+        self.line_box.setMaximumWidth(120)
+        self.line_box.returnPressed.connect(self.jumpToLine)
+        self.search_box = QLineEdit()
+        self.search_box.setPlaceholderText("Find...")
+        self.search_box.returnPressed.connect(self.findNext)
+        self.find_btn = QPushButton("Find Next")
+        self.find_btn.clicked.connect(self.findNext)
+        self.match_case = QCheckBox("Match case")
+        self.nav_layout.addWidget(self.line_box)
+        self.nav_layout.addWidget(self.search_box)
+        self.nav_layout.addWidget(self.find_btn)
+        self.nav_layout.addWidget(self.match_case)
+
+        self.compression = list_compression(file_path)
+        self.view_path = file_path      # plain file shown, a cache copy for compressed lists
+        self.line_file = None
+        self.indexer = None
+        self.unpacker = None
+        self.table = None
+        # row selected once the file is indexed: the line asked for, or the one selected before a save
+        self.restore_row = line - 1 if line else None
+        self.model = LineListModel(None, self)
+        self.view = QListView()
+        self.view.setUniformItemSizes(True)
+        self.view.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        self.view.setModel(self.model)
+        self.view.doubleClicked.connect(self.editLine)
+
+        self.edit_layout = QHBoxLayout()
+        self.insert_btn = QPushButton("Insert Line")
+        self.insert_btn.clicked.connect(self.insertLine)
+        self.delete_btn = QPushButton("Delete Line")
+        self.delete_btn.clicked.connect(self.deleteLine)
+        self.save_btn = QPushButton("Save")
+        self.save_btn.clicked.connect(self.save)
+        self.status = QLabel()
+        self.edit_layout.addWidget(self.status, 1)
+        self.edit_layout.addWidget(self.insert_btn)
+        self.edit_layout.addWidget(self.delete_btn)
+        self.edit_layout.addWidget(self.save_btn)
+
+        self.main_layout.addLayout(self.nav_layout)
+        self.main_layout.addWidget(self.view)
+        self.main_layout.addLayout(self.edit_layout)
+        self.setLayout(self.main_layout)
+
+        self.openList()
+
+    def openList(self):
+        self.setEditable(False)
+        if self.compression is None:
+            self.openLineFile()
+            return
+        os.makedirs(VIEW_CACHE_DIR, exist_ok=True)
+        fd, self.view_path = tempfile.mkstemp(suffix=".txt", dir=VIEW_CACHE_DIR)
+        os.close(fd)
+        self.status.setText("Decompressing...")
+        self.unpacker = ListUnpackWorker(self.file_path, self.view_path, self)
+        self.unpacker.done.connect(self.unpacked)
+        self.unpacker.start()
+
+    def unpacked(self, error):
+        if error is not None:
+            self.status.setText("Couldn't decompress the list")
+            QMessageBox(QMessageBox.Critical,"Error", f"Couldn't open {os.path.basename(self.file_path)}: {error}", QMessageBox.Ok, self).exec_()
+            return
+        self.openLineFile()
+
+    def openLineFile(self):
+        self.line_file = LineFile(self.view_path)
+        self.model.setSource(self.line_file, 0)
+        self.startIndexing()
+
+    def startIndexing(self):
+        # read-only until the whole file is indexed
+        self.setEditable(False)
+        self.indexer = LineIndexWorker(self.line_file, self)
+        self.indexer.progress.connect(self.indexProgress)
+        self.indexer.finished.connect(self.indexFinished)
+        self.indexer.start()
+
+    def setEditable(self, editable):
+        for btn in (self.insert_btn, self.delete_btn, self.save_btn):
+            btn.setEnabled(editable)
+
+    def indexProgress(self, lines):
+        self.model.setRows(lines)
+        self.status.setText(f"{lines} lines (indexing {self.line_file.block_offsets[-1] * 100 // max(self.line_file.size, 1)}%)")
+
+    def indexFinished(self):
+        if not self.line_file.complete:
+            return
+        self.table = PieceTable(self.line_file)
+        self.model.setSource(self.table, self.table.line_count)
+        self.setEditable(True)
+        self.save_btn.setEnabled(False)
+        self.updateStatus()
+        if self.restore_row is not None and self.model.rows:
+            self.selectRow(min(self.restore_row, self.model.rows - 1))
+        self.restore_row = None
+
+    def updateStatus(self):
+        lines = self.table.line_count if self.table else self.model.rows
+        self.status.setText(f"{lines} lines" + (", modified" if self.table and self.table.modified else ""))
+
+    def currentRow(self):
+        index = self.view.currentIndex()
+        return index.row() if index.isValid() else 0
+
+    def selectRow(self, row):
+        index = self.model.index(row)
+        self.view.setCurrentIndex(index)
+        self.view.scrollTo(index, QListView.PositionAtCenter)
+
+    def jumpToLine(self):
+        if not self.line_box.text():
+            return
+        self.selectRow(min(int(self.line_box.text()), self.model.rows) - 1)
+
+    def findNext(self):
+        query = self.search_box.text()
+        if not query or self.table is None:
+            if self.table is None:
+                self.status.setText("Search is available once the list is indexed")
+            return
+        if self.match_case.isChecked():
+            pattern = re.compile(re.escape(query.encode('utf-8')))
+            text_pattern = re.compile(re.escape(query))
+        elif query.isascii():
+            # bytes IGNORECASE only folds ASCII, the typed lines are searched the same way
+            pattern = re.compile(re.escape(query.encode('utf-8')), re.IGNORECASE)
+            text_pattern = re.compile(re.escape(query), re.IGNORECASE | re.ASCII)
+        else:
+            # Unicode case folding needs the decoded text, for the file too (slower)
+            pattern = None
+            text_pattern = re.compile(re.escape(query), re.IGNORECASE)
+
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            start = self.currentRow() + 1 if self.view.currentIndex().isValid() else 0
+            row = self.table.find(pattern, text_pattern, start)
+            if row is None and start:
+                row = self.table.find(pattern, text_pattern, 0)     # wrap around
+        finally:
+            QApplication.restoreOverrideCursor()
+        if row is None:
+            self.status.setText(f"'{query}' not found")
+        else:
+            self.selectRow(row)
+            self.updateStatus()
+
+    def editLine(self, index):
+        if self.table is None:
+            return
+        text, ok = QInputDialog.getText(self, "Edit Line", f"Line {index.row() + 1}:", QLineEdit.Normal, self.table.line(index.row()))
+        if ok:
+            self.table.replace(index.row(), text)
+            self.model.dataChanged.emit(index, index)
+            self.edited()
+
+    def insertLine(self):
+        row = self.currentRow() + 1 if self.view.currentIndex().isValid() else self.table.line_count
+        text, ok = QInputDialog.getText(self, "Insert Line", f"New line {row + 1}:")
+        if ok:
+            self.model.beginInsertRows(QModelIndex(), row, row)
+            self.table.insert(row, [text])
+            self.model.rows += 1
+            self.model.endInsertRows()
+            self.selectRow(row)
+            self.edited()
+
+    def deleteLine(self):
+        if not self.view.currentIndex().isValid() or not self.table.line_count:
+            return
+        row = self.currentRow()
+        self.model.beginRemoveRows(QModelIndex(), row, row)
+        self.table.delete(row)
+        self.model.rows -= 1
+        self.model.endRemoveRows()
+        self.edited()
+
+    def edited(self):
+        self.save_btn.setEnabled(True)
+        self.updateStatus()
+
+    def save(self):
+        try:
+            self.table.save(self.view_path)
+            if self.compression:
+                compress_file(self.view_path, self.file_path, self.compression)
+        except (OSError, RuntimeError) as e:
+            QMessageBox(QMessageBox.Critical,"Error", f"Couldn't save {os.path.basename(self.file_path)}: {e}", QMessageBox.Ok, self).exec_()
+            return False
+        # the saved file is the new original, reopen and index it again
+        self.restore_row = self.currentRow()
+        self.line_file.close()
+        self.table = None
+        self.openLineFile()
+        return True
+
+    def done(self, result):
+        # closing with unsaved edits asks first
+        if self.table is not None and self.table.modified:
+            answer = QMessageBox(QMessageBox.Warning,"Unsaved Changes", f"Save the changes to {os.path.basename(self.file_path)}?",
+                                 QMessageBox.Save|QMessageBox.Discard|QMessageBox.Cancel, self).exec_()
+            if answer == QMessageBox.Cancel or (answer == QMessageBox.Save and not self.save()):
+                return
+        for worker in (self.unpacker, self.indexer):
+            if worker is not None:
+                worker.requestInterruption()
+                worker.wait()
+        if self.line_file is not None:
+            self.line_file.close()
+        if self.view_path != self.file_path and os.path.exists(self.view_path):
+            os.remove(self.view_path)
+        super().done(result)
@@ -1,28 +1,30 @@
+import perftrace
+if __name__ == "__main__":
+    # first, so the import timer (CSI_IMPORT_TIMES) sees every other import. Not when
+    # CSI_Manager imports this module for its API Keys tab
+    perftrace.trace_imports()
+    perftrace.profile_from_env()
+
 import functools
 from PySide6 import QtCore, QtGui, QtWidgets
 from PySide6.QtWidgets import QApplication, QInputDialog, QLineEdit, QMessageBox, QLabel, QVBoxLayout, QDialog, QPushButton, QHBoxLayout, QSpinBox, QCheckBox
 from PySide6.QtCore import Qt
 from PySide6.QtGui import QGuiApplication
 
-import json, sys
-import os, subprocess
-
-# libs for encrypting APIKeys
-import base64
-from cryptography.fernet import Fernet, InvalidToken
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+import os, sys
 
-from csilibs.auth import encrypt, decrypt, gen_key
+# the API keys file is encrypted/decrypted by apisession (csilibs.data.apiKeys)
 from csilibs.utils import pathme
-from csilibs.data import  apiKeys
+from apisession import APIKeySession
+from managercore import sync_api_keys, sync_failed, sync_summary
 from csilibs.gui import percentSize
 import qdarktheme
 
 # Global var and function ###########
-enc_pass=''
+# unlocked API keys shared by the main window and its dialogs
+session = APIKeySession()
 title_icon=pathme("assets/icons/csi_black.ico")
-# You can add new tools_support and write their implementation in the Ui_MainWindow.save_api_data &  Ui_MainWindow.wipe_data 
+# You can add new tools_support and write their implementation in toolsync.push_api_keys & toolsync.wipe_api_keys
 tools_support=["OSINT-Search", "Recon-NG", "Spiderfoot", "theHarvester", "CSI UserSearch"]
 
 
@@ -36,8 +38,55 @@ def show_message_box(title, message, icon=QMessageBox.Information, buttons=QMess
     msg_box.setStandardButtons(buttons)
     result = msg_box.exec_()
     return result
+
+def save_profile():
+    # end of the CSI_PROFILE=seconds profile, None from stop_profile means nothing was saved
+    try:
+        profile_path = perftrace.stop_profile()
+    except OSError as e:
+        show_message_box("Profile Not Saved", f"Couldn't save the profile: {e}", QMessageBox.Warning)
+        return
+    if profile_path:
+        show_message_box("Profile Saved", f"Profile saved to {profile_path}", QMessageBox.Information)
+    else:
+        show_message_box("Profile Not Saved", "No profile was running, nothing was saved.", QMessageBox.Warning)
+
+def unlock_prompt(parent, session):
+    # asks for the password again once the session has locked itself, returns True when unlocked
+    while not session.unlocked:
+        password, ok = QInputDialog.getText(parent, "Session Locked", "Enter Password to decrypt the API Keys File:", QLineEdit.Password)
+        if not ok:
+            return False
+        try:
+            session.unlock(password)
+        except ValueError:
+            show_message_box("Error","Failed to Decrypt With this Password!",QMessageBox.Warning)
+    return True
     
 
+# Saves/wipes the API keys and the supported tools away from the GUI thread
+class APISyncWorker(QtCore.QThread):
+    progress = QtCore.Signal(str)   # status bar message
+    done = QtCore.Signal(object)    # tool: result, exception or None (cancelled)
+
+    def __init__(self, session, api_keys_list, mode="save", parent=None):
+        super().__init__(parent)
+        self.session = session
+        self.api_keys_list = api_keys_list
+        self.mode = mode
+
+    def run(self):
+        self.progress.emit("Encrypting API Keys...")
+        self.done.emit(sync_api_keys(self.session, self.api_keys_list, self.mode,
+                                     progress=self.on_progress, cancelled=self.isInterruptionRequested))
+
+    def on_progress(self, tool, done, total):
+        self.progress.emit(f"Updating {tool} ({done + 1}/{total})...")
+
+    def cancel(self):
+        self.progress.emit("Cancelling, waiting for the current tool to finish...")
+        self.requestInterruption()
+
 ###################################### 
 # Setting up Table with API Data
 class TableModel(QtCore.QAbstractTableModel):
@@ -94,6 +143,7 @@ class newAPIDialog(QDialog):
     def __init__(self, mainObj, opt="remove"):
         super().__init__()
         self.mainObj = mainObj
+        self.session = mainObj.session
         self.setWindowIcon(QtGui.QIcon(title_icon))
         if opt == 'add':            
             self.setWindowTitle("Add New API")
@@ -138,6 +188,8 @@ class newAPIDialog(QDialog):
         self.setLayout(main_layout)
 
     def create_new_entry(self):
+        if not unlock_prompt(self, self.session):
+            return
         # getting list of supported tools
         tools_sup = []
         for chkbx in self.chkbx_list:
@@ -145,24 +197,36 @@ class newAPIDialog(QDialog):
                 tools_sup.append(chkbx.text())
 
         self.mainObj.api_keys_list.append([self.addAPIInput.text(),'',tools_sup])
-        self.mainObj.save_api_data(f"Added {self.addAPIInput.text()} API Successfully!, Restart the program to see Changes.")
-        self.close()
+        worker = self.mainObj.save_api_data(f"Added {self.addAPIInput.text()} API Successfully!, Restart the program to see Changes.")
+        if worker is None:
+            self.mainObj.api_keys_list.pop()
+            return
+        # open until the keys are saved, the main window shows how it went
+        self.addAPIBtn.setEnabled(False)
+        worker.done.connect(self.close)
     
     def remove_entry(self):
         try:
             result = show_message_box("Confirmation", f"Do you want to Remove \"{self.mainObj.api_keys_list[self.rmAPIInput.value()-1][0]}\" API Entry?", QMessageBox.Question, QMessageBox.Yes | QMessageBox.No)
             if result == QMessageBox.Yes:
-                del self.mainObj.api_keys_list[self.rmAPIInput.value()-1]
-                self.mainObj.save_api_data(f"Removed API Successfully!")
-                self.close()
+                removed = self.mainObj.api_keys_list.pop(self.rmAPIInput.value()-1)
+                worker = self.mainObj.save_api_data(f"Removed API Successfully!")
+                if worker is None:
+                    self.mainObj.api_keys_list.insert(self.rmAPIInput.value()-1, removed)
+                    return
+                self.rmAPIBtn.setEnabled(False)
+                worker.done.connect(self.close)
         except IndexError:
             show_message_box("Error",f"You have total {len(self.mainObj.api_keys_list)} entries", QMessageBox.Warning)
 
 # MAIN Windows
 class Ui_MainWindow(object):
+    worker = None   # APISyncWorker while keys are being saved/wiped
+
     def setupUi(self, MainWindow):
         self.changed_values = []  # to store the changes into the file
-        api_keys = {}
+        self.session = session
+        self.main_window = MainWindow
 
         MainWindow.setObjectName("MainWindow")
         MainWindow.setWindowIcon(QtGui.QIcon(title_icon))
@@ -217,9 +281,8 @@ class Ui_MainWindow(object):
         self.APIData.setObjectName("APIData")
         self.APIData.setMaximumHeight(percentSize(MainWindow,0,80)[1])
 
-        _, api_keys = apiKeys(enc_pass)
-
-        self.api_keys_list = [[key, value["key"],value["inTools"]] for key, value in api_keys.items()]
+        # served from the unlocked session, no decryption here
+        self.api_keys_list = self.session.as_list()
 
         self.model = TableModel(self.api_keys_list)
         self.APIData.setModel(self.model)
@@ -318,56 +381,60 @@ class Ui_MainWindow(object):
                 self.changed_values.append((row, column, value))
 
     def save_api_data(self, text):
+        # returns the APISyncWorker saving the keys, None when nothing was started
+        if not unlock_prompt(MainWindow, self.session):
+            return None
         for i,j,keys in self.changed_values:
             self.api_keys_list[i][j] = keys
 
-        update_api_keys = {item[0]: {"key":item[1],"inTools":item[2]} for item in self.api_keys_list}
-
-        apiKeys(enc_pass, update_api_keys)
-        
         #-------- Adding API keys in supported tools ----------------
-        try:
-            for api in self.api_keys_list:
-                # api[0]=name, api[1]=key, api[2]=inTools
-
-                if 'Recon-NG' in api[2]:    
-                    subprocess.run(["sqlite3", "/home/csi/.recon-ng/keys.db", f'UPDATE keys SET Value = "{api[1]}" WHERE name="{api[0]}";'])
-                if 'hades' in api[0]:  
-                    subprocess.run(["sed", "-i", "s/atiikey=''/atiikey='$key'/g", "/opt/csitools/ProjectHades"])
-                if 'Spiderfoot' in api[2]:
-                    #improve it more
-                    search_term = api[0]    # e.g. shodan_api = [shodan,api]  to search into spiderfoot config
-                    # Using regex for finding the api name dynamically.
-                    subprocess.run(["sed", "-i", "-E", f"s/(^sfp.*{search_term[0]}.*{search_term[1]}.*=)(key value)?/\\1{api[1]}/", "/opt/csitools/SpiderFoot.cfg"])
-        
-        except Exception as e:
-            print("Got error during adding API data to supported tools!")
-            print(e)
-                
-        
-        show_message_box("Success",text)
+        return self.start_sync("save", text)
 
     def wipe_data(self):
         result = show_message_box("Confirmation", "Do you want to proceed?", QMessageBox.Question, QMessageBox.Yes | QMessageBox.No)
         if result == QMessageBox.Yes:
-            empty_api_keys = {item[0]: {"key":'',"inTools":item[2]} for item in self.api_keys_list}
-            
-            apiKeys(enc_pass, empty_api_keys)
-            
-            try:
-                # Wiping data from supported tools using bash commands for better readability
-                subprocess.run(["cp", "/opt/theHarvester/api-backup","/opt/theHarvester/api-keys.yaml"])
-                subprocess.run(["cp", "/opt/OSINT-Search/osintSearch.config.back", "/opt/OSINT-Search/osintSearch.config.ini"])
-                subprocess.run(["cp", "/opt/csitools/SpiderFoot.empty", "/opt/csitools/SpiderFoot.cfg"])
-                for api in self.api_keys_list:  # api[0], first entry is name
-                    if 'Recon-NG' in api[2]:
-                        subprocess.run(["sqlite3", "/home/csi/.recon-ng/keys.db", f'UPDATE keys SET Value = "" WHERE name="{api[0]}";'])
-            except Exception as e:
-                print("Got error during wiping API data from supported tools!")
-                print(e)
-
-            show_message_box("Success","Data Removed From APIKeys, Recon-NG, theHarvester, OSINT-Search and SpiderFoot Successfully!",QMessageBox.Information)
+            if not unlock_prompt(MainWindow, self.session):
+                return
+            self.start_sync("wipe", "Data Removed From APIKeys, Recon-NG, theHarvester, OSINT-Search and SpiderFoot Successfully!")
+
+    def start_sync(self, mode, text):
+        if self.worker is not None:
+            show_message_box("Busy", "The API keys are still being saved, try again once it is done.", QMessageBox.Warning)
+            return None
+        self.saveBtn.setEnabled(False)
+        self.wipeBtn.setEnabled(False)
+        self.cancelBtn = QtWidgets.QPushButton("Cancel")
+        self.statusbar.addPermanentWidget(self.cancelBtn)
+
+        self.worker = APISyncWorker(self.session, [list(api) for api in self.api_keys_list], mode, self.main_window)
+        self.worker.progress.connect(self.statusbar.showMessage)
+        self.worker.done.connect(functools.partial(self.sync_finished, mode, text))
+        self.cancelBtn.clicked.connect(self.worker.cancel)
+        self.worker.start()
+        return self.worker
+
+    def stop_sync(self):
+        # on quit: the tool being updated is finished, the others are left as they were
+        if self.worker is not None:
+            self.worker.requestInterruption()
+            self.worker.wait()
+
+    def sync_finished(self, mode, text, results):
+        self.worker.wait()
+        self.worker = None
+        self.statusbar.removeWidget(self.cancelBtn)
+        self.cancelBtn.deleteLater()
+        self.saveBtn.setEnabled(True)
+        self.wipeBtn.setEnabled(True)
+        self.statusbar.clearMessage()
+
+        summary = sync_summary(results)
+        if sync_failed(results):
+            show_message_box("Warning", f"Some tools were not updated:\n\n{summary}", QMessageBox.Warning)
+        else:
+            show_message_box("Success", f"{text}\n\n{summary}")
 
+        if mode == "wipe":
             self.setupUi(MainWindow)
         
     
@@ -382,7 +449,6 @@ class Ui_MainWindow(object):
         dialog.finished.connect(self.dialog_finished)
 
     def dialog_finished(self, result):
-        print("reached here")
         self.setupUi(MainWindow)
     
     def change_theme(self, mode):
@@ -412,7 +478,7 @@ if __name__ == "__main__":
     MainWindow.setWindowIcon(QtGui.QIcon(title_icon))
     Ui_MainWindow.center(window=MainWindow)
 
-    is_enc_file_avaiable, _ = apiKeys()
+    is_enc_file_avaiable = session.is_store_available()
     # Creating encrypted APIKeys by setting up new password
     if not is_enc_file_avaiable:
         new_password, ok = QInputDialog.getText(MainWindow, "Set New Password", "Enter a New Password:", QLineEdit.Password)
@@ -420,9 +486,8 @@ if __name__ == "__main__":
             confirm_password, ok = QInputDialog.getText(MainWindow, "Set New Password", "ReEnter the Password:", QLineEdit.Password)
             if ok:
                 if new_password != '' and new_password == confirm_password :
-                    apiKeys(new_password)
+                    session.create(new_password)
                     show_message_box("Success","Password Set Successfully!",QMessageBox.Information)
-                    enc_pass=new_password
                 else:
                     msg_box = QMessageBox()
                     show_message_box("Error","Password Confirmation Failed!",QMessageBox.Warning)
@@ -436,19 +501,24 @@ if __name__ == "__main__":
         decrypt_password, ok = QInputDialog.getText(MainWindow, "Password to Decrypt", "Enter Password to decrypt the API Keys File:", QLineEdit.Password)
         if ok:
             try:
-                # to check if password is correct
-                apiKeys(decrypt_password)
-                
-                enc_pass=decrypt_password
+                # checks the password and keeps the decrypted keys for the whole session
+                session.unlock(decrypt_password)
             except ValueError:
                 show_message_box("Error","Failed to Decrypt With this Password!",QMessageBox.Warning)
                 exit()
+        else:
+            exit()
             
     # Again declaring to set the location to center
     MainWindow = QtWidgets.QMainWindow()
 
     ui = Ui_MainWindow()
     ui.setupUi(MainWindow)
+    app.aboutToQuit.connect(ui.stop_sync)
     MainWindow.show()
+    perftrace.mark("window shown")
+    # CSI_PROFILE=seconds: the profile is saved once they are over (or on exit)
+    if perftrace.profile_remaining() is not None:
+        QtCore.QTimer.singleShot(int(perftrace.profile_remaining() * 1000), save_profile)
 
     sys.exit(app.exec_())
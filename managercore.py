@@ -0,0 +1,134 @@
+# Operations behind the CSI Manager tabs and manageapis that don't need a GUI,
+# shared by the widgets and the csi-manager command line. Nothing here (or in
+# what it imports) may import Qt. The modules behind each operation are imported
+# when it runs, so a CLI command only loads what it uses.
+import os, json
+
+from csilibs.data import agencyData, Templates, KeywordLists
+
+
+#--------------------------------------------- Agency info ----------------------------------------------#
+
+def load_agency_info():
+    with open(agencyData.file_path, 'r') as f:
+        return json.load(f)
+
+
+def save_agency_info(agency_info):
+    from toolsync import write_atomic
+    write_atomic(agencyData.file_path, json.dumps(agency_info))
+
+
+def set_agency_fields(changes):
+    # updates the given existing fields, raises KeyError for a field the agency info doesn't have
+    agency_info = load_agency_info()
+    for field in changes:
+        if field not in agency_info:
+            raise KeyError(field)
+    agency_info.update(changes)
+    save_agency_info(agency_info)
+    return agency_info
+
+
+#--------------------------------------------- Keyword lists --------------------------------------------#
+
+def keyword_lists_dir():
+    return KeywordLists.dir_path
+
+
+def keyword_lists():
+    from listtools import is_listed
+    lists_dir = keyword_lists_dir()
+    return sorted(name for name in os.listdir(lists_dir) if is_listed(name) and os.path.isfile(os.path.join(lists_dir, name)))
+
+
+def add_keyword_lists(src_paths, overwrite=False, progress=None, cancelled=None):
+    # (ImportResults, conflicts left out), conflicts are (src, dest) pairs
+    from bulkimport import plan_import, import_files
+    jobs, conflicts = plan_import(src_paths, keyword_lists_dir())
+    if overwrite:
+        jobs, conflicts = jobs + conflicts, []
+    return import_files(jobs, progress=progress, cancelled=cancelled), conflicts
+
+
+def remove_keyword_list(file_name):
+    # raises FileNotFoundError for a list that isn't there
+    if os.path.basename(file_name) != file_name:
+        raise ValueError(f"Not a list name: {file_name}")
+    os.remove(os.path.join(keyword_lists_dir(), file_name))
+
+
+def search_keywords(query, mode="exact", ignore_case=False, limit=1000):
+    # brings the index up to date first, only changed lists are read
+    from keywordindex import KeywordIndex
+    index = KeywordIndex(keyword_lists_dir())
+    try:
+        index.refresh()
+        return index.search(query, mode, ignore_case, limit)
+    finally:
+        index.close()
+
+
+#----------------------------------------------- Templates ----------------------------------------------#
+
+def templates_dir():
+    return Templates.dir_path
+
+
+def scan_template_file(file_name):
+    # TemplateScan through the template index, so unchanged templates aren't read again
+    from templateindex import templateIndex
+    return templateIndex(templates_dir()).scan(file_name)
+
+
+def fill_template_file(file_name, dest_path, var_val_dict, img_dict=None):
+    from templatezip import render_template
+    file_ext = os.path.splitext(file_name)[1]
+    if not dest_path.lower().endswith(file_ext.lower()):
+        dest_path += file_ext
+    render_template(os.path.join(templates_dir(), file_name), dest_path, var_val_dict, img_dict)
+    return dest_path
+
+
+#----------------------------------------------- API keys -----------------------------------------------#
+
+def sync_api_keys(session, api_keys_list, mode="save", progress=None, cancelled=None):
+    # Saves the rows ([name, key, inTools]) in the encrypted file, then writes them in
+    # the tools ("save") or empties both ("wipe"). Returns "API Keys" and every tool
+    # mapped to its result, the exception it raised or None when cancelled.
+    from toolsync import push_api_keys, wipe_api_keys
+    if mode == "wipe":
+        api_keys = {item[0]: {"key":'',"inTools":item[2]} for item in api_keys_list}
+        sync_tools = wipe_api_keys
+    else:
+        api_keys = {item[0]: {"key":item[1],"inTools":item[2]} for item in api_keys_list}
+        sync_tools = push_api_keys
+
+    try:
+        session.save(api_keys)
+    except Exception as e:
+        return {"API Keys": e}
+
+    results = {"API Keys": True}
+    results.update(sync_tools(api_keys_list, progress=progress, cancelled=cancelled))
+    return results
+
+
+def sync_failed(results):
+    return any(result is None or isinstance(result, Exception) for result in results.values())
+
+
+def sync_summary(results):
+    # one line per tool, shown once a save/wipe is done
+    from toolsync import ReconSyncResult, ConfigSyncResult
+    lines = []
+    for tool, result in results.items():
+        if result is None:
+            lines.append(f"{tool}: Cancelled")
+        elif isinstance(result, Exception):
+            lines.append(f"{tool}: FAILED ({result})")
+        elif isinstance(result, (ReconSyncResult, ConfigSyncResult)) and result.missing:
+            lines.append(f"{tool}: Done, no entry for {', '.join(result.missing)}")
+        else:
+            lines.append(f"{tool}: Done")
+    return "\n".join(lines)
@@ -0,0 +1,228 @@
+# Performance diagnostics for CSI Manager, manageapis and the csi-manager CLI,
+# standard library only so any module can use it.
+#
+# Spans: `with perftrace.span("template.scan", file=name):` times the block and
+# appends one JSON line to the perf log (~/.cache/csi-manager/perf.jsonl, rotated
+# at 1 MB, 3 old files kept). CSI_PERF_LOG=path writes it elsewhere, 0 turns it off.
+#
+#   {"time": 1760000000.123, "span": "toolsync.push", "ms": 41.2, "pid": 4242, "thread": "Dummy-1", "tool": "Spiderfoot"}
+#
+# Profiles: start_profile(seconds) runs cProfile on the calling thread (the GUI
+# thread, workers aren't included) and stop_profile() saves a .pstats dump and a
+# text summary under ~/.cache/csi-manager/profiles. CSI_PROFILE=seconds profiles
+# from startup, the "Diagnostics" menu of CSI Manager does it on demand.
+#
+# Imports: with CSI_IMPORT_TIMES set, every module imported for the first time is
+# timed, like `python3 -X importtime`, and a report is printed when the program
+# exits: CSI_IMPORT_TIMES=1 prints it on stderr, any other value is a file path.
+#
+#   CSI_IMPORT_TIMES=1 ./CSI_Manager.py
+#
+# The report lists the imports in order (self and cumulative microseconds, nested
+# imports indented), then the slowest ones. mark() splits it in phases, so the
+# imports done lazily by a tab show up under the tab instead of under startup.
+import os, sys, json, time, atexit, builtins, threading
+
+IMPORT_TIMES_ENV = "CSI_IMPORT_TIMES"
+TOP_IMPORTS = 15
+
+PERF_LOG_ENV = "CSI_PERF_LOG"
+PERF_LOG = os.path.join(os.path.expanduser("~"), ".cache", "csi-manager", "perf.jsonl")
+PERF_LOG_MAX_BYTES = 1024 * 1024
+PERF_LOG_BACKUPS = 3
+
+PROFILE_ENV = "CSI_PROFILE"
+PROFILE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "csi-manager", "profiles")
+PROFILE_SUMMARY_LINES = 40
+
+_imports = []
+_phase = ["startup"]
+_threads = threading.local()  # .stack: nested imports in progress, per thread (workers import too)
+_start = time.perf_counter()
+_original_import = None
+_log_lock = threading.Lock()
+_profiler = None
+_profile_deadline = None
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    # only first imports cost anything, the others are a sys.modules lookup
+    if level or name in sys.modules:
+        return _original_import(name, globals, locals, fromlist, level)
+    stack = _threads.__dict__.setdefault("stack", [])
+    stack.append(0)
+    phase = _phase[0]
+    started = time.perf_counter()
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        cumulative = int((time.perf_counter() - started) * 1e6)
+        nested = stack.pop()
+        if stack:
+            stack[-1] += cumulative
+        _imports.append((phase, name, cumulative - nested, cumulative, len(stack)))
+
+
+def trace_imports():
+    # installs the import timer if CSI_IMPORT_TIMES is set, once per process
+    global _original_import
+    target = os.environ.get(IMPORT_TIMES_ENV)
+    if not target or _original_import is not None:
+        return
+    _original_import = builtins.__import__
+    builtins.__import__ = _timed_import
+    atexit.register(_write_report, target)
+
+
+def mark(phase):
+    # imports from now on are reported under phase, e.g. "window shown" or "tab: API Keys"
+    if _original_import is not None:
+        _imports.append((phase, None, 0, int((time.perf_counter() - _start) * 1e6), 0))
+        _phase[0] = phase
+
+
+def slowest_imports(count=TOP_IMPORTS):
+    # [(name, cumulative us, phase)] of the slowest imports so far
+    slowest = sorted((item for item in _imports if item[1] is not None), key=lambda item: item[3], reverse=True)
+    return [(name, cumulative_us, phase) for phase, name, self_us, cumulative_us, depth in slowest[:count]]
+
+
+def import_report():
+    lines = [f"import time: {'self [us]':>9} | {'cumulative':>10} | imported package"]
+    phase_totals = {}
+    for phase, name, self_us, cumulative_us, depth in _imports:
+        if name is None:
+            lines.append(f"-- {phase} ({cumulative_us / 1000:.1f} ms since start)")
+            continue
+        lines.append(f"import time: {self_us:9d} | {cumulative_us:10d} | {'  ' * depth}{name}")
+        if depth == 0:
+            phase_totals[phase] = phase_totals.get(phase, 0) + cumulative_us
+
+    lines.append("")
+    lines.append("imports by phase:")
+    for phase, total in phase_totals.items():
+        lines.append(f"  {total / 1000:9.1f} ms  {phase}")
+    lines.append(f"slowest {TOP_IMPORTS} imports (cumulative):")
+    for name, cumulative_us, phase in slowest_imports():
+        lines.append(f"  {cumulative_us / 1000:9.1f} ms  {name} ({phase})")
+    return "\n".join(lines)
+
+
+def _write_report(target):
+    report = import_report()
+    if target == "1":
+        print(report, file=sys.stderr)
+    else:
+        with open(target, 'w') as f:
+            f.write(report + "\n")
+
+
+#------------------------------------------------- Spans ------------------------------------------------#
+
+def perf_log_path():
+    # None when the spans are turned off
+    path = os.environ.get(PERF_LOG_ENV) or PERF_LOG
+    return None if path == "0" else path
+
+
+def _rotate(path):
+    # perf.jsonl -> perf.jsonl.1 -> ... -> perf.jsonl.<PERF_LOG_BACKUPS>, the oldest is dropped
+    for i in range(PERF_LOG_BACKUPS - 1, 0, -1):
+        if os.path.exists(f"{path}.{i}"):
+            os.replace(f"{path}.{i}", f"{path}.{i + 1}")
+    os.replace(path, f"{path}.1")
+
+
+def record(name, seconds, fields=None, error=None):
+    # appends one span to the perf log, never raises: diagnostics mustn't break what they measure
+    path = perf_log_path()
+    if path is None:
+        return
+    entry = {"time": round(time.time(), 3), "span": name, "ms": round(seconds * 1000, 3),
+             "pid": os.getpid(), "thread": threading.current_thread().name}
+    entry.update(fields or {})
+    if error is not None:
+        entry["error"] = error.__name__
+    line = json.dumps(entry, default=str) + "\n"
+    with _log_lock:
+        try:
+            if os.path.exists(path):
+                if os.path.getsize(path) >= PERF_LOG_MAX_BYTES:
+                    _rotate(path)
+            else:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, 'a') as f:
+                f.write(line)
+        except OSError:
+            pass
+
+
+class span:
+    # times a with block into the perf log, fields added to span.fields inside the block are logged too
+    __slots__ = ("name", "fields", "started")
+
+    def __init__(self, name, **fields):
+        self.name = name
+        self.fields = fields
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record(self.name, time.perf_counter() - self.started, self.fields, exc_type)
+        return False
+
+
+#------------------------------------------------ Profiles ----------------------------------------------#
+
+def start_profile(seconds):
+    # False when a profile is already running. The caller stops it once `seconds` are
+    # over (profile_remaining() tells how long is left), exiting stops it too.
+    global _profiler, _profile_deadline
+    if _profiler is not None:
+        return False
+    import cProfile
+    _profiler = cProfile.Profile()
+    _profile_deadline = time.monotonic() + seconds
+    _profiler.enable()
+    atexit.register(stop_profile)
+    return True
+
+
+def profile_from_env():
+    # starts the CSI_PROFILE=seconds profile, if asked for
+    seconds = os.environ.get(PROFILE_ENV)
+    if seconds:
+        try:
+            start_profile(float(seconds))
+        except ValueError:
+            print(f"{PROFILE_ENV} must be a number of seconds, got {seconds!r}", file=sys.stderr)
+
+
+def profile_remaining():
+    # seconds left in the running profile, None when there is none
+    if _profiler is None:
+        return None
+    return max(0.0, _profile_deadline - time.monotonic())
+
+
+def stop_profile():
+    # saves the running profile, returns the .pstats path (None when nothing was running)
+    global _profiler, _profile_deadline
+    if _profiler is None:
+        return None
+    profiler, _profiler, _profile_deadline = _profiler, None, None
+    profiler.disable()
+    atexit.unregister(stop_profile)
+
+    import io, pstats
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, f"profile-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.pstats")
+    profiler.dump_stats(path)
+    # readable copy to paste in a bug report, `python3 -m pstats <file>` opens the dump
+    summary = io.StringIO()
+    pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(PROFILE_SUMMARY_LINES)
+    with open(os.path.splitext(path)[0] + ".txt", 'w') as f:
+        f.write(summary.getvalue())
+    return path
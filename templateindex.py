@@ -0,0 +1,203 @@
+# Persistent index of what every report template contains, so the fill dialog
+# doesn't rescan a template that hasn't changed. Entries are keyed by size and
+# mtime, with the content hash deciding when those changed but the file didn't, and
+# by the scanner version that produced them.
+import os, json, time, hashlib, sqlite3
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from templatezip import SCAN_VERSION, TemplateScan, scan_template
+
+# what the gallery shows about a template, error is set for templates that couldn't be read
+TemplateInfo = namedtuple("TemplateInfo", ["name", "size", "placeholders", "images", "scan_seconds", "error"])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS templates (
+    name TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    parts TEXT NOT NULL,
+    images TEXT NOT NULL,
+    scanned_at REAL NOT NULL,
+    scan_seconds REAL NOT NULL,
+    error TEXT,
+    scanner INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS template_vars (
+    name TEXT NOT NULL REFERENCES templates(name) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    var TEXT NOT NULL,
+    PRIMARY KEY (name, position)
+);
+CREATE INDEX IF NOT EXISTS template_vars_var ON template_vars(var);
+"""
+
+
+def default_index_path(templates_dir):
+    # next to the templates directory, so the gallery doesn't list it as a template
+    templates_dir = os.path.abspath(templates_dir)
+    return os.path.join(os.path.dirname(templates_dir), f".{os.path.basename(templates_dir)}_index.sqlite")
+
+
+def file_sha256(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class TemplateIndex:
+    def __init__(self, templates_dir, index_path=None):
+        self.templates_dir = templates_dir
+        self.index_path = index_path or default_index_path(templates_dir)
+        self.conn = sqlite3.connect(self.index_path)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.executescript(SCHEMA)
+        # indexes created before templates could be recorded as broken
+        columns = [column[1] for column in self.conn.execute("PRAGMA table_info(templates)")]
+        if 'error' not in columns:
+            self.conn.execute("ALTER TABLE templates ADD COLUMN error TEXT")
+        # and before the scanner version was recorded: their rows get 0, so they are rescanned
+        if 'scanner' not in columns:
+            self.conn.execute("ALTER TABLE templates ADD COLUMN scanner INTEGER NOT NULL DEFAULT 0")
+
+    def fresh(self, file_name):
+        # True when the indexed entry still matches the file on disk and the current scanner
+        file_path = os.path.join(self.templates_dir, file_name)
+        row = self.conn.execute("SELECT size, mtime_ns, sha256, scanner FROM templates WHERE name = ?", (file_name,)).fetchone()
+        if row is None or row[3] != SCAN_VERSION:
+            return False
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            self.forget(file_name)
+            return False
+
+        size, mtime_ns, sha256, scanner = row
+        if (st.st_size, st.st_mtime_ns) != (size, mtime_ns):
+            # touched or copied over: only a different content invalidates the entry
+            if file_sha256(file_path) != sha256:
+                return False
+            with self.conn:
+                self.conn.execute("UPDATE templates SET size = ?, mtime_ns = ? WHERE name = ?", (st.st_size, st.st_mtime_ns, file_name))
+        return True
+
+    def lookup(self, file_name):
+        # TemplateScan from the index if the file is unchanged, None if it has to be scanned
+        if not self.fresh(file_name):
+            return None
+        parts, images, error = self.conn.execute("SELECT parts, images, error FROM templates WHERE name = ?", (file_name,)).fetchone()
+        if error is not None:
+            return None
+
+        var_names = [var for var, in self.conn.execute("SELECT var FROM template_vars WHERE name = ? ORDER BY position", (file_name,))]
+        return TemplateScan(var_names, json.loads(parts), json.loads(images))
+
+    def scan(self, file_name):
+        templ_scan = self.lookup(file_name)
+        if templ_scan is None:
+            file_path = os.path.join(self.templates_dir, file_name)
+            st = os.stat(file_path)
+            start = time.perf_counter()
+            templ_scan = scan_template(file_path)
+            self.store(file_name, st.st_size, st.st_mtime_ns, file_sha256(file_path), templ_scan, time.perf_counter() - start)
+        return templ_scan
+
+    def info(self, file_name):
+        # TemplateInfo of an unchanged template, None if it has to be scanned
+        if not self.fresh(file_name):
+            return None
+        size, images, scan_seconds, error = self.conn.execute("SELECT size, images, scan_seconds, error FROM templates WHERE name = ?", (file_name,)).fetchone()
+        placeholders, = self.conn.execute("SELECT COUNT(*) FROM template_vars WHERE name = ?", (file_name,)).fetchone()
+        return TemplateInfo(file_name, size, placeholders, len(json.loads(images)), scan_seconds, error)
+
+    def store(self, file_name, size, mtime_ns, sha256, templ_scan, scan_seconds, error=None):
+        with self.conn:
+            self.conn.execute("DELETE FROM templates WHERE name = ?", (file_name,))
+            self.conn.execute("INSERT INTO templates VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                              (file_name, size, mtime_ns, sha256, json.dumps(templ_scan.parts),
+                               json.dumps(templ_scan.images), time.time(), scan_seconds, error, SCAN_VERSION))
+            self.conn.executemany("INSERT INTO template_vars VALUES (?, ?, ?)",
+                                  [(file_name, i, var) for i, var in enumerate(templ_scan.var_names)])
+
+    def forget(self, file_name):
+        with self.conn:
+            self.conn.execute("DELETE FROM templates WHERE name = ?", (file_name,))
+
+    def rename(self, old_name, new_name):
+        with self.conn:
+            self.conn.execute("DELETE FROM templates WHERE name = ?", (new_name,))
+            self.conn.execute("INSERT INTO templates SELECT ?, size, mtime_ns, sha256, parts, images, scanned_at, scan_seconds, error, scanner FROM templates WHERE name = ?", (new_name, old_name))
+            self.conn.execute("UPDATE template_vars SET name = ? WHERE name = ?", (new_name, old_name))
+            self.conn.execute("DELETE FROM templates WHERE name = ?", (old_name,))
+
+    def templates_using(self, var):
+        # names of the indexed templates containing the <var> placeholder
+        return [name for name, in self.conn.execute("SELECT DISTINCT name FROM template_vars WHERE var = ? ORDER BY name", (var,))]
+
+    def close(self):
+        self.conn.close()
+
+
+def prescan_template(file_path):
+    # runs in the worker processes of prescan_templates, everything returned is picklable
+    st = os.stat(file_path)
+    start = time.perf_counter()
+    try:
+        templ_scan, error = scan_template(file_path), None
+    except Exception as e:
+        templ_scan, error = TemplateScan([], [], []), f"{type(e).__name__}: {e}"
+    scan_seconds = time.perf_counter() - start
+    return os.path.basename(file_path), st.st_size, st.st_mtime_ns, file_sha256(file_path), templ_scan, scan_seconds, error
+
+
+def prescan_templates(templates_dir, file_names, max_workers=None, cancelled=None):
+    # yields a TemplateInfo per template as results arrive: indexed ones first, then the
+    # changed/new ones scanned in parallel on every core. Uses its own index connection,
+    # so it can run on any thread.
+    index = TemplateIndex(templates_dir)
+    try:
+        stale = []
+        for file_name in file_names:
+            if cancelled and cancelled():
+                return
+            try:
+                info = index.info(file_name)
+            except OSError:
+                continue
+            if info is None:
+                stale.append(os.path.join(templates_dir, file_name))
+            else:
+                yield info
+        if not stale:
+            return
+
+        # spawn: forking a process with GUI threads running isn't safe
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = [pool.submit(prescan_template, file_path) for file_path in stale]
+            for future in as_completed(futures):
+                if cancelled and cancelled():
+                    for pending in futures:
+                        pending.cancel()
+                    return
+                try:
+                    file_name, size, mtime_ns, sha256, templ_scan, scan_seconds, error = future.result()
+                except OSError:
+                    continue    # removed while scanning
+                index.store(file_name, size, mtime_ns, sha256, templ_scan, scan_seconds, error)
+                yield TemplateInfo(file_name, size, len(templ_scan.var_names), len(templ_scan.images), scan_seconds, error)
+    finally:
+        index.close()
+
+
+_indexes = {}
+
+def templateIndex(templates_dir):
+    # one open index per templates directory for the whole application
+    templates_dir = os.path.abspath(templates_dir)
+    if templates_dir not in _indexes:
+        _indexes[templates_dir] = TemplateIndex(templates_dir)
+    return _indexes[templates_dir]
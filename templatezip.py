@@ -0,0 +1,330 @@
+# Reads and fills report templates (.docx/.odt) straight from their zip, without
+# extracting them. Used by the template dialogs and any GUI-free code.
+import os, re, copy, shutil, struct, tempfile, zipfile
+from collections import namedtuple
+from xml.parsers import expat
+from xml.sax.saxutils import escape
+
+import perftrace
+
+# <var_name> in the text of a paragraph (the XML has it escaped as &lt;var_name&gt;)
+PLACEHOLDER_PATTERN = r'<([^<>]+?)>'
+
+# bumped whenever scan_template can find something else in the same file, so the template
+# index rescans what an older scanner indexed (1: regex over each part, 2: streamed parts
+# with placeholders split over text runs, 3: odt styles.xml scanned before content.xml)
+SCAN_VERSION = 3
+
+# var_names: placeholders in order of first use, parts: XML members scanned, images: image members
+TemplateScan = namedtuple("TemplateScan", ["var_names", "parts", "images"])
+# spans: (start, end) byte ranges of the part holding the placeholder's text, one per
+# text run it is split over. The value goes in the first span, the others are removed.
+Placeholder = namedtuple("Placeholder", ["name", "spans"])
+
+# body, every header/footer and the notes of a docx; odt keeps headers/footers in styles.xml
+DOCX_PARTS = re.compile(r'^word/(document|header\d*|footer\d*|footnotes|endnotes)\.xml$')
+ODT_PARTS = ('styles.xml', 'content.xml')    # in the fill form's order, like the docx parts
+IMAGE_DIRS = {'.docx': 'word/media/', '.odt': 'Pictures/'}
+# markup replacing the new lines of multi-line values (e.g. *_list variables)
+LINE_BREAKS = {'.docx': '</w:t><w:br/><w:t xml:space="preserve">', '.odt': '<text:line-break/>'}
+
+_LOCAL_HEADER = struct.Struct(zipfile.structFileHeader)
+_NAME_LENGTH, _EXTRA_LENGTH = 10, 11    # fields of the local file header
+_ZIP64_EXTRA_ID = 0x0001
+_DATA_DESCRIPTOR_FLAG = 0x08
+# ZipFile attributes (not public API) updated by copy_raw_member
+_RAW_COPY_ATTRS = ("fp", "start_dir", "filelist", "NameToInfo")
+
+_CHUNK_SIZE = 64 * 1024
+_W_NAMESPACES = ("http://schemas.openxmlformats.org/wordprocessingml/2006/main",
+                 "http://purl.oclc.org/ooxml/wordprocessingml/main")
+_TEXT_NAMESPACE = "urn:oasis:names:tc:opendocument:xmlns:text:1.0"
+# (paragraph elements, element holding the text or None when any text of the paragraph counts)
+_TEXT_MODEL = {
+    '.docx': ({f"{ns} p" for ns in _W_NAMESPACES}, {f"{ns} t" for ns in _W_NAMESPACES}),
+    '.odt': ({f"{_TEXT_NAMESPACE} p", f"{_TEXT_NAMESPACE} h"}, None),
+}
+
+
+def template_kind(file_path):
+    for kind in IMAGE_DIRS:
+        if file_path.lower().endswith(kind):
+            return kind
+    raise ValueError(f"Unsupported template type: {file_path}")
+
+
+def xml_parts(member_names, kind):
+    if kind == '.odt':
+        return [name for name in ODT_PARTS if name in member_names]
+    # same order the fill form always used: headers, footers, then the body
+    order = ['header', 'footer', 'document', 'footnotes', 'endnotes']
+    parts = [name for name in member_names if DOCX_PARTS.match(name)]
+    return sorted(parts, key=lambda name: (order.index(re.sub(r'\d', '', DOCX_PARTS.match(name).group(1))), len(name), name))
+
+
+def image_members(member_names, kind):
+    img_dir = IMAGE_DIRS[kind]
+    return [name for name in member_names if name.startswith(img_dir) and not name.endswith('/')]
+
+
+def remove_duplicates(lst):
+    new_list = []
+    seen = set()
+
+    for item in lst:
+        if item not in seen:
+            new_list.append(item)
+            seen.add(item)
+
+    return new_list
+
+
+class _PartScanner:
+    # Streams one XML part through expat, joining the text runs of each paragraph so
+    # placeholders split over several runs (Word does that around spell checks and
+    # edits) are still found. Only the current paragraph's text is kept in memory.
+    # Every piece of text is recorded with its raw byte range, which ends where the
+    # next parser event starts.
+
+    def __init__(self, kind):
+        self.paragraph_tags, self.text_tags = _TEXT_MODEL[kind]
+        self.parser = expat.ParserCreate(namespace_separator=' ')
+        self.parser.buffer_text = False
+        self.parser.StartElementHandler = self.start
+        self.parser.EndElementHandler = self.end
+        self.parser.CharacterDataHandler = self.text
+        self.parser.CommentHandler = self.other
+        self.parser.ProcessingInstructionHandler = self.other
+        self.parser.StartCdataSectionHandler = self.other
+        self.parser.EndCdataSectionHandler = self.other
+
+        self.paragraphs = []    # open paragraphs, each a list of [start, end, text] pieces
+        self.text_depth = 0     # open text elements (w:t) in the current paragraph
+        self.pending = None     # piece waiting for the start of the next event
+        self.found = []
+
+    def close_pending(self):
+        if self.pending is not None:
+            self.pending[1] = self.parser.CurrentByteIndex
+            self.pending = None
+
+    def start(self, tag, attrs):
+        self.close_pending()
+        if tag in self.paragraph_tags:
+            self.paragraphs.append([])
+        elif self.text_tags is not None and tag in self.text_tags:
+            self.text_depth += 1
+
+    def end(self, tag):
+        self.close_pending()
+        if tag in self.paragraph_tags and self.paragraphs:
+            self.paragraphEnd(self.paragraphs.pop())
+        elif self.text_tags is not None and tag in self.text_tags:
+            self.text_depth -= 1
+
+    def text(self, data):
+        self.close_pending()
+        if self.paragraphs and (self.text_tags is None or self.text_depth > 0):
+            self.pending = [self.parser.CurrentByteIndex, None, data]
+            self.paragraphs[-1].append(self.pending)
+
+    def other(self, *args):
+        self.close_pending()
+
+    def paragraphEnd(self, pieces):
+        paragraph_text = ''.join(piece[2] for piece in pieces)
+        if '<' not in paragraph_text:
+            return
+        offsets, position = [], 0
+        for piece in pieces:
+            offsets.append(position)
+            position += len(piece[2])
+
+        for match in re.finditer(PLACEHOLDER_PATTERN, paragraph_text):
+            spans = []
+            for offset, (start, end, data) in zip(offsets, pieces):
+                low, high = max(match.start(), offset) - offset, min(match.end(), offset + len(data)) - offset
+                if low >= high:
+                    continue
+                if end - start == len(data.encode('utf-8')):
+                    # literal text, byte positions follow the characters
+                    spans.append((start + len(data[:low].encode('utf-8')), start + len(data[:high].encode('utf-8'))))
+                else:
+                    # an entity/character reference (&lt; etc.), a single character
+                    spans.append((start, end))
+            self.found.append(Placeholder(match.group(1), tuple(spans)))
+
+    def feed(self, data, final=False):
+        self.parser.Parse(data, final)
+        found, self.found = self.found, []
+        return found
+
+
+def iter_placeholders(stream, kind):
+    # yields the Placeholders of an XML part (a binary stream) in document order
+    scanner = _PartScanner(kind)
+    for chunk in iter(lambda: stream.read(_CHUNK_SIZE), b''):
+        yield from scanner.feed(chunk)
+    yield from scanner.feed(b'', True)
+
+
+def scan_template(file_path):
+    # only the XML parts that can hold placeholders are decompressed, media is never touched
+    with perftrace.span("template.scan", file=os.path.basename(file_path)) as scan_span:
+        kind = template_kind(file_path)
+        var_names = []
+        with zipfile.ZipFile(file_path, 'r') as templ_file:
+            member_names = templ_file.namelist()
+            parts = xml_parts(member_names, kind)
+            for part in parts:
+                with templ_file.open(part) as content_file:
+                    var_names.extend(placeholder.name for placeholder in iter_placeholders(content_file, kind))
+        scan_span.fields.update(parts=len(parts), placeholders=len(var_names))
+
+    return TemplateScan(remove_duplicates(var_names), parts, image_members(member_names, kind))
+
+
+def escape_value(value, kind):
+    return LINE_BREAKS[kind].join(escape(line) for line in str(value).splitlines() or [''])
+
+
+def placeholder_edits(placeholders, var_val_dict, kind):
+    # (start, end, new bytes) edits filling the placeholders that have a value
+    edits = []
+    for placeholder in placeholders:
+        if placeholder.name not in var_val_dict:
+            continue
+        (start, end), *rest = placeholder.spans
+        edits.append((start, end, escape_value(var_val_dict[placeholder.name], kind).encode('utf-8')))
+        edits.extend((start, end, b'') for start, end in rest)
+    return sorted(edits)
+
+
+def apply_edits(src, dest, edits):
+    # streams src to dest replacing the sorted, non overlapping byte ranges of edits
+    position = 0
+    for start, end, data in edits:
+        _copy_bytes(src, dest, start - position)
+        dest.write(data)
+        src.read(end - start)
+        position = end
+    shutil.copyfileobj(src, dest, _CHUNK_SIZE)
+
+
+def _copy_bytes(src, dest, count):
+    while count > 0:
+        chunk = src.read(min(count, _CHUNK_SIZE))
+        if not chunk:
+            break
+        dest.write(chunk)
+        count -= len(chunk)
+
+
+def _strip_zip64_extra(extra):
+    # the local header gets a fresh zip64 field from FileHeader() when it needs one
+    stripped, i = b'', 0
+    while i + 4 <= len(extra):
+        xid, size = struct.unpack('<HH', extra[i:i + 4])
+        if xid != _ZIP64_EXTRA_ID:
+            stripped += extra[i:i + 4 + size]
+        i += 4 + size
+    return stripped
+
+
+def copy_member_info(info):
+    # ZipInfo for writing a member again under the same name, date and compression
+    zinfo = zipfile.ZipInfo(info.filename, info.date_time)
+    zinfo.compress_type = info.compress_type
+    zinfo.external_attr = info.external_attr
+    return zinfo
+
+
+def can_copy_raw(dest_zip):
+    # whether this zipfile still has the internals copy_raw_member writes to
+    return all(hasattr(dest_zip, attr) for attr in _RAW_COPY_ATTRS) and hasattr(zipfile.ZipInfo, "FileHeader")
+
+
+def copy_member(templ_file, info, dest_zip):
+    # copy_raw_member through the public API: decompressed and compressed again
+    with templ_file.open(info) as src, dest_zip.open(copy_member_info(info), 'w') as dest:
+        shutil.copyfileobj(src, dest, _CHUNK_SIZE)
+
+
+def copy_raw_member(src_fp, info, dest_zip):
+    # Copies a member's compressed bytes as they are, without decompressing or
+    # recompressing them. zipfile has no public API for this, so the local header
+    # is written the same way ZipFile._open_to_write does it. Check can_copy_raw()
+    # first, render_template falls back to copy_member without those internals.
+    src_fp.seek(info.header_offset)
+    header = _LOCAL_HEADER.unpack(src_fp.read(_LOCAL_HEADER.size))
+    name_len, extra_len = header[_NAME_LENGTH], header[_EXTRA_LENGTH]
+    src_fp.seek(info.header_offset + _LOCAL_HEADER.size + name_len + extra_len)
+
+    zinfo = copy.copy(info)
+    zinfo.flag_bits &= ~_DATA_DESCRIPTOR_FLAG     # sizes and CRC go in the local header
+    zinfo.extra = _strip_zip64_extra(info.extra)
+    dest_zip.fp.seek(dest_zip.start_dir)
+    zinfo.header_offset = dest_zip.fp.tell()
+    dest_zip.fp.write(zinfo.FileHeader())
+
+    remaining = info.compress_size
+    while remaining:
+        chunk = src_fp.read(min(remaining, 1024 * 1024))
+        if not chunk:
+            raise zipfile.BadZipFile(f"Truncated member {info.filename}")
+        dest_zip.fp.write(chunk)
+        remaining -= len(chunk)
+
+    dest_zip.start_dir = dest_zip.fp.tell()
+    dest_zip.filelist.append(zinfo)
+    dest_zip.NameToInfo[zinfo.filename] = zinfo
+
+
+def render_template(template_path, dest_path, var_val_dict, img_dict=None):
+    # Writes the filled report in one sequential pass over the template: XML parts
+    # with placeholders are streamed with the located runs rewritten, replaced images
+    # are written from their new files and every other member is copied as raw
+    # compressed bytes. Memory stays bounded whatever the size of the parts.
+    # img_dict: image member name (or its position in the template) -> new image path
+    with perftrace.span("template.render", file=os.path.basename(template_path), values=len(var_val_dict),
+                        images=len(img_dict or {})):
+        kind = template_kind(template_path)
+        dest_dir = os.path.dirname(os.path.abspath(dest_path))
+        fd, tmp_path = tempfile.mkstemp(prefix=".report-", suffix=kind, dir=dest_dir)
+        os.close(fd)
+        try:
+            with zipfile.ZipFile(template_path, 'r') as templ_file, open(template_path, 'rb') as src_fp, \
+                    zipfile.ZipFile(tmp_path, 'w') as report_file:
+                raw_copy = can_copy_raw(report_file)
+                member_names = templ_file.namelist()
+                parts = set(xml_parts(member_names, kind))
+                images = image_members(member_names, kind)
+                new_images = {}
+                for key, img_path in (img_dict or {}).items():
+                    new_images[images[key] if isinstance(key, int) else key] = img_path
+
+                for info in templ_file.infolist():
+                    if info.filename in new_images:
+                        with open(new_images[info.filename], 'rb') as img_file, \
+                                report_file.open(copy_member_info(info), 'w') as dest:
+                            shutil.copyfileobj(img_file, dest, 1024 * 1024)
+                        continue
+
+                    if info.filename in parts:
+                        # first pass locates the placeholders, the second streams the part with them filled
+                        with templ_file.open(info) as content_file:
+                            edits = placeholder_edits(iter_placeholders(content_file, kind), var_val_dict, kind)
+                        if edits:
+                            with templ_file.open(info) as content_file, \
+                                    report_file.open(copy_member_info(info), 'w') as dest:
+                                apply_edits(content_file, dest, edits)
+                            continue
+
+                    if raw_copy:
+                        copy_raw_member(src_fp, info, report_file)
+                    else:
+                        copy_member(templ_file, info, report_file)
+            os.replace(tmp_path, dest_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
@@ -0,0 +1,4 @@
+# The modules under test live at the top of the repository, next to the scripts.
+import os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,126 @@
+# External merge sort of keyword lists: the output must be what sorting the
+# whole list in memory gives, whatever the chunk size and number of runs.
+import os, gzip, random
+
+import pytest
+
+import listtools
+from listtools import sort_list, normalize_line, open_list
+
+
+def make_list(path, count, seed=0):
+    # terms with duplicates, case variants, padding, empty lines and NFKC-sensitive characters
+    rng = random.Random(seed)
+    words = [f"term{rng.randrange(count // 2)}" for _ in range(count)]
+    lines = []
+    for word in words:
+        variant = rng.randrange(6)
+        if variant == 0:
+            word = word.upper()
+        elif variant == 1:
+            word = f"  {word}\t"
+        elif variant == 2:
+            word = word.replace("term", "ｔｅｒｍ")     # fullwidth, NFKC folds it to ASCII
+        elif variant == 3:
+            lines.append("")
+        lines.append(word)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.writelines(line + '\n' for line in lines)
+    return lines
+
+
+def read_lines(path):
+    with open_list(path) as f:
+        return f.read().splitlines()
+
+
+def expected(lines, **options):
+    return sorted({normalize_line(line, **options) for line in lines} - {""})
+
+
+@pytest.mark.parametrize("chunk_bytes", [1, 200, 5000, 10 ** 9])
+def test_sort_matches_in_memory_sort(tmp_path, chunk_bytes):
+    # 1 byte: one line per run, so more than MERGE_FAN_IN runs and intermediate merges
+    src = tmp_path / "list.txt"
+    lines = make_list(src, 300)
+    stats = sort_list(str(src), str(tmp_path / "sorted.txt"), chunk_bytes=chunk_bytes, tmp_dir=str(tmp_path))
+
+    result = read_lines(tmp_path / "sorted.txt")
+    assert result == expected(lines)
+    assert stats.lines_in == len(lines)
+    assert stats.lines_out == len(result)
+    assert stats.lines_in == stats.lines_out + stats.duplicates + stats.empty
+
+
+def test_fan_in_merges_more_runs_than_files_open(tmp_path, monkeypatch):
+    monkeypatch.setattr(listtools, "MERGE_FAN_IN", 3)
+    src = tmp_path / "list.txt"
+    lines = make_list(src, 200, seed=1)
+    merge_runs, groups = listtools._merge_runs, []
+
+    def counted_merge(run_paths, *args):
+        groups.append(len(run_paths))
+        return merge_runs(run_paths, *args)
+
+    monkeypatch.setattr(listtools, "_merge_runs", counted_merge)
+    sort_list(str(src), chunk_bytes=1)
+    assert read_lines(src) == expected(lines)
+    assert len(groups) > 1 and max(groups) <= 3
+
+
+def test_dedupe_across_runs(tmp_path):
+    # the same term in every chunk is only dropped by the merge
+    src = tmp_path / "list.txt"
+    src.write_text("b\na\n" * 50)
+    stats = sort_list(str(src), chunk_bytes=1)
+    assert read_lines(src) == ["a", "b"]
+    assert stats.duplicates == 98
+
+
+def test_keep_case_and_duplicates(tmp_path):
+    src = tmp_path / "list.txt"
+    lines = make_list(src, 100, seed=2)
+    sort_list(str(src), normalize=False, dedupe=False, chunk_bytes=100)
+    assert read_lines(src) == sorted(line for line in lines if line)
+
+
+def test_replaces_source_and_leaves_no_temp_files(tmp_path):
+    lists_dir, tmp_dir = tmp_path / "lists", tmp_path / "tmp"
+    lists_dir.mkdir()
+    tmp_dir.mkdir()
+    src = lists_dir / "list.txt"
+    lines = make_list(src, 100)
+    os.chmod(src, 0o640)
+    sort_list(str(src), chunk_bytes=50, tmp_dir=str(tmp_dir))
+    assert read_lines(src) == expected(lines)
+    assert os.listdir(lists_dir) == ["list.txt"]
+    assert os.listdir(tmp_dir) == []
+    assert os.stat(src).st_mode & 0o777 == 0o640
+
+
+def test_cancel_inside_final_merge(tmp_path):
+    lists_dir, tmp_dir = tmp_path / "lists", tmp_path / "tmp"
+    lists_dir.mkdir()
+    tmp_dir.mkdir()
+    src = lists_dir / "list.txt"
+    make_list(src, 100)
+    original = src.read_bytes()
+
+    # true once the last merge has created its output next to the list
+    def cancelled():
+        return any(name.startswith(".tmp-") for name in os.listdir(lists_dir))
+
+    assert sort_list(str(src), chunk_bytes=50, tmp_dir=str(tmp_dir), cancelled=cancelled) is None
+    assert src.read_bytes() == original
+    assert os.listdir(lists_dir) == ["list.txt"]
+    assert os.listdir(tmp_dir) == []
+
+
+def test_compressed_list(tmp_path):
+    src = tmp_path / "list.txt.gz"
+    lines = ["b", "A", "a", "", "c"]
+    with gzip.open(src, 'wt', encoding='utf-8') as f:
+        f.writelines(line + '\n' for line in lines)
+    sort_list(str(src), chunk_bytes=1)
+    with gzip.open(src, 'rt', encoding='utf-8') as f:
+        assert f.read().splitlines() == ["a", "b", "c"]
@@ -0,0 +1,143 @@
+# Placeholder scanning and filling straight from the template zip: placeholders
+# split over runs, XML escaping, multi-line values and the raw member copy.
+import zipfile
+import xml.etree.ElementTree as ET
+
+import pytest
+
+import templatezip
+from templatezip import scan_template, render_template
+
+W = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+TEXT = "urn:oasis:names:tc:opendocument:xmlns:text:1.0"
+OFFICE = "urn:oasis:names:tc:opendocument:xmlns:office:1.0"
+PNG = b'\x89PNG\r\n\x1a\n' + b'\0' * 64
+
+
+def docx_part(root_tag, paragraphs):
+    # paragraphs: lists of run texts, already XML escaped
+    body = "".join("<w:p>" + "".join(f"<w:r><w:t>{run}</w:t></w:r>" for run in runs) + "</w:p>" for runs in paragraphs)
+    if root_tag == "document":
+        body = f"<w:body>{body}</w:body>"
+    return f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><w:{root_tag} xmlns:w="{W}">{body}</w:{root_tag}>'
+
+
+def make_docx(path):
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", '<?xml version="1.0"?><Types/>')
+        zf.writestr("word/document.xml", docx_part("document", [
+            ["Name: &lt;name&gt;"],
+            ["Case: &lt;ca", "se_", "id&gt; closed"],       # split over three runs, like Word does
+            ["Notes: &lt;notes&gt;"],
+            ["Twice: &lt;name&gt; and &lt;missing&gt;"],
+        ]))
+        zf.writestr("word/header1.xml", docx_part("hdr", [["Agency: &lt;agency&gt;"]]))
+        zf.writestr("word/media/image1.png", PNG, compress_type=zipfile.ZIP_STORED)
+        zf.writestr("word/media/image2.png", PNG + b'2')
+
+
+def make_odt(path):
+    ns = f'xmlns:office="{OFFICE}" xmlns:text="{TEXT}"'
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("mimetype", "application/vnd.oasis.opendocument.text", compress_type=zipfile.ZIP_STORED)
+        zf.writestr("content.xml", f'<?xml version="1.0"?><office:document-content {ns}><office:body><office:text>'
+                                   '<text:p>Name: &lt;name&gt;</text:p><text:p>Notes: &lt;no<text:span>tes</text:span>&gt;</text:p>'
+                                   '</office:text></office:body></office:document-content>')
+        zf.writestr("styles.xml", f'<?xml version="1.0"?><office:document-styles {ns}>'
+                                  '<text:p>Agency: &lt;agency&gt;</text:p></office:document-styles>')
+        zf.writestr("Pictures/image1.png", PNG)
+
+
+def paragraphs(xml, kind):
+    # text of every paragraph, line breaks as \n
+    root = ET.fromstring(xml)
+    if kind == ".docx":
+        return ["".join("\n" if el.tag == f"{{{W}}}br" else (el.text or "") for el in p.iter() if el.tag in (f"{{{W}}}t", f"{{{W}}}br"))
+                for p in root.iter(f"{{{W}}}p")]
+    result = []
+    for p in root.iter(f"{{{TEXT}}}p"):
+        text = []
+        for el in p.iter():
+            text.append("\n" if el.tag == f"{{{TEXT}}}line-break" else (el.text or ""))
+            if el is not p:
+                text.append(el.tail or "")
+        result.append("".join(text))
+    return result
+
+
+def members(path):
+    with zipfile.ZipFile(path) as zf:
+        assert zf.testzip() is None
+        return {info.filename: zf.read(info) for info in zf.infolist()}
+
+
+def test_scan_docx(tmp_path):
+    path = tmp_path / "t.docx"
+    make_docx(path)
+    scan = scan_template(str(path))
+    # headers come before the body, a placeholder used twice is listed once
+    assert scan.var_names == ["agency", "name", "case_id", "notes", "missing"]
+    assert scan.parts == ["word/header1.xml", "word/document.xml"]
+    assert scan.images == ["word/media/image1.png", "word/media/image2.png"]
+
+
+def test_scan_odt_styles_first(tmp_path):
+    path = tmp_path / "t.odt"
+    make_odt(path)
+    scan = scan_template(str(path))
+    assert scan.parts == ["styles.xml", "content.xml"]
+    assert scan.var_names == ["agency", "name", "notes"]
+
+
+def test_render_docx(tmp_path):
+    path, out = tmp_path / "t.docx", tmp_path / "out.docx"
+    make_docx(path)
+    render_template(str(path), str(out), {"name": "A & B <Ltd>", "case_id": "42",
+                                          "notes": "first\r\nsecond\nthird", "agency": "CSI"})
+    report = members(out)
+    assert paragraphs(report["word/document.xml"], ".docx") == [
+        "Name: A & B <Ltd>",
+        "Case: 42 closed",
+        "Notes: first\nsecond\nthird",
+        "Twice: A & B <Ltd> and <missing>",     # no value, left as it is
+    ]
+    assert paragraphs(report["word/header1.xml"], ".docx") == ["Agency: CSI"]
+    # untouched members are copied as they are, in the same order
+    assert list(report) == list(members(path))
+    assert report["word/media/image1.png"] == PNG
+
+
+def test_render_odt(tmp_path):
+    path, out = tmp_path / "t.odt", tmp_path / "out.odt"
+    make_odt(path)
+    render_template(str(path), str(out), {"name": "x<y", "notes": "a\r\nb", "agency": "CSI"})
+    report = members(out)
+    assert paragraphs(report["content.xml"], ".odt") == ["Name: x<y", "Notes: a\nb"]
+    assert paragraphs(report["styles.xml"], ".odt") == ["Agency: CSI"]
+    assert report["mimetype"] == b"application/vnd.oasis.opendocument.text"
+
+
+def test_render_replaces_images(tmp_path):
+    path, out, new_image = tmp_path / "t.docx", tmp_path / "out.docx", tmp_path / "new.png"
+    make_docx(path)
+    new_image.write_bytes(PNG + b'new')
+    render_template(str(path), str(out), {}, {1: str(new_image)})
+    report = members(out)
+    assert report["word/media/image1.png"] == PNG
+    assert report["word/media/image2.png"] == PNG + b'new'
+
+
+@pytest.mark.parametrize("make, kind", [(make_docx, ".docx"), (make_odt, ".odt")])
+def test_fallback_copy_matches_raw_copy(tmp_path, monkeypatch, make, kind):
+    path = tmp_path / f"t{kind}"
+    make(path)
+    values = {"name": "N", "agency": "A"}
+    render_template(str(path), str(tmp_path / f"raw{kind}"), values)
+    monkeypatch.setattr(templatezip, "can_copy_raw", lambda dest_zip: False)
+    render_template(str(path), str(tmp_path / f"public{kind}"), values)
+
+    raw, public = members(tmp_path / f"raw{kind}"), members(tmp_path / f"public{kind}")
+    assert list(raw) == list(public)
+    assert raw == public
+    with zipfile.ZipFile(tmp_path / f"raw{kind}") as raw_zip, zipfile.ZipFile(tmp_path / f"public{kind}") as public_zip:
+        assert [info.compress_type for info in raw_zip.infolist()] == [info.compress_type for info in public_zip.infolist()]
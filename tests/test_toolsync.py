@@ -0,0 +1,151 @@
+# Change detection of the API key push: only new/changed keys are written, and
+# a tool whose config changed behind our back gets all of its keys again.
+import os, sqlite3
+
+import pytest
+
+import toolsync
+from toolsync import push_api_keys, plan_sync, load_sync_state, sync_recon_keys, sync_spiderfoot_keys, sync_hades_keys
+
+
+@pytest.fixture
+def tools(tmp_path, monkeypatch):
+    # fake Recon-NG keys.db, SpiderFoot.cfg and ProjectHades under a temp HOME
+    monkeypatch.setenv("HOME", str(tmp_path))
+    paths = {"Recon-NG": str(tmp_path / "keys.db"), "Spiderfoot": str(tmp_path / "SpiderFoot.cfg"),
+             "hades": str(tmp_path / "ProjectHades"), "state": str(tmp_path / ".csi-manager" / "toolsync.json")}
+    conn = sqlite3.connect(paths["Recon-NG"])
+    with conn:
+        conn.execute("CREATE TABLE keys (name TEXT PRIMARY KEY, Value TEXT)")
+        conn.executemany("INSERT INTO keys VALUES (?, '')", [("shodan_api",), ("github_api",)])
+    conn.close()
+    with open(paths["Spiderfoot"], 'w') as f:
+        f.write("# SpiderFoot\nsfp_shodan:api_key=\nsfp_virustotal:api_key=\n")
+    with open(paths["hades"], 'w') as f:
+        f.write("atiikey=''\n")
+
+    monkeypatch.setattr(toolsync, "TOOL_SYNC", {
+        'Recon-NG': (paths["Recon-NG"], sync_recon_keys, toolsync.recon_keys_content, lambda api: 'Recon-NG' in api[2]),
+        'Spiderfoot': (paths["Spiderfoot"], sync_spiderfoot_keys, toolsync.config_content, lambda api: 'Spiderfoot' in api[2]),
+        'hades': (paths["hades"], sync_hades_keys, toolsync.config_content, lambda api: 'hades' in api[0]),
+    })
+    return paths
+
+
+def keys():
+    return [["shodan_api", "S1", ["Recon-NG", "Spiderfoot"]],
+            ["virustotal_api", "V1", ["Spiderfoot"]],
+            ["hades_api", "H1", []]]
+
+
+def push(api_keys_list, paths):
+    results = push_api_keys(api_keys_list, state_path=paths["state"])
+    for tool, result in results.items():
+        assert not isinstance(result, Exception), (tool, result)
+    return results
+
+
+def planned(api_keys_list, paths):
+    return plan_sync(api_keys_list, load_sync_state(paths["state"])).ops
+
+
+def recon_value(paths, name):
+    conn = sqlite3.connect(paths["Recon-NG"])
+    try:
+        return conn.execute("SELECT Value FROM keys WHERE name = ?", (name,)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def read(path):
+    with open(path) as f:
+        return f.read()
+
+
+def test_first_push_writes_every_key(tools):
+    results = push(keys(), tools)
+    assert set(results) == {"Recon-NG", "Spiderfoot", "hades"}
+    assert recon_value(tools, "shodan_api") == "S1"
+    assert "sfp_shodan:api_key=S1\n" in read(tools["Spiderfoot"])
+    assert "sfp_virustotal:api_key=V1\n" in read(tools["Spiderfoot"])
+    assert read(tools["hades"]) == "atiikey='H1'\n"
+    assert os.stat(tools["state"]).st_mode & 0o777 == 0o600
+    # nothing changed since, nothing to write
+    assert planned(keys(), tools) == {}
+    assert push_api_keys(keys(), state_path=tools["state"]) == {}
+
+
+def test_changed_key_only_goes_to_its_tools(tools):
+    push(keys(), tools)
+    changed = keys()
+    changed[1][1] = "V2"
+    assert planned(changed, tools) == {"Spiderfoot": [("virustotal_api", "V2")]}
+    push(changed, tools)
+    assert "sfp_virustotal:api_key=V2\n" in read(tools["Spiderfoot"])
+    assert planned(changed, tools) == {}
+
+
+def test_new_key(tools):
+    push(keys(), tools)
+    added = keys() + [["github_api", "G1", ["Recon-NG"]]]
+    assert planned(added, tools) == {"Recon-NG": [("github_api", "G1")]}
+    push(added, tools)
+    assert recon_value(tools, "github_api") == "G1"
+
+
+def test_config_edited_outside_gets_all_its_keys(tools):
+    push(keys(), tools)
+    with open(tools["Spiderfoot"], 'w') as f:
+        f.write("sfp_shodan:api_key=\nsfp_virustotal:api_key=\n")     # e.g. reinstalled
+    assert planned(keys(), tools) == {"Spiderfoot": [("shodan_api", "S1"), ("virustotal_api", "V1")]}
+    push(keys(), tools)
+    assert read(tools["Spiderfoot"]) == "sfp_shodan:api_key=S1\nsfp_virustotal:api_key=V1\n"
+
+
+def test_recon_keys_edited_outside(tools):
+    push(keys(), tools)
+    conn = sqlite3.connect(tools["Recon-NG"])
+    with conn:
+        conn.execute("UPDATE keys SET Value = '' WHERE name = 'shodan_api'")
+    conn.close()
+    assert planned(keys(), tools) == {"Recon-NG": [("shodan_api", "S1")]}
+
+
+def test_touched_config_is_not_stale(tools):
+    push(keys(), tools)
+    stat = os.stat(tools["Spiderfoot"])
+    os.utime(tools["Spiderfoot"], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 10))
+    assert planned(keys(), tools) == {}
+
+
+def test_tool_removed_from_a_key(tools):
+    push(keys(), tools)
+    removed = keys()
+    removed[0][2] = ["Recon-NG"]
+    # the key changed for Recon-NG's sake only, Spiderfoot isn't written
+    assert planned(removed, tools) == {"Recon-NG": [("shodan_api", "S1")]}
+
+
+def test_failed_tool_is_pushed_in_full_next_time(tools):
+    os.rename(tools["Spiderfoot"], tools["Spiderfoot"] + ".away")
+    results = push_api_keys(keys(), state_path=tools["state"])
+    assert isinstance(results["Spiderfoot"], OSError)
+    assert not isinstance(results["Recon-NG"], Exception)
+    os.rename(tools["Spiderfoot"] + ".away", tools["Spiderfoot"])
+    assert planned(keys(), tools) == {"Spiderfoot": [("shodan_api", "S1"), ("virustotal_api", "V1")]}
+
+
+def test_cancelled_tool_is_pushed_next_time(tools):
+    results = push_api_keys(keys(), state_path=tools["state"], cancelled=lambda: True)
+    assert set(results) == {"Recon-NG", "Spiderfoot", "hades"}
+    assert all(result is None for result in results.values())
+    assert set(planned(keys(), tools)) == {"Recon-NG", "Spiderfoot", "hades"}
+
+
+def test_dry_run_writes_nothing(tools, capsys):
+    spiderfoot = read(tools["Spiderfoot"])
+    assert push_api_keys(keys(), dry_run=True, state_path=tools["state"]) == {}
+    assert "Spiderfoot" in capsys.readouterr().out
+    assert read(tools["Spiderfoot"]) == spiderfoot
+    assert recon_value(tools, "shodan_api") == ""
+    assert not os.path.exists(tools["state"])
@@ -0,0 +1,194 @@
+# Thumbnails of the images stored inside template files (.docx/.odt).
+# Images are decoded straight from the zip at thumbnail size on a thread pool,
+# kept in a bounded in-memory LRU and written to a disk cache keyed by the
+# template's content hash and the member name, so reopening a template shows
+# its thumbnails without decoding the originals again. The disk cache is kept
+# under THUMB_CACHE_MAX_BYTES by dropping the least recently used templates.
+import os, shutil, hashlib, zipfile
+from collections import OrderedDict
+
+from PySide6.QtCore import QObject, Signal, QRunnable, QThreadPool, QByteArray, QBuffer, QIODevice, Qt
+from PySide6.QtGui import QImage, QImageReader, QPixmap
+
+THUMB_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "csi-manager", "thumbnails")
+THUMB_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+
+def template_key(zip_path):
+    # content hash from the zip central directory (names, CRCs and sizes), nothing is decompressed
+    digest = hashlib.sha1()
+    with zipfile.ZipFile(zip_path) as templ_file:
+        for info in templ_file.infolist():
+            digest.update(f"{info.filename}:{info.CRC}:{info.file_size}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def decode_thumbnail(data, size):
+    # decodes at (about) the target size instead of full resolution when the format allows it
+    buffer = QBuffer()
+    buffer.setData(QByteArray(data))
+    buffer.open(QIODevice.ReadOnly)
+    reader = QImageReader(buffer)
+    reader.setAutoTransform(True)
+    full_size = reader.size()
+    if full_size.isValid() and (full_size.width() > size or full_size.height() > size):
+        reader.setScaledSize(full_size.scaled(size, size, Qt.KeepAspectRatio))
+    image = reader.read()
+    if not image.isNull() and (image.width() > size or image.height() > size):
+        image = image.scaled(size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+    return image
+
+
+def prune_disk_cache(cache_dir, max_bytes):
+    # removes the thumbnails of the least recently used templates (one directory each,
+    # its mtime is the last use) until the cache fits in max_bytes, returns how many
+    try:
+        names = os.listdir(cache_dir)
+    except OSError:
+        return 0
+    entries, total = [], 0
+    for name in names:
+        key_dir = os.path.join(cache_dir, name)
+        try:
+            size = sum(entry.stat().st_size for entry in os.scandir(key_dir) if entry.is_file())
+            last_used = os.stat(key_dir).st_mtime
+        except OSError:
+            continue
+        entries.append((last_used, size, key_dir))
+        total += size
+
+    removed = 0
+    for last_used, size, key_dir in sorted(entries):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(key_dir, ignore_errors=True)
+        total -= size
+        removed += 1
+    return removed
+
+
+class _PruneJob(QRunnable):
+    def __init__(self, cache_dir, max_bytes):
+        super().__init__()
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def run(self):
+        prune_disk_cache(self.cache_dir, self.max_bytes)
+
+
+class _ThumbnailSignals(QObject):
+    done = Signal(str, str, int, QImage)     # template key, member, size, image
+
+
+class _ThumbnailJob(QRunnable):
+    def __init__(self, zip_path, key, member, size, disk_path, signals):
+        super().__init__()
+        self.zip_path = zip_path
+        self.key = key
+        self.member = member
+        self.size = size
+        self.disk_path = disk_path
+        self.signals = signals
+
+    def run(self):
+        try:
+            with zipfile.ZipFile(self.zip_path) as templ_file:
+                data = templ_file.read(self.member)
+        except (OSError, KeyError, zipfile.BadZipFile):
+            data = b''
+        image = decode_thumbnail(data, self.size) if data else QImage()
+        if not image.isNull():
+            self.saveToDisk(image)
+        # the tile gets the image even when the disk cache couldn't be written
+        self.signals.done.emit(self.key, self.member, self.size, image)
+
+    def saveToDisk(self, image):
+        tmp_path = f"{self.disk_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.disk_path), exist_ok=True)
+            if image.save(tmp_path, "PNG"):
+                os.replace(tmp_path, self.disk_path)
+                return
+        except OSError:
+            pass
+        # disk full, cache not writable...: no half written thumbnail is left behind
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+
+
+class ThumbnailCache(QObject):
+    ready = Signal(str, str, QPixmap)   # template key, member, thumbnail
+
+    def __init__(self, max_items=512, cache_dir=THUMB_CACHE_DIR, max_disk_bytes=THUMB_CACHE_MAX_BYTES, parent=None):
+        super().__init__(parent)
+        self.max_items = max_items
+        self.cache_dir = cache_dir
+        self.memory = OrderedDict()     # (key, member, size): QPixmap, least recently used first
+        self.pending = set()
+        self.used_keys = set()          # templates whose disk entry was marked as used this session
+        self.pool = QThreadPool.globalInstance()
+        self.signals = _ThumbnailSignals()
+        self.signals.done.connect(self.jobDone)
+        # what earlier sessions left, trimmed in the background
+        self.pool.start(_PruneJob(cache_dir, max_disk_bytes))
+
+    def diskPath(self, key, member, size):
+        member_hash = hashlib.sha1(member.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, key, f"{member_hash}_{size}.png")
+
+    def thumbnail(self, zip_path, key, member, size):
+        # returns the QPixmap when it is cached, otherwise None and `ready` is emitted later
+        cache_key = (key, member, size)
+        if cache_key in self.memory:
+            self.memory.move_to_end(cache_key)
+            return self.memory[cache_key]
+
+        disk_path = self.diskPath(key, member, size)
+        if os.path.exists(disk_path):
+            pixmap = QPixmap(disk_path)
+            if not pixmap.isNull():
+                self.remember(cache_key, pixmap)
+                self.markUsed(key)
+                return pixmap
+
+        if cache_key not in self.pending:
+            self.pending.add(cache_key)
+            self.pool.start(_ThumbnailJob(zip_path, key, member, size, disk_path, self.signals))
+        return None
+
+    def markUsed(self, key):
+        # the template directory's mtime orders the disk cache for prune_disk_cache
+        if key not in self.used_keys:
+            self.used_keys.add(key)
+            try:
+                os.utime(os.path.join(self.cache_dir, key))
+            except OSError:
+                pass
+
+    def jobDone(self, key, member, size, image):
+        self.pending.discard((key, member, size))
+        if image.isNull():
+            return
+        # QPixmap has to be created on the GUI thread
+        pixmap = QPixmap.fromImage(image)
+        self.remember((key, member, size), pixmap)
+        self.ready.emit(key, member, pixmap)
+
+    def remember(self, cache_key, pixmap):
+        self.memory[cache_key] = pixmap
+        self.memory.move_to_end(cache_key)
+        while len(self.memory) > self.max_items:
+            self.memory.popitem(last=False)
+
+
+_shared_cache = None
+
+def sharedThumbnailCache():
+    # one cache for the whole application, so the LRU survives closing a dialog
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = ThumbnailCache()
+    return _shared_cache
@@ -0,0 +1,299 @@
+# Pushes the API keys into the configs of the tools that use them.
+# Shared by manageapis.Ui_MainWindow and CSI_Manager.APIKeys, new tools from
+# manageapis.tools_support get their implementation in push_api_keys & wipe_api_keys.
+import os, re, json, hashlib, functools, shutil, sqlite3, tempfile
+from collections import namedtuple
+
+import perftrace
+
+RECON_KEYS_DB = "/home/csi/.recon-ng/keys.db"
+SPIDERFOOT_CFG = "/opt/csitools/SpiderFoot.cfg"
+HADES_FILE = "/opt/csitools/ProjectHades"
+
+# hashes of the keys as they were last pushed, and of the tools' configs content after the push.
+# They only detect changes: the salt is stored in the same file, so whoever can read it can
+# check a guessed key against them. The file is only readable by its owner.
+SYNC_STATE_FILE = os.path.join(os.path.expanduser("~"), ".csi-manager", "toolsync.json")
+
+# rows: number of key rows updated, missing: API names with no row in keys.db
+ReconSyncResult = namedtuple("ReconSyncResult", ["rows", "missing"])
+# options: config options written, missing: API names with no option in the config
+ConfigSyncResult = namedtuple("ConfigSyncResult", ["options", "missing"])
+# ops: tool: [(name, value)] to write, hashes: name: content hash of every key in the new set
+SyncPlan = namedtuple("SyncPlan", ["ops", "hashes"])
+
+# API name prefix (name without the _api suffix): SpiderFoot "module:option" keys it fills.
+# Names not listed here fall back to sfp_<prefix>:api_key when that option exists in the config.
+SPIDERFOOT_OPTIONS = {
+    "abuseipdb": ["sfp_abuseipdb:api_key"],
+    "alienvault": ["sfp_alienvault:api_key"],
+    "binaryedge": ["sfp_binaryedge:binaryedge_api_key"],
+    "bing": ["sfp_bingsearch:api_key"],
+    "bingsearch": ["sfp_bingsearch:api_key"],
+    "botscout": ["sfp_botscout:api_key"],
+    "builtwith": ["sfp_builtwith:api_key"],
+    "c99": ["sfp_c99:api_key"],
+    "clearbit": ["sfp_clearbit:api_key"],
+    "emailrep": ["sfp_emailrep:api_key"],
+    "etherscan": ["sfp_etherscan:api_key"],
+    "fullcontact": ["sfp_fullcontact:api_key"],
+    "fullhunt": ["sfp_fullhunt:api_key"],
+    "google": ["sfp_googlesearch:api_key"],
+    "googlesearch": ["sfp_googlesearch:api_key"],
+    "greynoise": ["sfp_greynoise:api_key"],
+    "haveibeenpwned": ["sfp_haveibeenpwned:api_key"],
+    "hibp": ["sfp_haveibeenpwned:api_key"],
+    "hunter": ["sfp_hunter:api_key"],
+    "hybrid_analysis": ["sfp_hybrid_analysis:api_key"],
+    "intelx": ["sfp_intelx:api_key"],
+    "ipinfo": ["sfp_ipinfo:api_key"],
+    "jsonwhois": ["sfp_jsonwhoiscom:api_key"],
+    "leakix": ["sfp_leakix:api_key"],
+    "networksdb": ["sfp_networksdb:api_key"],
+    "numverify": ["sfp_numverify:api_key"],
+    "onyphe": ["sfp_onyphe:api_key"],
+    "pulsedive": ["sfp_pulsedive:api_key"],
+    "securitytrails": ["sfp_securitytrails:api_key"],
+    "shodan": ["sfp_shodan:api_key"],
+    "spyse": ["sfp_spyse:api_key"],
+    "textmagic": ["sfp_textmagic:api_key"],
+    "viewdns": ["sfp_viewdns:api_key"],
+    "virustotal": ["sfp_virustotal:api_key"],
+    "whoisology": ["sfp_whoisology:api_key"],
+    "whoxy": ["sfp_whoxy:api_key"],
+}
+
+
+def sync_recon_keys(keys, db_path=RECON_KEYS_DB):
+    # keys: iterable of (name, value), written in one transaction on one connection
+    # mode=rw so a missing keys.db raises instead of creating an empty database
+    conn = sqlite3.connect(f"file:{db_path}?mode=rw", uri=True)
+    rows, missing = 0, []
+    try:
+        with conn:
+            for name, value in keys:
+                # rows already holding the value are left alone
+                cursor = conn.execute("UPDATE keys SET Value = ? WHERE name = ? AND Value IS NOT ?", (value, name, value))
+                if cursor.rowcount:
+                    rows += cursor.rowcount
+                elif conn.execute("SELECT 1 FROM keys WHERE name = ?", (name,)).fetchone() is None:
+                    missing.append(name)
+    finally:
+        conn.close()
+    return ReconSyncResult(rows, missing)
+
+
+def spiderfoot_options(api_name):
+    # e.g. shodan_api -> ["sfp_shodan:api_key"]
+    prefix = re.sub(r"[_-]?(api|key|apikey|api_key)$", "", api_name.strip().lower())
+    return SPIDERFOOT_OPTIONS.get(prefix, [f"sfp_{prefix}:api_key"])
+
+
+def write_atomic(path, content):
+    # writes next to the target and renames over it, so readers never see a half written file
+    dir_name = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=dir_name)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+            f.write(content)
+        if os.path.exists(path):
+            shutil.copymode(path, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def sync_spiderfoot_keys(keys, cfg_path=SPIDERFOOT_CFG):
+    # keys: iterable of (name, value). The config is read once, every option is
+    # substituted in memory and the file is written back once (only if it changed).
+    with open(cfg_path, 'r', encoding='utf-8', newline='') as f:
+        original = f.read()
+    lines = original.splitlines(keepends=True)
+
+    # "module:option=value" lines, indexed by their option key
+    option_lines = {}
+    for i, line in enumerate(lines):
+        if line.startswith('#') or '=' not in line:
+            continue
+        option_lines[line.split('=', 1)[0].strip()] = i
+
+    written, missing = [], []
+    for name, value in keys:
+        value = value.strip().replace('\r', '').replace('\n', '')
+        options = [opt for opt in spiderfoot_options(name) if opt in option_lines]
+        if not options:
+            missing.append(name)
+            continue
+        for opt in options:
+            i = option_lines[opt]
+            ending = lines[i][len(lines[i].rstrip('\r\n')):]
+            lines[i] = f"{opt}={value}{ending}"
+            written.append(opt)
+
+    content = ''.join(lines)
+    if content != original:
+        write_atomic(cfg_path, content)
+    return ConfigSyncResult(written, missing)
+
+
+def sync_hades_keys(keys, file_path=HADES_FILE):
+    with open(file_path, 'r', encoding='utf-8', newline='') as f:
+        original = f.read()
+    content = original
+    for name, value in keys:
+        content = re.sub(r"atiikey='[^']*'", lambda m: f"atiikey='{value}'", content)
+    if content != original:
+        write_atomic(file_path, content)
+    return ConfigSyncResult(["atiikey"] if content != original else [], [])
+
+
+def config_content(file_path):
+    with open(file_path, 'rb') as f:
+        return f.read()
+
+
+def recon_keys_content(db_path=RECON_KEYS_DB):
+    # the key rows rather than the file: sqlite can rewrite its pages without a value changing
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute("SELECT name, Value FROM keys ORDER BY name").fetchall()
+    finally:
+        conn.close()
+    return json.dumps(rows).encode('utf-8')
+
+
+# tool: (config it writes, function applying [(name, value)] to it, function reading
+# the content it is compared by, whether an API row belongs to it)
+TOOL_SYNC = {
+    'Recon-NG': (RECON_KEYS_DB, sync_recon_keys, recon_keys_content, lambda api: 'Recon-NG' in api[2]),
+    'Spiderfoot': (SPIDERFOOT_CFG, sync_spiderfoot_keys, config_content, lambda api: 'Spiderfoot' in api[2]),
+    'hades': (HADES_FILE, sync_hades_keys, config_content, lambda api: 'hades' in api[0]),
+}
+
+
+def load_sync_state(state_path=SYNC_STATE_FILE):
+    try:
+        with open(state_path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_sync_state(state, state_path=SYNC_STATE_FILE):
+    os.makedirs(os.path.dirname(state_path), exist_ok=True)
+    write_atomic(state_path, json.dumps(state))
+    os.chmod(state_path, 0o600)
+
+
+def clear_sync_state(state_path=SYNC_STATE_FILE):
+    # next push writes every key again
+    if os.path.exists(state_path):
+        os.remove(state_path)
+
+
+def key_hash(salt, api):
+    # change detection only, see SYNC_STATE_FILE
+    data = json.dumps([api[0], api[1], sorted(api[2])])
+    return hashlib.sha256((salt + data).encode('utf-8')).hexdigest()
+
+
+def content_fingerprint(salt, read_content, file_path):
+    # hash of the tool's config content to notice outside edits, None when it can't be read
+    try:
+        content = read_content(file_path)
+    except (OSError, sqlite3.Error):
+        return None
+    return hashlib.sha256(salt.encode('utf-8') + content).hexdigest()
+
+
+def plan_sync(api_keys_list, state):
+    # keys whose hash changed since the last push, per tool. A tool whose config content
+    # changed behind our back (wiped, edited, reinstalled) gets all of its keys again.
+    salt = state.setdefault('salt', os.urandom(16).hex())
+    synced = state.get('keys', {})
+    files = state.get('files', {})
+    hashes = {api[0]: key_hash(salt, api) for api in api_keys_list}
+
+    ops = {}
+    for tool, (file_path, _, read_content, uses_key) in TOOL_SYNC.items():
+        stale = tool not in files or files[tool] != content_fingerprint(salt, read_content, file_path)
+        for api in api_keys_list:
+            if uses_key(api) and (stale or synced.get(api[0]) != hashes[api[0]]):
+                ops.setdefault(tool, []).append((api[0], api[1]))
+    return SyncPlan(ops, hashes)
+
+
+def print_plan(plan):
+    if not plan.ops:
+        print("Tools are up to date, nothing to sync.")
+    for tool, keys in plan.ops.items():
+        print(f"{tool} ({TOOL_SYNC[tool][0]}): {', '.join(name for name, _ in keys)}")
+
+
+def push_api_keys(api_keys_list, dry_run=False, state_path=SYNC_STATE_FILE, progress=None, cancelled=None):
+    # api_keys_list rows: [name, key, inTools]. Only keys changed since the last push are written.
+    # progress(tool, done, total) is called before each tool, cancelled() is checked between tools.
+    # Returns tool: result, or the exception it raised, or None when it was cancelled.
+    state = load_sync_state(state_path)
+    plan = plan_sync(api_keys_list, state)
+    if dry_run:
+        print_plan(plan)
+        return {}
+
+    results = {}
+    files = state.setdefault('files', {})
+    try:
+        for done, (tool, keys) in enumerate(plan.ops.items()):
+            if cancelled and cancelled():
+                results[tool] = None
+                continue
+            if progress:
+                progress(tool, done, len(plan.ops))
+            file_path, sync_keys, read_content, _ = TOOL_SYNC[tool]
+            try:
+                with perftrace.span("toolsync.push", tool=tool, keys=len(keys)):
+                    results[tool] = sync_keys(keys, file_path)
+                files[tool] = content_fingerprint(state['salt'], read_content, file_path)
+            except Exception as e:
+                results[tool] = e
+    finally:
+        # tools that didn't get their keys are pushed in full next time
+        for tool in plan.ops:
+            if results.get(tool) is None or isinstance(results[tool], Exception):
+                files.pop(tool, None)
+        state['keys'] = plan.hashes
+        save_sync_state(state, state_path)
+    return results
+
+
+# tool: (clean copy shipped with the tool, config it replaces)
+WIPE_BACKUPS = {
+    'theHarvester': ("/opt/theHarvester/api-backup", "/opt/theHarvester/api-keys.yaml"),
+    'OSINT-Search': ("/opt/OSINT-Search/osintSearch.config.back", "/opt/OSINT-Search/osintSearch.config.ini"),
+    'Spiderfoot': ("/opt/csitools/SpiderFoot.empty", SPIDERFOOT_CFG),
+}
+
+
+def wipe_api_keys(api_keys_list, state_path=SYNC_STATE_FILE, progress=None, cancelled=None):
+    # same progress/cancelled callbacks and results as push_api_keys
+    clear_sync_state(state_path)
+    recon_keys = [(api[0], '') for api in api_keys_list if 'Recon-NG' in api[2]]
+
+    steps = {tool: functools.partial(shutil.copyfile, *paths) for tool, paths in WIPE_BACKUPS.items()}
+    if recon_keys:
+        steps['Recon-NG'] = functools.partial(sync_recon_keys, recon_keys)
+
+    results = {}
+    for done, (tool, step) in enumerate(steps.items()):
+        if cancelled and cancelled():
+            results[tool] = None
+            continue
+        if progress:
+            progress(tool, done, len(steps))
+        try:
+            with perftrace.span("toolsync.wipe", tool=tool):
+                results[tool] = step()
+        except Exception as e:
+            results[tool] = e
+    return results